@@ -1,6 +1,7 @@
 from __future__ import annotations
-import itertools as itt
-from typing import List, Dict, Optional
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
 
 
 class SemanticError(Exception):
@@ -9,12 +10,38 @@ class SemanticError(Exception):
         return self.args[0]
 
 
+ERROR_POSITION = re.compile(r"\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)")
+
+
+def error_position(error: str):
+    """
+    Linea y columna de un error con el formato `(linea, columna) - ...`.
+    Los errores sin posicion se ordenan al final.
+    """
+    match = ERROR_POSITION.match(error)
+    if match is None:
+        return (float("inf"), float("inf"))
+    return (int(match.group(1)), int(match.group(2)))
+
+
+def sort_errors(errors: List[str]) -> List[str]:
+    """
+    Elimina los errores repetidos y ordena el resto por su posicion.
+    """
+    return sorted(dict.fromkeys(errors), key=error_position)
+
+
 class Type:
     def __init__(self, name: str, line=0, column=0):
         self.name = name
         self.attributes: List[Attribute] = []
         self.methods: Dict[str, Method] = {}
         self.parent: Optional[Type] = None
+        self.hierarchy: Optional[Hierarchy] = None
+        # Tablas de miembros aplanadas con los heredados (ver build_tables)
+        self.attribute_table: Optional[Dict[str, Attribute]] = None
+        self.attribute_slots: Optional[Dict[str, int]] = None
+        self.method_table: Optional[Dict[str, Method]] = None
         self.line = line
         self.column = column - len(self.name)
 
@@ -23,7 +50,34 @@ class Type:
             raise SemanticError(f'({self.line}, {self.column}) - SemanticError: Parent type is already set for {self.name}.')
         self.parent = parent
 
+    def build_tables(self) -> None:
+        """
+        Aplana los atributos y metodos de este tipo junto con los heredados.
+        Los heredados conservan la posicion que tienen en el padre y los
+        nuevos se agregan al final, de modo que `attribute_slots` da el
+        indice de cada atributo en la instancia. Los indices de los metodos
+        en las tablas virtuales no se deciden aqui: un mismo nombre debe
+        tener el mismo indice en tipos no relacionados (ver `cil.vtables`).
+        Requiere que las tablas del padre ya esten construidas (ver
+        `Context.build_member_tables`).
+        """
+        parent = self.parent
+        attributes = dict(parent.attribute_table) if parent is not None else {}
+        for attribute in self.attributes:
+            attributes.setdefault(attribute.name, attribute)
+        methods = dict(parent.method_table) if parent is not None else {}
+        methods.update(self.methods)
+        self.attribute_table = attributes
+        self.attribute_slots = {name: i for i, name in enumerate(attributes)}
+        self.method_table = methods
+
     def get_attribute(self, name):
+        if self.attribute_table is not None:
+            try:
+                return self.attribute_table[name]
+            except KeyError:
+                raise SemanticError(
+                    f'({self.line}, {self.column}) - SemanticError: Attribute "{name}" is not defined in {self.name}.')
         try:
             return next(attr for attr in self.attributes if attr.name == name)
         except StopIteration:
@@ -48,6 +102,12 @@ class Type:
                 f'({line}, {column}) - SemanticError: Attribute "{name}" is already defined in {self.name}.')
 
     def get_method(self, name):
+        if self.method_table is not None:
+            try:
+                return self.method_table[name]
+            except KeyError:
+                raise SemanticError(
+                    f'({self.line}, {self.column}) - SemanticError: Method "{name}" is not defined in {self.name}.')
         try:
             return self.methods[name]
         except KeyError:
@@ -70,6 +130,10 @@ class Type:
         return method
 
     def conforms_to(self, other) -> bool:
+        if self.hierarchy is not None:
+            conforms = self.hierarchy.conforms(self, other)
+            if conforms is not None:
+                return other.bypass() or conforms
         return other.bypass(
         ) or self == other or self.parent is not None and self.parent.conforms_to(
             other)
@@ -94,7 +158,7 @@ class Type:
         return str(self)
 
     def __eq__(self, other):
-        return isinstance(other, Type) and other.name == self.name
+        return other is self or (isinstance(other, Type) and other.name == self.name)
 
     def __hash__(self) -> int:
         return hash(self.name)
@@ -107,7 +171,6 @@ class Method:
         self.param_names = param_names
         self.param_types = params_types
         self.return_type = return_type
-        self.vtable_index = 0
 
     def __str__(self):
         params = ', '.join(f'{n}:{t.name}'
@@ -189,6 +252,25 @@ class AutoType(Type):
         return True
 
 
+class ErrorType(Type):
+    """
+    Tipo que se asigna a una expresion o declaracion con errores cuando se
+    chequea en modo de recuperacion. Se conforma con cualquier tipo y
+    cualquier tipo se conforma con el, para no reportar errores en cascada.
+    """
+    def __init__(self):
+        super(ErrorType, self).__init__('<error>')
+
+    def __eq__(self, other):
+        return isinstance(other, ErrorType)
+
+    def conforms_to(self, other: Type) -> bool:
+        return True
+
+    def bypass(self) -> bool:
+        return True
+
+
 class IoType(Type):
     def __init__(self) -> None:
         super(IoType, self).__init__('IO')
@@ -197,9 +279,117 @@ class IoType(Type):
         return isinstance(other, IoType)
 
 
+class Hierarchy:
+    """
+    Indice de la jerarquia de clases, se construye una sola vez cuando ya
+    estan definidos todos los padres (ver `Context.build_hierarchy`).
+
+    Un recorrido DFS desde Object asigna a cada tipo sus tiempos de
+    descubrimiento y finalizacion: A es ancestro de B si el intervalo de B
+    esta contenido en el de A, lo que permite responder `conforms_to` en
+    O(1). Para el menor ancestro comun se guardan los ancestros a distancia
+    2^k de cada tipo (binary lifting) y se responde en O(log n).
+    Los tipos se identifican por su nombre, como en `Type.__eq__`.
+    """
+    def __init__(self, root: Type, types: Iterable[Type]):
+        children: Dict[str, List[Type]] = {}
+        for type_ in types:
+            if type_.parent is not None:
+                children.setdefault(type_.parent.name, []).append(type_)
+
+        self.types: List[Type] = []
+        self.number: Dict[str, int] = {}
+        self.discover: List[int] = []
+        self.finish: List[int] = []
+        self.depth: List[int] = []
+        parents: List[int] = []
+
+        time = 0
+        pending = [(root, 0, 0)]
+        while pending:
+            type_, parent, depth = pending.pop()
+            if type_ is None:
+                self.finish[parent] = time
+                time += 1
+                continue
+            n = self.number[type_.name] = len(self.types)
+            self.types.append(type_)
+            self.discover.append(time)
+            self.finish.append(0)
+            self.depth.append(depth)
+            parents.append(parent if n else 0)
+            time += 1
+            pending.append((None, n, 0))
+            for child in reversed(children.get(type_.name, ())):
+                pending.append((child, n, depth + 1))
+
+        self.up: List[List[int]] = [parents]
+        while len(self.up) < max(self.depth).bit_length() + 1:
+            last = self.up[-1]
+            self.up.append([last[last[n]] for n in range(len(last))])
+
+    def __contains__(self, type_: Type) -> bool:
+        return type_.name in self.number
+
+    def ancestor(self, x: int, y: int) -> bool:
+        return self.discover[x] <= self.discover[y] and self.finish[y] <= self.finish[x]
+
+    def conforms(self, type_: Type, other: Type) -> Optional[bool]:
+        """
+        Si `type_` se conforma a `other`, o None si alguno de los dos no esta
+        en la jerarquia (por ejemplo SELF_TYPE o AUTO_TYPE).
+        """
+        x = self.number.get(type_.name)
+        y = self.number.get(other.name)
+        if x is None or y is None:
+            return None
+        return self.ancestor(y, x)
+
+    def distance(self, type_: Type, other: Type) -> int:
+        """
+        Distancia de `type_` a su descendiente `other`, o -1 si `type_` no
+        es ancestro de `other`.
+        """
+        x, y = self.number[type_.name], self.number[other.name]
+        return self.depth[y] - self.depth[x] if self.ancestor(x, y) else -1
+
+    def common_parent(self, type_: Type, other: Type) -> Type:
+        x, y = self.number[type_.name], self.number[other.name]
+        if self.ancestor(y, x):
+            return other
+        if self.ancestor(x, y):
+            return type_
+        for up in reversed(self.up):
+            if not self.ancestor(up[x], y):
+                x = up[x]
+        return self.types[self.up[0][x]]
+
+
 class Context:
     def __init__(self):
         self.types: Dict[str, Type] = {}
+        self.hierarchy: Optional[Hierarchy] = None
+
+    def build_hierarchy(self) -> Hierarchy:
+        """
+        Construye el indice de la jerarquia de clases. Debe llamarse cuando
+        ya no van a cambiar los padres de los tipos.
+        """
+        self.hierarchy = Hierarchy(self.types["Object"], self.types.values())
+        for type_ in self.hierarchy.types:
+            type_.hierarchy = self.hierarchy
+        return self.hierarchy
+
+    def build_member_tables(self) -> None:
+        """
+        Construye las tablas de miembros aplanadas de cada tipo de la
+        jerarquia, los padres antes que los hijos. Debe llamarse despues de
+        `build_hierarchy`, cuando ya estan definidos todos los atributos y
+        metodos.
+        """
+        hierarchy = self.hierarchy or self.build_hierarchy()
+        for type_ in hierarchy.types:
+            type_.build_tables()
 
     def create_type(self, name: str) -> Type:
         if name in self.types:
@@ -230,8 +420,21 @@ class VariableInfo:
 
 
 class Scope:
+    """
+    Scope con busqueda de variables en tiempo constante por nivel.
+
+    Ademas de la lista ordenada `locals`, cada scope guarda para cada nombre
+    las posiciones (crecientes) en que fue definido. Un scope hijo solo ve
+    las variables que el padre tenia definidas al crearse el hijo (`index`),
+    y dentro de un scope la busqueda devuelve la primera definicion visible.
+
+    La busqueda recorre la cadena de padres (ver `find_variable`): los scopes
+    no guardan un mapa con todas las variables visibles porque siguen
+    creciendo despues de crear sus hijos.
+    """
     def __init__(self, parent=None):
         self.locals: List[VariableInfo] = []
+        self.names: Dict[str, List[int]] = {}
         self.parent: Optional[Scope] = parent
         self.children: List[Scope] = []
         self.index: int = 0 if parent is None else len(parent)
@@ -249,25 +452,51 @@ class Scope:
                         vtype: Type,
                         location=None) -> VariableInfo:
         info = VariableInfo(vname, vtype, location)
+        self.names.setdefault(vname, []).append(len(self.locals))
         self.locals.append(info)
         return info
 
     def find_variable(self,
                       vname: str,
                       index: int = None) -> Optional[VariableInfo]:
-        locals = self.locals if index is None else itt.islice(
-            self.locals, index)
-        try:
-            return next(x for x in locals if x.name == vname)
-        except StopIteration:
-            return self.parent.find_variable(
-                vname, self.index) if self.parent is not None else None
+        """
+        Primera definicion de `vname` visible desde este scope, con `index`
+        solo se ven las primeras `index` variables. Es O(profundidad): una
+        consulta al diccionario por cada scope hasta el que define el nombre.
+        """
+        scope = self
+        while scope is not None:
+            positions = scope.names.get(vname)
+            if positions and (index is None or positions[0] < index):
+                return scope.locals[positions[0]]
+            index = scope.index
+            scope = scope.parent
+        return None
+
+    def find_variable_from(self, vname: str,
+                           index: int = 0) -> Optional[VariableInfo]:
+        """
+        Primera definicion de `vname` en la posicion `index` o posterior de
+        este scope; si no hay, se busca en el padre a partir de la posicion
+        en que se creo este scope. La busqueda no sigue mas alla de un
+        ancestro sin variables.
+        """
+        scope = self
+        while scope is not None:
+            positions = scope.names.get(vname)
+            if positions:
+                i = bisect_left(positions, index)
+                if i < len(positions):
+                    return scope.locals[positions[i]]
+            index = scope.index
+            scope = scope.parent if scope.parent else None
+        return None
 
     def is_defined(self, vname: str) -> bool:
         return self.find_variable(vname) is not None
 
     def is_local(self, vname: str) -> bool:
-        return any(True for x in self.locals if x.name == vname)
+        return vname in self.names
 
     def __str__(self):
         s = ' Scope \n'
@@ -1,47 +1,88 @@
 from __future__ import annotations
+from functools import lru_cache
 from typing import List, Optional, Tuple, Union
 
-from abstract.semantics import SemanticError
+from abstract.semantics import SemanticError, sort_errors
 
 
 class Node:
-    pass
+    """
+    Base de los nodos del AST. Los nodos usan `__slots__` en lugar de un
+    `__dict__` por instancia: cada clase declara solo los campos que agrega
+    y la posicion (linea y columna) se guarda en esta clase base. Los nodos
+    sin posicion, como las constantes, dejan esos campos sin asignar.
+    """
+    __slots__ = ("line", "column")
+
+    def fields(self):
+        """
+        Devuelve los pares (nombre, valor) de los campos asignados del nodo.
+        """
+        return [(name, getattr(self, name)) for name in node_fields(type(self))
+                if hasattr(self, name)]
+
+
+@lru_cache(maxsize=None)
+def node_fields(cls) -> Tuple[str, ...]:
+    """
+    Nombres de los campos de una clase de nodos, desde la base hasta la clase.
+    """
+    return tuple(name for klass in reversed(cls.__mro__)
+                 for name in klass.__dict__.get("__slots__", ()))
 
 
 class DeclarationNode(Node):
-    pass
+    __slots__ = ()
 
 
 class ExpressionNode(Node):
+    __slots__ = ()
+
     def __init__(self, line, column) -> None:
         self.line = line
         self.column = column
 
 
 class ProgramNode(Node):
+    __slots__ = ("class_list",)
+
     def __init__(self, class_list):
         self.class_list: List[ClassDef] = class_list
 
-    def check_semantics(self, deep=1):
+    def check_semantics(self, profiler=None, recover=False):
+        """
+        Chequea la semantica del programa y devuelve los errores, el
+        contexto y el scope. Normalmente cada fase se detiene en el primer
+        error; con `recover` cada fase registra todos los errores que
+        encuentra y sigue, y la inferencia se ejecuta aunque la construccion
+        de los tipos haya tenido errores. En ese caso los errores se
+        devuelven ordenados por posicion.
+        """
         from travels import typecollector, typebuilder, inference
+        from profiling import NULL_PROFILER
+
+        profiler = profiler or NULL_PROFILER
 
         # recolectar los tipos
-        type_collector = typecollector.TypeCollector()
+        type_collector = typecollector.TypeCollector(recover=recover)
         try:
-            type_collector.visit(self)
+            with profiler.stage("semantic.collector"):
+                type_collector.visit(self)
         except SemanticError as e:
             type_collector.errors.append(e.text)
 
         if type_collector.errors:
-            return type_collector.errors, type_collector.context, None
+            errors = type_collector.errors
+            return (sort_errors(errors) if recover else errors), type_collector.context, None
 
         # Construir los tipos detectados en el contexto
         assert type_collector.context is not None
         type_builder = typebuilder.TypeBuilder(
-            type_collector.context, type_collector.errors
+            type_collector.context, type_collector.errors, recover
         )
         try:
-            type_builder.visit(self)
+            with profiler.stage("semantic.builder"):
+                type_builder.visit(self)
         except SemanticError as e:
             type_builder.errors.append(e.text)
 
@@ -58,18 +99,25 @@ class ProgramNode(Node):
 
         errors = type_builder.errors
         scope = None
-        if not errors:
+        if not errors or recover:
+            with profiler.stage("semantic.hierarchy"):
+                context.build_hierarchy()
+                context.build_member_tables()
             try:
-                inferer = inference.TypeInferer(type_builder.context, errors=errors)
-                for d in range(1, deep + 1):
-                    scope = inferer.visit(self, scope=scope, deep=d)
+                with profiler.stage("semantic.inference"):
+                    inferer = inference.TypeInferer(type_builder.context, errors=errors, recover=recover)
+                    scope = inferer.visit(self)
             except SemanticError as e:
                 errors.append(e.text)
         # reportar los errores
+        if recover:
+            errors = sort_errors(errors)
         return errors, type_builder.context, scope
 
 
 class Param(DeclarationNode):
+    __slots__ = ("id", "type")
+
     def __init__(self, idx, typex, line, column):
         self.id, self.type = idx, typex
         self.line = line
@@ -80,6 +128,8 @@ class Param(DeclarationNode):
 
 
 class MethodDef(DeclarationNode):
+    __slots__ = ("idx", "param_list", "return_type", "statements", "ret_col")
+
     def __init__(
         self,
         idx: str,
@@ -100,6 +150,8 @@ class MethodDef(DeclarationNode):
 
 
 class AttributeDef(DeclarationNode):
+    __slots__ = ("idx", "typex", "default_value")
+
     def __init__(self, idx: str, typex: str, line, column, default_value=None):
         self.idx: str = idx
         self.typex: str = typex
@@ -109,6 +161,8 @@ class AttributeDef(DeclarationNode):
 
 
 class VariableDeclaration(ExpressionNode):
+    __slots__ = ("var_list", "block_statements")
+
     def __init__(self, var_list, line, column, block_statements=None):
         self.var_list: List[
             Tuple[str, str, Optional[ExpressionNode], int, int]
@@ -119,6 +173,8 @@ class VariableDeclaration(ExpressionNode):
 
 
 class BinaryNode(ExpressionNode):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right, line, column):
         self.left: ExpressionNode = left
         self.right: ExpressionNode = right
@@ -127,11 +183,15 @@ class BinaryNode(ExpressionNode):
 
 
 class AtomicNode(ExpressionNode):
+    __slots__ = ("lex",)
+
     def __init__(self, lex):
         self.lex = lex
 
 
 class IfThenElseNode(ExpressionNode):
+    __slots__ = ("cond", "expr1", "expr2")
+
     def __init__(self, cond, expr1, expr2, line, column):
         self.cond: ExpressionNode = cond
         self.expr1: ExpressionNode = expr1
@@ -141,26 +201,36 @@ class IfThenElseNode(ExpressionNode):
 
 
 class PlusNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super(PlusNode, self).__init__(left, right, line, column)
 
 
 class DifNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super(DifNode, self).__init__(left, right, line, column)
 
 
 class MulNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super(MulNode, self).__init__(left, right, line, column)
 
 
 class DivNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super(DivNode, self).__init__(left, right, line, column)
 
 
 class FunCall(ExpressionNode):
+    __slots__ = ("obj", "id", "args")
+
     def __init__(self, obj, idx, arg_list, line, column):
         self.obj: Union[str, ExpressionNode] = obj
         self.id: str = idx
@@ -170,6 +240,8 @@ class FunCall(ExpressionNode):
 
 
 class ParentFuncCall(ExpressionNode):
+    __slots__ = ("obj", "parent_type", "idx", "arg_list")
+
     def __init__(self, obj, parent_type, idx, arg_list, line, column):
         self.obj: ExpressionNode = obj
         self.parent_type: str = parent_type
@@ -180,6 +252,8 @@ class ParentFuncCall(ExpressionNode):
 
 
 class AssignNode(ExpressionNode):
+    __slots__ = ("idx", "expr")
+
     def __init__(self, idx, expr, line, column):
         self.idx: str = idx
         self.expr: ExpressionNode = expr
@@ -188,11 +262,17 @@ class AssignNode(ExpressionNode):
 
 
 class IntegerConstant(AtomicNode):
-    def __init__(self, lex):
+    __slots__ = ()
+
+    def __init__(self, lex, line, column):
         super(IntegerConstant, self).__init__(int(lex))
+        self.line = line
+        self.column = column
 
 
 class StringConstant(AtomicNode):
+    __slots__ = ()
+
     def __init__(self, lex, line, column):
         super(StringConstant, self).__init__(lex)
         self.line = line
@@ -200,46 +280,68 @@ class StringConstant(AtomicNode):
 
 
 class TypeNode(AtomicNode):
+    __slots__ = ()
+
     def __init__(self, lex):
         super(TypeNode, self).__init__(lex)
 
 
 class BoleanNode(TypeNode):
+    __slots__ = ("val",)
+
     def __init__(self, val):
         self.val = True if val == "true" else False
 
 
 class FalseConstant(AtomicNode):
-    def __init__(self):
+    __slots__ = ()
+
+    def __init__(self, line, column):
         super(FalseConstant, self).__init__("False")
+        self.line = line
+        self.column = column
 
 
 class TrueConstant(AtomicNode):
-    def __init__(self):
+    __slots__ = ()
+
+    def __init__(self, line, column):
         super(TrueConstant, self).__init__("True")
+        self.line = line
+        self.column = column
 
 
 class StringTypeNode(TypeNode):
+    __slots__ = ()
+
     def __init__(self):
         super(StringTypeNode, self).__init__("String")
 
 
 class IntegerTypeNode(TypeNode):
+    __slots__ = ()
+
     def __init__(self):
         super(IntegerTypeNode, self).__init__("Int")
 
 
 class ObjectTypeNode(TypeNode):
+    __slots__ = ()
+
     def __init__(self):
         super(ObjectTypeNode, self).__init__("Object")
 
 
 class VoidTypeNode(TypeNode):
+    __slots__ = ()
+
     def __init__(self):
         super(VoidTypeNode, self).__init__("Void")
 
 
 class ClassDef(DeclarationNode):
+    __slots__ = ("idx", "features", "parent")
+
     def __init__(self, idx, features, line, colum, parent="Object"):
         self.idx: str = idx
         self.features: List[Union[MethodDef, AttributeDef]] = features
@@ -249,6 +351,8 @@ class ClassDef(DeclarationNode):
 
 
 class VariableCall(ExpressionNode):
+    __slots__ = ("idx",)
+
     def __init__(self, idx, line, column):
         self.idx: str = idx
         self.line = line
@@ -256,31 +360,43 @@ class VariableCall(ExpressionNode):
 
 
 class GreaterThanNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super(GreaterThanNode, self).__init__(left, right, line, column)
 
 
 class LowerThanNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super(LowerThanNode, self).__init__(left, right, line, column)
 
 
 class EqualToNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super().__init__(left, right, line, column)
 
 
 class LowerEqual(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super().__init__(left, right, line, column)
 
 
 class GreaterEqualNode(BinaryNode):
+    __slots__ = ()
+
     def __init__(self, left, right, line, column):
         super().__init__(left, right, line, column)
 
 
 class NotNode(AtomicNode):
+    __slots__ = ()
+
     def __init__(self, lex, line, column):
         super().__init__(lex)
         self.line = line
@@ -288,6 +404,8 @@ class NotNode(AtomicNode):
 
 
 class NegNode(AtomicNode):
+    __slots__ = ()
+
     def __init__(self, lex, line, column):
         super().__init__(lex)
         self.line = line
@@ -295,6 +413,8 @@ class NegNode(AtomicNode):
 
 
 class InstantiateClassNode(ExpressionNode):
+    __slots__ = ("type_", "args")
+
     def __init__(self, type_, line, column, args=None):
         self.type_: str = type_
         self.args = args
@@ -303,6 +423,8 @@ class InstantiateClassNode(ExpressionNode):
 
 
 class WhileBlockNode(ExpressionNode):
+    __slots__ = ("cond", "statements")
+
     def __init__(self, cond, statements, line, column):
         super().__init__(line, column)
         self.cond: ExpressionNode = cond
@@ -310,6 +432,8 @@ class WhileBlockNode(ExpressionNode):
 
 
 class ActionNode(ExpressionNode):
+    __slots__ = ("actions", "idx", "typex")
+
     def __init__(self, idx, typex, expresion, line, column):
         self.actions: ExpressionNode = expresion
         self.idx: str = idx
@@ -319,6 +443,8 @@ class ActionNode(ExpressionNode):
 
 
 class CaseNode(ExpressionNode):
+    __slots__ = ("expression", "actions")
+
     def __init__(self, expression, actions, line, column):
         self.expression: ExpressionNode = expression
         self.actions: List[ActionNode] = actions
@@ -327,6 +453,8 @@ class CaseNode(ExpressionNode):
 
 
 class BlockNode(ExpressionNode):
+    __slots__ = ("expressions",)
+
     def __init__(self, expressions, line, column):
         self.expressions: List[ExpressionNode] = expressions
         self.line = line
@@ -334,12 +462,16 @@ class BlockNode(ExpressionNode):
 
 
 class IsVoidNode(ExpressionNode):
+    __slots__ = ("expr",)
+
     def __init__(self, expr, line, column):
         super().__init__(line, column)
         self.expr: ExpressionNode = expr
 
 
 class SelfNode(ExpressionNode):
+    __slots__ = ()
+
     def __init__(self, line, column) -> None:
         self.line = line
         self.column = column
\ No newline at end of file
@@ -0,0 +1,116 @@
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+from automatons.deterministic import DFA
+
+
+def hopcroft(states: int, alphabet: Iterable[Hashable],
+             transitions: Dict[Tuple[int, Hashable], int],
+             partition: Iterable[Set[int]]) -> List[int]:
+    """
+    Algoritmo de Hopcroft para minimizar un automata finito determinista.
+
+    Los estados son los enteros 0..states-1 y `transitions` es la funcion de
+    transicion parcial: las transiciones que faltan van a un estado sumidero
+    implicito. `partition` es la particion inicial de los estados, los estados
+    de un mismo bloque son los que no se distinguen a priori (por ejemplo los
+    finales, o los finales que reconocen el mismo token). Los estados que no
+    aparecen en ningun bloque forman, junto al sumidero, el bloque de los
+    estados de rechazo.
+
+    Se refina la particion hasta que ningun simbolo separe dos estados de un
+    mismo bloque. Devuelve el bloque de cada estado en el automata minimo,
+    numerados en orden de aparicion; los estados equivalentes al sumidero
+    (que no alcanzan ningun estado final) reciben -1.
+    """
+    alphabet = list(alphabet)
+    sink = states
+
+    # Funcion de transicion inversa, incluyendo las transiciones al sumidero
+    inverse = {symbol: {} for symbol in alphabet}
+    for symbol in alphabet:
+        back = inverse[symbol]
+        for state in range(states + 1):
+            target = transitions.get((state, symbol), sink) if state != sink else sink
+            back.setdefault(target, []).append(state)
+
+    blocks: List[Set[int]] = []
+    block_of = [0] * (states + 1)
+    seen = set()
+    for group in partition:
+        group = set(group) - seen
+        if group:
+            seen |= group
+            for state in group:
+                block_of[state] = len(blocks)
+            blocks.append(group)
+    rest = set(range(states)) - seen
+    rest.add(sink)
+    for state in rest:
+        block_of[state] = len(blocks)
+    blocks.append(rest)
+
+    pending = list(range(len(blocks)))
+    waiting = set(pending)
+    while pending:
+        splitter = pending.pop()
+        waiting.discard(splitter)
+        splitter = list(blocks[splitter])
+        for symbol in alphabet:
+            back = inverse[symbol]
+            touched: Dict[int, Set[int]] = {}
+            for target in splitter:
+                for state in back.get(target, ()):
+                    touched.setdefault(block_of[state], set()).add(state)
+
+            for block, inside in touched.items():
+                if len(inside) == len(blocks[block]):
+                    continue
+                blocks[block] -= inside
+                new = len(blocks)
+                blocks.append(inside)
+                for state in inside:
+                    block_of[state] = new
+                if block in waiting or len(inside) <= len(blocks[block]):
+                    pending.append(new)
+                    waiting.add(new)
+                else:
+                    pending.append(block)
+                    waiting.add(block)
+
+    dead = block_of[sink]
+    numbers = {}
+    result = []
+    for state in range(states):
+        block = block_of[state]
+        if block == dead:
+            result.append(-1)
+        else:
+            result.append(numbers.setdefault(block, len(numbers)))
+    return result
+
+
+def minimize(automaton: DFA) -> DFA:
+    """
+    Devuelve el DFA minimo equivalente a `automaton`.
+    """
+    transitions = {
+        (origin, symbol): destinations[0]
+        for origin, symbols in automaton.transitions.items()
+        for symbol, destinations in symbols.items()
+    }
+    finals = set(automaton.finals)
+    block = hopcroft(automaton.states, automaton.vocabulary, transitions, [finals])
+
+    start = block[automaton.start]
+    if start < 0:
+        return DFA(states=1, finals=[], transitions={})
+
+    # Renumerar para que el estado inicial sea el 0
+    order = [start] + [b for b in range(max(block) + 1) if b != start]
+    number = {b: n for n, b in enumerate(order)}
+    minimal = {
+        (number[block[origin]], symbol): number[block[destination]]
+        for (origin, symbol), destination in transitions.items()
+        if block[origin] >= 0 and block[destination] >= 0
+    }
+    minimal_finals = {number[block[state]] for state in finals}
+    return DFA(len(order), minimal_finals, minimal)
@@ -31,8 +31,8 @@ class State:
         closure = self.epsilon_closure
         start = State(tuple(closure), any(s.final for s in closure))
 
-        closures = [closure]
-        states = [start]
+        # Indice de las clausuras ya descubiertas para no compararlas una a una
+        closures = {frozenset(closure): start}
         pending = [start]
 
         while pending:
@@ -41,17 +41,15 @@ class State:
 
             for symbol in symbols:
                 move = self.move_by_state(symbol, *state.state)
-                closure = self.epsilon_closure_by_state(*move)
+                closure = frozenset(self.epsilon_closure_by_state(*move))
 
-                if closure not in closures:
+                try:
+                    new_state = closures[closure]
+                except KeyError:
                     new_state = State(tuple(closure),
                                       any(s.final for s in closure))
-                    closures.append(closure)
-                    states.append(new_state)
+                    closures[closure] = new_state
                     pending.append(new_state)
-                else:
-                    index = closures.index(closure)
-                    new_state = states[index]
 
                 state.add_transition(symbol, new_state)
 
@@ -83,15 +81,14 @@ class State:
 
     @staticmethod
     def epsilon_closure_by_state(*states):
-        closure = {state for state in states}
-
-        l = 0
-        while l != len(closure):
-            l = len(closure)
-            tmp = [s for s in closure]
-            for s in tmp:
-                for epsilon_state in s.epsilon_transitions:
+        closure = set(states)
+        pending = list(states)
+
+        while pending:
+            for epsilon_state in pending.pop().epsilon_transitions:
+                if epsilon_state not in closure:
                     closure.add(epsilon_state)
+                    pending.append(epsilon_state)
         return closure
 
     @property
@@ -22,7 +22,7 @@ def nfa_to_deterministic(automaton: NFA):
     start = compute_epsilon_closure(automaton, [automaton.start])
     start.state = 0
     pending = [start]
-    aut_states = [start]
+    aut_states = {frozenset(start): start}
     start.is_final = any(s in automaton.finals for s in start)
     n = 1
     while pending:
@@ -40,17 +40,18 @@ def nfa_to_deterministic(automaton: NFA):
                     assert False, "Automato Finito Determinista Invalido"
                 except KeyError:
                     next_state = compute_epsilon_closure(automaton, next_state)
-                    if next_state not in aut_states:
+                    key = frozenset(next_state)
+                    if key not in aut_states:
                         next_state.state = n
                         next_state.is_final = any(s in automaton.finals
                                                   for s in next_state)
                         pending.append(next_state)
-                        aut_states.append(next_state)
+                        aut_states[key] = next_state
                         n += 1
                     else:
-                        next_state = aut_states[aut_states.index(next_state)]
+                        next_state = aut_states[key]
                     transitions[state.state, symbol] = next_state.state
 
-    finals = [s.state for s in aut_states if s.is_final]
+    finals = [s.state for s in aut_states.values() if s.is_final]
     dfa = DFA(n, finals, transitions)
     return dfa
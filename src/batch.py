@@ -0,0 +1,142 @@
+"""
+Compilacion de muchos programas Cool en paralelo.
+
+Recibe ficheros, directorios (se buscan los `.cl` recursivamente) o patrones
+glob, y reparte los ficheros entre los procesos de un `ProcessPoolExecutor`.
+Cada proceso carga las tablas del lexer y del parser una sola vez al
+arrancar. Los errores de cada fichero se recogen sin detener el resto de la
+compilacion y cada `.mips` se escribe de forma atomica.
+
+    python batch.py ../tests/codegen ../tests/semantic -j 4
+    python batch.py "corpus/**/*.cl" --json
+"""
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, NamedTuple
+
+
+class Result(NamedTuple):
+    file: str
+    status: int
+    errors: List[str]
+    seconds: float
+
+
+def find_sources(patterns: Iterable[str]) -> List[str]:
+    """
+    Expande los argumentos a la lista ordenada y sin repetidos de ficheros
+    `.cl` a compilar.
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "**", "*.cl"), recursive=True)
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = [m for m in glob.glob(pattern, recursive=True) if os.path.isfile(m)]
+        files.update(os.path.normpath(m) for m in matches)
+    return sorted(files)
+
+
+def preload(lexer: str):
+    from tablecache import load_lexer, load_parser
+
+    load_parser()
+    load_lexer(lexer)
+
+
+def compile_file(file: str, lexer: str, all_errors: bool = False, cache: str = None,
+                 optimize: int = 0, heap_size: int = None, gc_stats: bool = False) -> Result:
+    from classcache import ClassCache
+    from mips.gc import DEFAULT_HEAP_SIZE
+    from pycoolc import CompilationError, compile_program, output_path, write_atomic
+
+    start = time.perf_counter()
+    try:
+        with open(file, "r") as f:
+            program = f.read()
+        classes = ClassCache(cache, optimize) if cache is not None else None
+        source = compile_program(program, lexer, all_errors=all_errors, cache=classes, optimize=optimize,
+                                 heap_size=heap_size or DEFAULT_HEAP_SIZE, gc_stats=gc_stats)
+        write_atomic(output_path(file), source)
+        status, errors = 0, []
+    except CompilationError as e:
+        status, errors = 1, list(dict.fromkeys(e.errors))
+    except Exception:
+        status, errors = 2, [traceback.format_exc().rstrip()]
+    return Result(file, status, errors, time.perf_counter() - start)
+
+
+def compile_all(files: List[str], lexer: str = "re", jobs: int = None, all_errors: bool = False,
+                cache: str = None, optimize: int = 0, heap_size: int = None, gc_stats: bool = False):
+    """
+    Compila `files` en `jobs` procesos (por defecto uno por nucleo) y
+    devuelve los resultados en el mismo orden. Con `all_errors` se reportan
+    todos los errores semanticos de cada fichero. Si `cache` es un
+    directorio, se guarda y reutiliza en el el codigo de cada clase (ver
+    `classcache`). `optimize` es el nivel de `-O` de pycoolc, y `heap_size`
+    y `gc_stats` sus opciones del recolector de basura.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) <= 1:
+        preload(lexer)
+        return [compile_file(f, lexer, all_errors, cache, optimize, heap_size, gc_stats) for f in files]
+
+    # Con fork los procesos heredan las tablas ya cargadas por el padre
+    preload(lexer)
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ProcessPoolExecutor(jobs, context, initializer=preload, initargs=(lexer,)) as pool:
+        n = len(files)
+        return list(pool.map(compile_file, files, [lexer] * n, [all_errors] * n, [cache] * n,
+                             [optimize] * n, [heap_size] * n, [gc_stats] * n))
+
+
+if __name__ == "__main__":
+    from classcache import DEFAULT_DIR
+    from pycoolc import heap_size
+
+    parser = ArgumentParser(description="Compile many Cool files in parallel.")
+    parser.add_argument("paths", nargs="+", help="Cool files, directories or glob patterns.")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of worker processes (default: one per core).")
+    parser.add_argument("--lexer", choices=("re", "dfa"), default="re")
+    parser.add_argument("--all-errors", action="store_true",
+                        help="Report every semantic error of each file, not just the first.")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_DIR, metavar="DIR",
+                        help="Reuse the generated code of unchanged classes, stored in DIR "
+                        f"(default: {DEFAULT_DIR}).")
+    parser.add_argument("-O", "--optimize", type=int, nargs="?", const=1, default=0, choices=(0, 1, 2),
+                        metavar="LEVEL", help="Optimization level of the CIL code (see pycoolc.py).")
+    parser.add_argument("--heap-size", type=heap_size, default=None, metavar="BYTES",
+                        help="Initial heap of the generated programs (see pycoolc.py).")
+    parser.add_argument("--gc-stats", action="store_true",
+                        help="Make the generated programs print garbage collector statistics.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+    files = find_sources(args.paths)
+    start = time.perf_counter()
+    results = compile_all(files, args.lexer, args.jobs, args.all_errors, args.cache, args.optimize,
+                          args.heap_size, args.gc_stats)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        json.dump([r._asdict() for r in results], sys.stdout, indent=2)
+        print()
+    else:
+        for result in results:
+            if result.status == 0:
+                print(f"{result.file}: ok")
+            for error in result.errors:
+                print(f"{result.file}: {error}")
+        failed = sum(1 for r in results if r.status)
+        print(f"{len(results)} files, {failed} with errors, {elapsed:.2f}s")
+    sys.exit(1 if any(r.status for r in results) else 0)
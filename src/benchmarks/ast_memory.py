@@ -0,0 +1,85 @@
+"""
+Mide la memoria que ocupa el AST por nodo con los nodos de `abstract.tree`
+(con `__slots__`) y con nodos equivalentes que guardan sus campos en un
+`__dict__` por instancia, como eran antes.
+
+El corpus son los programas de tests/codegen repetidos `--scale` veces. Se
+construyen los AST y se copian con cada tipo de nodo midiendo con
+tracemalloc lo que reserva la copia: los nodos y las listas que contienen
+(las cadenas y los enteros se comparten con el original).
+
+Uso (desde src): python -m benchmarks.ast_memory --scale 20
+"""
+import glob
+import os
+import tracemalloc
+from argparse import ArgumentParser
+
+import abstract.tree as tree
+from comments import find_comments
+from profiling import count_nodes
+from tablecache import load_lexer, load_parser
+from typecheck.evaluator import evaluate_right_parse
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                      "tests", "codegen", "*.cl")
+
+
+def build_asts(scale: int):
+    # Cada programa se analiza una vez y su AST se construye `scale` veces
+    tokenizer, parser = load_lexer("re"), load_parser()
+    parses = []
+    for file in sorted(glob.glob(CORPUS)):
+        with open(file) as f:
+            tokens = tokenizer(find_comments(f.read()).replace('\t', ' ' * 4))
+        parses.append((parser(tokens), tokens[:-1]))
+    return [evaluate_right_parse(parse, tokens) for _ in range(scale) for parse, tokens in parses]
+
+
+def node_classes():
+    return [c for c in vars(tree).values() if isinstance(c, type) and issubclass(c, tree.Node)]
+
+
+def rebuild(node, classes):
+    if isinstance(node, tree.Node):
+        copy = object.__new__(classes[type(node)])
+        for name, value in node.fields():
+            setattr(copy, name, rebuild(value, classes))
+        return copy
+    if isinstance(node, list):
+        return [rebuild(item, classes) for item in node]
+    if isinstance(node, tuple):
+        return tuple(rebuild(item, classes) for item in node)
+    return node
+
+
+def measure(asts, classes) -> int:
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        copy = rebuild(asts, classes)
+        size = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    del copy
+    return size
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--scale', type=int, default=20,
+                        help='Times the tests/codegen corpus is repeated.')
+    args = parser.parse_args()
+
+    asts = build_asts(args.scale)
+    nodes = sum(count_nodes(ast) for ast in asts)
+    slots = {c: c for c in node_classes()}
+    # Las mismas clases sin __slots__: cada instancia tiene su __dict__
+    dicts = {c: type(c.__name__, (), {}) for c in node_classes()}
+
+    before = measure(asts, dicts)
+    after = measure(asts, slots)
+    print(f'nodes: {nodes}')
+    print(f'__dict__ nodes:  {before / nodes:8.1f} bytes/node  {before / 1024:10.1f} KiB')
+    print(f'__slots__ nodes: {after / nodes:8.1f} bytes/node  {after / 1024:10.1f} KiB')
+    print(f'saved:           {100 * (before - after) / before:8.1f}%')
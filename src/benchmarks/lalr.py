@@ -0,0 +1,55 @@
+"""
+Compara la construccion de las tablas LALR(1) por propagacion de lookaheads
+(`build_lalr_automaton`) con la construccion original, que arma el automata
+LR(1) completo y mezcla los estados con el mismo centro
+(`build_lalr_automaton_by_merging`), y verifica que las tablas coinciden.
+
+Uso (desde src): python -m benchmarks.lalr
+"""
+from time import perf_counter
+from coolgrammar.grammar import build_cool_grammar
+import parserr.lr as lr
+
+
+def tables(parser):
+    action = {(state, t.Name): (act, str(tag))
+              for (state, t), (act, tag) in parser.action.items()}
+    goto = {(state, nt.Name): target
+            for (state, nt), target in parser.goto.items()}
+    return action, goto
+
+
+def build(builder):
+    G, _ = build_cool_grammar()
+    default = lr.build_lalr_automaton
+    lr.build_lalr_automaton = builder
+    try:
+        start = perf_counter()
+        parser = lr.LALRParser(G)
+        return parser, perf_counter() - start
+    finally:
+        lr.build_lalr_automaton = default
+
+
+if __name__ == '__main__':
+    propagation, propagation_time = build(lr.build_lalr_automaton)
+    merging, merging_time = build(lr.build_lalr_automaton_by_merging)
+
+    print(f'LR(0) + propagation: {propagation_time:8.3f}s')
+    print(f'LR(1) + merging:     {merging_time:8.3f}s')
+    print(f'speedup:             {merging_time / propagation_time:8.1f}x')
+
+    new_action, new_goto = tables(propagation)
+    old_action, old_goto = tables(merging)
+    print(f'states: {len(set(s for s, _ in new_action))}, '
+          f'action entries: {len(new_action)}, goto entries: {len(new_goto)}')
+    differences = [(key, new_action.get(key), old_action.get(key))
+                   for key in sorted(set(new_action) | set(old_action))
+                   if new_action.get(key) != old_action.get(key)]
+    differences += [(key, new_goto.get(key), old_goto.get(key))
+                    for key in sorted(set(new_goto) | set(old_goto))
+                    if new_goto.get(key) != old_goto.get(key)]
+    for key, new, old in differences:
+        print(f'  {key}: propagation={new} merging={old}')
+    print('tables are identical' if not differences else
+          f'{len(differences)} different entries')
@@ -2,13 +2,14 @@ import re
 from typing import List, Optional, Any, Dict, Tuple
 from abstract.tree import ClassDef
 import cil.nodes as nodes
-from abstract.semantics import Attribute, VariableInfo, Context, Type, Method
+from abstract.semantics import Attribute, VariableInfo, Context, Type, Method, Hierarchy
 from cil.nodes import (
-    AbortNode, AllocateIntNode,
+    AbortNode, AllocateBoolNode, AllocateIntNode,
     AllocateStringNode,
     ConcatString,
     CopyNode,
     GetAttributeNode,
+    GetValue,
     PrintIntNode,
     PrintNode,
     ReadIntNode,
@@ -37,11 +38,6 @@ class InheritanceGraph:
         # Tabla LCA
         self.tdt: TDT = {}
 
-        self._discover: Dict[str, int] = {}
-        self._finalization: Dict[str, int] = {}
-        self.__time = 0
-        self.root_distance: Dict[str, int] = {}
-
     def add_edge(self, parent: str, child: str) -> None:
         # Agregar una arista a la lista de adyacencia.
         try:
@@ -55,39 +51,6 @@ class InheritanceGraph:
         except KeyError:
             self._adytable[child] = [parent]
 
-    def __ancestor(self, node_x: str, node_y: str) -> bool:
-        # Devuelve true si x es ancestro de y.
-        # Para realizar este calculo nos basamos en el arbol
-        # construido por el DFS, y tenemos en cuenta los tiempos
-        # de descubrimiento y finalizacion
-        return (
-            self._discover[node_x]
-            < self._discover[node_y]
-            < self._finalization[node_y]
-            < self._finalization[node_x]
-        )
-
-    def __distance_from(self, node_x: str, node_y: str) -> int:
-        # Si x es ancestro de y, entonces la distancia entre ellos
-        # se calcula como d[y] - d[x], si x no es ancenstro de y,
-        # entonces podemos definir la distancia entre ellos como infinito
-        if self.__ancestor(node_x, node_y):
-            return self.root_distance[node_y] - self.root_distance[node_x]
-        else:
-            return -1
-
-    def __dfs(self, root: str, visited: Dict[str, bool], deep=0):
-        visited[root] = True
-        self._discover[root] = self.__time
-        self.root_distance[root] = deep
-        self.__time += 1
-
-        for v in self._adytable[root]:
-            if not visited[v]:
-                self.__dfs(v, visited, deep + 1)
-                self.__time += 1
-        self._finalization[root] = self.__time
-
     def tp_sort(self, root: str, visited: Dict[str, bool], result):
         visited[root] = True
         for v in self._adytable[root]:
@@ -95,24 +58,22 @@ class InheritanceGraph:
                 self.tp_sort(v, visited, result)
         result.append(root)
 
-    def build_tdt(self):
+    def build_tdt(self, hierarchy: Hierarchy):
         # Construir una tabla de distancia para cada Nodo del arbol.
         # En dicha tabla, tdt[x, y] = d donde d es la distancia entre
         # el nodo x y el nodo y, si x es ancestro de y, entonces d >= 1,
-        # si x == y, d = 0 y d = -1 en otro caso
-        visited = {node: False for node in self._adytable}
-
-        # Realizar un recorrido dfs para inicializar los array d y f
-        root = "Object"
-        self.__dfs(root, visited)
-
-        # Construir la tabla
-        for nodex in self._adytable:
-            for nodey in self._adytable:
+        # si x == y, d = 0 y d = -1 en otro caso.
+        # Los tiempos de descubrimiento y finalizacion del DFS y la
+        # profundidad de cada nodo se toman del indice de la jerarquia.
+        numbers = {node: hierarchy.number[node] for node in self._adytable}
+        for nodex, x in numbers.items():
+            for nodey, y in numbers.items():
                 if nodey == nodex:
                     self.tdt[(nodex, nodey)] = 0
+                elif hierarchy.ancestor(x, y):
+                    self.tdt[(nodex, nodey)] = hierarchy.depth[y] - hierarchy.depth[x]
                 else:
-                    self.tdt[(nodex, nodey)] = self.__distance_from(nodex, nodey)
+                    self.tdt[(nodex, nodey)] = -1
 
 
 class BaseCoolToCilVisitor:
@@ -120,7 +81,7 @@ class BaseCoolToCilVisitor:
     Clase base para el visitor que transforma un AST de COOL en un AST de CIL.
     """
 
-    def __init__(self, context: Context):
+    def __init__(self, context: Context, cache=None):
         self.dot_types: List[nodes.TypeNode] = []
         self.dot_data: List[Any] = []
         self.dot_code: List[nodes.FunctionNode] = []
@@ -132,7 +93,25 @@ class BaseCoolToCilVisitor:
         self.abortion = self.register_data('"Abort called from class "')
         self.newLine = self.register_data(r'"\n"')
         self.__inheritance_graph = None
-        self.__labels_count: int = 0
+        # Los labels y las cadenas de cada clase se numeran desde 0 y llevan
+        # el nombre de la clase, asi el codigo de una clase no depende de las
+        # clases que se generaron antes (ver classcache).
+        self.labels_count: int = 0
+        self.data_count: int = 0
+        # Cache de clases compiladas: las clases que se toman de ella y las
+        # que se generaron en esta compilacion para guardarlas despues.
+        self.cache = cache
+        self.cached_classes = 0
+        self.compiled_classes: List[Tuple[str, List[nodes.FunctionNode], List[nodes.DataNode]]] = []
+        # Bytes de las tablas virtuales que se ahorran al disponerlas (ver
+        # cil.vtables).
+        self.vtable_saved = 0
+        # Locales que guardan un Int o un Bool sin encapsular (ver unbox), la
+        # instancia de la que se obtuvo el valor de cada uno y, en el metodo
+        # actual, el local sin encapsular de cada parametro Int o Bool.
+        self.unboxed: Dict[str, str] = {}
+        self.boxes: Dict[str, Any] = {}
+        self.unboxed_params: Dict[str, nodes.LocalNode] = {}
         self.__build_CART()
         self.build_builtins()
 
@@ -171,18 +150,81 @@ class BaseCoolToCilVisitor:
         return param_node
 
     def register_local(self, vinfo: VariableInfo) -> nodes.LocalNode:
+        # Las variables Int y Bool guardan el valor sin encapsular
         assert self.current_function is not None
         name = (
             f"local_{self.current_function.name[9:]}_{vinfo.name}_{len(self.localvars)}"
         )
         local_node = nodes.LocalNode(name)
         self.localvars.append(local_node)
+        if vinfo.type is not None and vinfo.type.name in ("Int", "Bool"):
+            self.unboxed[name] = vinfo.type.name
+            local_node.raw = True
         return local_node
 
     def define_internal_local(self) -> nodes.LocalNode:
         vinfo = VariableInfo("internal")
         return self.register_local(vinfo)
 
+    # *************** VALORES SIN ENCAPSULAR *****************
+    # Un Int o un Bool en un local es la palabra con su valor, no un puntero
+    # a una instancia: la aritmetica y las comparaciones no reservan memoria.
+    # El valor se encapsula (AllocateIntNode / AllocateBoolNode) solo cuando
+    # pasa a un lugar donde se espera un objeto: un atributo, un argumento o
+    # el objeto de un dispatch, el valor de retorno de un metodo o un case.
+    # Al reves, GetValue obtiene el valor de una instancia. Los Int y Bool no
+    # cambian, asi que un valor que se obtuvo de una instancia se vuelve a
+    # encapsular con la misma instancia (ver boxes).
+
+    def define_unboxed_local(self, type_name: str) -> nodes.LocalNode:
+        local = self.define_internal_local()
+        self.unboxed[local.name] = type_name
+        local.raw = True
+        return local
+
+    def unboxed_type(self, value) -> Optional[str]:
+        # "Int" o "Bool" si value es un local sin encapsular
+        if isinstance(value, nodes.LocalNode):
+            return self.unboxed.get(value.name)
+        return None
+
+    def box_into(self, dest, value) -> nodes.InstructionNode:
+        if value.name in self.boxes:
+            return nodes.AssignNode(dest, self.boxes[value.name])
+        if self.unboxed_type(value) == "Bool":
+            return AllocateBoolNode(dest, value)
+        return AllocateIntNode(dest, value)
+
+    def box(self, value):
+        if self.unboxed_type(value) is None:
+            return value
+        if value.name in self.boxes:
+            return self.boxes[value.name]
+        local = self.define_internal_local()
+        self.register_instruction(self.box_into(local, value))
+        return local
+
+    def unbox(self, value, type_name: str):
+        if self.unboxed_type(value) is not None:
+            return value
+        local = self.define_unboxed_local(type_name)
+        self.register_instruction(GetValue(local, value))
+        # local no se vuelve a escribir (salvo el de un parametro, ver
+        # MethodDef) y la instancia es la de la expresion que se acaba de
+        # evaluar.
+        self.boxes[local.name] = value
+        return local
+
+    def assign(self, dest, value) -> None:
+        # Asignar value a dest en la representacion de dest
+        type_name = self.unboxed_type(dest)
+        if type_name is not None:
+            self.register_instruction(nodes.AssignNode(dest, self.unbox(value, type_name)))
+        elif self.unboxed_type(value) is not None:
+            self.register_instruction(self.box_into(dest, value))
+        else:
+            self.register_instruction(nodes.AssignNode(dest, value))
+
     def to_function_name(self, method_name: str, type_name: str) -> str:
         return f"function_{method_name}_at_{type_name}"
 
@@ -203,14 +245,20 @@ class BaseCoolToCilVisitor:
         return type_node
 
     def register_data(self, value: Any) -> nodes.DataNode:
-        vname = f"data_{len(self.dot_data)}"
+        if self.current_type is None:
+            vname = f"data_{len(self.dot_data)}"
+        else:
+            vname = f"data_{self.current_type.name}_{self.data_count}"
+            self.data_count += 1
         data_node = nodes.DataNode(vname, value)
         self.dot_data.append(data_node)
         return data_node
 
     def do_label(self, label: str) -> str:
-        self.__labels_count += 1
-        return f"label_{label}_{self.__labels_count}"
+        self.labels_count += 1
+        if self.current_type is None:
+            return f"label_{label}_{self.labels_count}"
+        return f"label_{label}_{self.current_type.name}_{self.labels_count}"
 
     def __build_CART(self) -> None:
         """
@@ -231,7 +279,7 @@ class BaseCoolToCilVisitor:
 
         # Crear la TDT
         self.__inheritance_graph = graph
-        graph.build_tdt()
+        graph.build_tdt(self.context.hierarchy or self.context.build_hierarchy())
         self.tdt_table = graph.tdt
 
         # Procesar la TDT para hacerla accesible en runtime.
@@ -348,7 +396,7 @@ class BaseCoolToCilVisitor:
     def __implement_length(self):
         str_ = self.context.get_type("String")
         self.current_function = self.register_function("function_length_at_String")
-        return_vm_holder = self.define_internal_local()
+        return_vm_holder = self.define_unboxed_local("Int")
         int_const_vm_holder = self.define_internal_local()
         self.register_instruction(GetAttributeNode(str_, "length", return_vm_holder))
         self.register_instruction(AllocateIntNode(int_const_vm_holder, return_vm_holder))
@@ -403,6 +451,10 @@ class BaseCoolToCilVisitor:
         str__.attributes.append(Attribute("value", str__))
         str__.attributes.append(Attribute("length", self.context.get_type("Int")))
 
+        # Los atributos internos de String y Bool cambian su disposicion
+        str__.build_tables()
+        bool__.build_tables()
+
         self.__implement_in_string()
         self.__implement_out_int()
         self.__implement_out_string()
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Tuple, Union
+from typing import List, Set, Tuple, Union
 from abstract.semantics import Attribute, Method, Type
 """
 Define a hierachy to represent each CIL instruction.
@@ -29,6 +29,8 @@ class TypeNode(CilNode):
         self.name = name
         self.attributes: List[Attribute] = []
         self.methods: List[Tuple[str, str]] = []
+        # Atributos, propios o heredados, con expresion de inicializacion
+        self.initialized: Set[str] = set()
 
 
 class DataNode(CilNode):
@@ -45,14 +47,27 @@ class FunctionNode(CilNode):
         self.instructions = instr
 
 
+class CachedCodeNode(CilNode):
+    """
+    Funciones de una clase cuyo codigo MIPS se tomo de la cache de clases
+    compiladas: `text` ya es el codigo de todas ellas.
+    """
+    def __init__(self, functions: List[str], text: str):
+        self.functions = functions
+        self.text = text
+
+
 class ParamNode(CilNode):
     def __init__(self, name):
         self.name = name
 
 
 class LocalNode(CilNode):
-    def __init__(self, name):
+    def __init__(self, name, raw=False):
         self.name = name
+        # Un local raw guarda un entero y no un puntero a una instancia, el
+        # recolector de basura no lo recorre (ver `mips.gc`)
+        self.raw = raw
 
 
 class InstructionNode(CilNode):
@@ -60,6 +75,11 @@ class InstructionNode(CilNode):
 
 
 class ArithmeticNode(InstructionNode):
+    """
+    Las operaciones aritmeticas y las comparaciones trabajan con valores sin
+    encapsular: sus operandos y su destino son locales que guardan el entero
+    (ver `BaseCoolToCilVisitor.unboxed`).
+    """
     def __init__(self, dest, left, right):
         self.dest = dest
         self.left = left
@@ -324,6 +344,20 @@ class EqualToCilNode(InstructionNode):
         self.dest = dest
 
 
+class LowerThanCilNode(InstructionNode):
+    def __init__(self, left, right, dest) -> None:
+        self.left = left
+        self.right = right
+        self.dest = dest
+
+
+class LowerEqualCilNode(InstructionNode):
+    def __init__(self, left, right, dest) -> None:
+        self.left = left
+        self.right = right
+        self.dest = dest
+
+
 class GetValue(InstructionNode):
     def __init__(self, dest, src) -> None:
         self.dest = dest
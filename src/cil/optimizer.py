@@ -0,0 +1,626 @@
+"""
+Optimizaciones sobre las instrucciones CIL de cada funcion.
+
+`CoolToCILVisitor` crea un local nuevo para cada subexpresion: cada constante
+ocupa su propio local, cada llamada copia el objeto en otro y los valores se
+encapsulan y desencapsulan en cada frontera aunque no haga falta. Las pasadas
+de este modulo limpian ese codigo antes de generar MIPS:
+
+    - `ConstantFolding`: evalua la aritmetica de Int y Bool constantes y los
+      saltos condicionales cuyo resultado se conoce.
+    - `CopyPropagation`: sustituye los locales copiados con `AssignNode` por
+      el local original.
+    - `DeadCodeElimination`: elimina las instrucciones sin efectos cuyo
+      resultado no se usa.
+    - `JumpCleanup`: elimina el codigo inalcanzable, los saltos a la
+      instruccion siguiente y los labels a los que no salta nadie.
+    - `CompactLocals`: quita de `localvars` los locales que ya no aparecen.
+
+El generador de MIPS ubica los locales por su indice en `localvars`, asi que
+un local que se elimina deja de ocupar espacio en el marco de pila.
+
+Las variables de una funcion son sus `LocalNode` y `ParamNode`, y se
+identifican por su nombre. Las instrucciones escriben en su campo `dest`
+(salvo `NotNode`, que niega `src` en su lugar) y leen el resto de los campos
+que sean variables.
+"""
+from copy import copy
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from cil.nodes import (
+    AllocateBoolNode,
+    AllocateIntNode,
+    AllocateNode,
+    AllocateStringNode,
+    AssignNode,
+    BitwiseNotNode,
+    CharToCharStringCompare,
+    CilProgramNode,
+    CompareSTRType,
+    CompareStringLengthNode,
+    CompareType,
+    DivNode,
+    EqualToCilNode,
+    FunctionNode,
+    GetAttributeNode,
+    GetValue,
+    IfZeroJump,
+    InstructionNode,
+    JumpIfGreater,
+    JumpIfGreaterThanZeroNode,
+    LabelNode,
+    LoadNode,
+    LocalNode,
+    LowerEqualCilNode,
+    LowerThanCilNode,
+    MinusNode,
+    MinusNodeComp,
+    NotNode,
+    NotZeroJump,
+    ParamNode,
+    PlusNode,
+    ReferenceEqualNode,
+    ReturnNode,
+    SelfNode,
+    StarNode,
+    TypeName,
+    UnconditionalJump,
+)
+
+Variable = Tuple[bool, str]
+
+INT_MIN = -(2 ** 31)
+INT_MAX = 2 ** 31 - 1
+
+CONDITIONAL_JUMPS = (IfZeroJump, NotZeroJump, JumpIfGreaterThanZeroNode, JumpIfGreater)
+JUMPS = CONDITIONAL_JUMPS + (UnconditionalJump,)
+
+# Instrucciones que solo escriben su destino: si el destino no se usa se
+# pueden eliminar. DivNode no esta porque falla si el divisor es 0, ni las
+# llamadas ni AllocateNode, que ejecuta los inicializadores de los atributos.
+PURE = (
+    AssignNode,
+    AllocateIntNode,
+    AllocateBoolNode,
+    AllocateStringNode,
+    PlusNode,
+    MinusNode,
+    StarNode,
+    GetValue,
+    GetAttributeNode,
+    BitwiseNotNode,
+    NotNode,
+    SelfNode,
+    LoadNode,
+    TypeName,
+    EqualToCilNode,
+    LowerThanCilNode,
+    LowerEqualCilNode,
+    MinusNodeComp,
+    ReferenceEqualNode,
+    CompareType,
+    CompareSTRType,
+    CompareStringLengthNode,
+    CharToCharStringCompare,
+)
+
+
+def variable(value) -> Optional[Variable]:
+    if isinstance(value, ParamNode):
+        return (True, value.name)
+    if isinstance(value, LocalNode):
+        return (False, value.name)
+    return None
+
+
+def written_field(instruction: InstructionNode) -> str:
+    return "src" if isinstance(instruction, NotNode) else "dest"
+
+
+def operands(instruction: InstructionNode) -> List[Tuple[str, Variable]]:
+    """
+    Campos de la instruccion que son variables, con la variable de cada uno.
+    """
+    return [(field, key) for field, key in
+            ((field, variable(value)) for field, value in vars(instruction).items())
+            if key is not None]
+
+
+def defs(instruction: InstructionNode) -> List[Variable]:
+    field = written_field(instruction)
+    return [key for f, key in operands(instruction) if f == field]
+
+
+def uses(instruction: InstructionNode) -> List[Variable]:
+    if isinstance(instruction, NotNode):
+        return [key for _, key in operands(instruction)]
+    return [key for field, key in operands(instruction) if field != "dest"]
+
+
+def fits(value: int) -> bool:
+    return INT_MIN <= value <= INT_MAX
+
+
+class FlowGraph:
+    """
+    Grafo de flujo de una funcion: sus bloques basicos en el orden en que
+    aparecen y el bloque que empieza en cada label.
+    """
+    def __init__(self, blocks: List[List[InstructionNode]]):
+        self.blocks = blocks
+        self.labels: Dict[str, int] = {
+            block[0].label: i for i, block in enumerate(blocks) if isinstance(block[0], LabelNode)
+        }
+
+    @staticmethod
+    def build(instructions: List[InstructionNode]) -> Optional["FlowGraph"]:
+        """
+        Divide las instrucciones en bloques basicos. Devuelve None si algun
+        salto va a un label que no esta en la funcion.
+        """
+        if not instructions:
+            return None
+        blocks: List[List[InstructionNode]] = []
+        current: List[InstructionNode] = []
+        for instruction in instructions:
+            if isinstance(instruction, LabelNode) and current:
+                blocks.append(current)
+                current = []
+            current.append(instruction)
+            if isinstance(instruction, JUMPS + (ReturnNode,)):
+                blocks.append(current)
+                current = []
+        if current:
+            blocks.append(current)
+
+        graph = FlowGraph(blocks)
+        targets = (i.label for i in instructions if isinstance(i, JUMPS))
+        if any(label not in graph.labels for label in targets):
+            return None
+        return graph
+
+    def successors(self, index: int, last: Optional[InstructionNode]) -> List[int]:
+        """
+        Bloques a los que puede pasar el control desde el bloque `index` si
+        su ultima instruccion es `last` (None si se elimino).
+        """
+        following = [index + 1] if index + 1 < len(self.blocks) else []
+        if isinstance(last, ReturnNode):
+            return []
+        if isinstance(last, UnconditionalJump):
+            return [self.labels[last.label]]
+        if isinstance(last, CONDITIONAL_JUMPS):
+            target = self.labels[last.label]
+            return [target] + [b for b in following if b != target]
+        return following
+
+    def predecessors(self) -> List[List[int]]:
+        result: List[List[int]] = [[] for _ in self.blocks]
+        for i, block in enumerate(self.blocks):
+            for successor in self.successors(i, block[-1]):
+                result[successor].append(i)
+        return result
+
+
+class FunctionPass:
+    """
+    Una pasada sobre las instrucciones de una funcion. `run` la transforma
+    en su lugar y devuelve si cambio algo.
+    """
+    name = ""
+
+    def run(self, function: FunctionNode) -> bool:
+        raise NotImplementedError
+
+
+class ForwardPass(FunctionPass):
+    """
+    Pasada basada en un analisis hacia adelante sobre el grafo de flujo. El
+    estado de entrada de cada bloque es el `meet` de las salidas de sus
+    predecesores ya visitados; los bloques a los que nunca se llega se
+    eliminan. Las subclases definen `transfer`, que simula una instruccion
+    sobre el estado y devuelve la instruccion que la sustituye (la misma, una
+    nueva o None para eliminarla); no debe modificar la original, porque
+    durante el analisis el estado todavia puede cambiar.
+    """
+    def transfer(self, instruction: InstructionNode, state: dict) -> Optional[InstructionNode]:
+        raise NotImplementedError
+
+    @staticmethod
+    def meet(a: dict, b: dict) -> dict:
+        return {k: v for k, v in a.items() if k in b and b[k] == v}
+
+    def simulate(self, block: List[InstructionNode], state: dict) -> List[InstructionNode]:
+        result = []
+        for instruction in block:
+            instruction = self.transfer(instruction, state)
+            if instruction is not None:
+                result.append(instruction)
+        return result
+
+    def run(self, function: FunctionNode) -> bool:
+        graph = FlowGraph.build(function.instructions)
+        if graph is None:
+            return False
+
+        blocks = graph.blocks
+        inputs: List[Optional[dict]] = [None] * len(blocks)
+        inputs[0] = {}
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            state = dict(inputs[index])
+            simulated = self.simulate(blocks[index], state)
+            # Si se elimino el salto del final el bloque continua en el siguiente
+            last = simulated[-1] if simulated else None
+            for successor in graph.successors(index, last):
+                previous = inputs[successor]
+                merged = dict(state) if previous is None else self.meet(previous, state)
+                if previous is None or merged != previous:
+                    inputs[successor] = merged
+                    pending.append(successor)
+
+        instructions: List[InstructionNode] = []
+        for block, state in zip(blocks, inputs):
+            if state is not None:
+                instructions.extend(self.simulate(block, dict(state)))
+        changed = len(instructions) != len(function.instructions) or \
+            any(a is not b for a, b in zip(instructions, function.instructions))
+        function.instructions = instructions
+        return changed
+
+
+def divide(a: int, b: int) -> int:
+    # La division de MIPS trunca hacia 0
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+ARITHMETIC = {
+    PlusNode: lambda a, b: a + b,
+    MinusNode: lambda a, b: a - b,
+    StarNode: lambda a, b: a * b,
+    DivNode: lambda a, b: divide(a, b) if b != 0 else None,
+}
+
+COMPARISONS = {
+    EqualToCilNode: lambda a, b: a == b,
+    LowerThanCilNode: lambda a, b: a < b,
+    LowerEqualCilNode: lambda a, b: a <= b,
+}
+
+OBJECT = ("object", None)
+
+
+class ConstantFolding(ForwardPass):
+    """
+    Propagacion de constantes. El estado asocia a cada variable lo que se
+    sabe de su valor:
+        ("raw", n): el valor n sin encapsular (un Int o un Bool en un
+        local, el resultado de GetValue o de una comparacion),
+        ("int", n), ("bool", n): una instancia de Int o Bool con valor n,
+        ("object", None): algun objeto, o sea, un puntero distinto de 0.
+    Las operaciones con operandos conocidos se sustituyen por su resultado
+    si cabe en 32 bits (si no, MIPS daria overflow y eso no se cambia), y
+    los saltos condicionales por un salto incondicional o nada. Las ramas
+    que no se pueden tomar no se visitan, asi que sus asignaciones no
+    cuentan al unir los estados.
+    """
+    name = "fold"
+
+    @staticmethod
+    def known(state: dict, operand, kinds: Iterable[str]) -> Optional[int]:
+        if isinstance(operand, int):
+            return operand if "raw" in kinds else None
+        value = state.get(variable(operand))
+        if value is not None and value[0] in kinds:
+            return value[1]
+        return None
+
+    def branch(self, instruction: InstructionNode, state: dict) -> Optional[bool]:
+        """
+        Si se sabe, dice si el salto condicional se toma.
+        """
+        if isinstance(instruction, JumpIfGreater):
+            left = self.known(state, instruction.left, ("raw",))
+            right = self.known(state, instruction.rigt, ("raw",))
+            if left is None or right is None:
+                return None
+            # La comparacion es sin signo
+            return left % 2 ** 32 > right % 2 ** 32
+
+        value = state.get(variable(instruction.variable))
+        if value is None:
+            return None
+        kind, number = value
+        if isinstance(instruction, JumpIfGreaterThanZeroNode):
+            return number > 0 if kind == "raw" else None
+        # Un objeto nunca es 0
+        zero = number == 0 if kind == "raw" else False
+        return zero if isinstance(instruction, IfZeroJump) else not zero
+
+    def fold(self, instruction: InstructionNode, state: dict) -> Optional[InstructionNode]:
+        boxes = ("int", "bool")
+        if type(instruction) in ARITHMETIC:
+            if isinstance(instruction, (MinusNode, StarNode)):
+                left, right = instruction.x, instruction.y
+            else:
+                left, right = instruction.left, instruction.right
+            a, b = self.known(state, left, ("raw",)), self.known(state, right, ("raw",))
+            if a is not None and b is not None:
+                result = ARITHMETIC[type(instruction)](a, b)
+                if result is not None and fits(result):
+                    return AssignNode(instruction.dest, result)
+
+        elif type(instruction) in COMPARISONS:
+            a = self.known(state, instruction.left, ("raw",))
+            b = self.known(state, instruction.right, ("raw",))
+            if a is not None and b is not None:
+                return AssignNode(instruction.dest, int(COMPARISONS[type(instruction)](a, b)))
+
+        elif isinstance(instruction, MinusNodeComp):
+            a = self.known(state, instruction.left, boxes)
+            b = self.known(state, instruction.right, boxes)
+            if a is not None and b is not None and fits(a - b):
+                return AssignNode(instruction.dest, a - b)
+
+        elif isinstance(instruction, GetValue):
+            value = self.known(state, instruction.src, boxes)
+            if value is not None:
+                return AssignNode(instruction.dest, value)
+
+        elif isinstance(instruction, BitwiseNotNode):
+            value = self.known(state, instruction.src, ("raw",))
+            if value is not None and fits(-value):
+                return AssignNode(instruction.dest, -value)
+
+        elif isinstance(instruction, NotNode):
+            value = self.known(state, instruction.src, ("raw",))
+            if value is not None:
+                return AssignNode(instruction.src, ~value)
+
+        elif isinstance(instruction, (AllocateIntNode, AllocateBoolNode)):
+            if not isinstance(instruction.value, int):
+                value = self.known(state, instruction.value, ("raw",))
+                if value is not None:
+                    return type(instruction)(instruction.dest, value)
+
+        elif isinstance(instruction, AssignNode):
+            value = self.known(state, instruction.source, ("raw",))
+            if value is not None:
+                return AssignNode(instruction.dest, value)
+
+        elif isinstance(instruction, CONDITIONAL_JUMPS):
+            taken = self.branch(instruction, state)
+            if taken is not None:
+                return UnconditionalJump(instruction.label) if taken else None
+
+        return instruction
+
+    def transfer(self, instruction: InstructionNode, state: dict) -> Optional[InstructionNode]:
+        instruction = self.fold(instruction, state)
+        if instruction is None:
+            return None
+
+        value = None
+        if isinstance(instruction, AllocateIntNode):
+            value = ("int", instruction.value) if isinstance(instruction.value, int) else OBJECT
+        elif isinstance(instruction, AllocateBoolNode):
+            value = ("bool", instruction.value) if isinstance(instruction.value, int) else OBJECT
+        elif isinstance(instruction, (AllocateNode, AllocateStringNode, SelfNode)):
+            value = OBJECT
+        elif isinstance(instruction, AssignNode):
+            source = instruction.source
+            value = ("raw", source) if isinstance(source, int) else state.get(variable(source))
+
+        for key in defs(instruction):
+            if value is None:
+                state.pop(key, None)
+            else:
+                state[key] = value
+        return instruction
+
+
+class CopyPropagation(ForwardPass):
+    """
+    Propagacion de copias: despues de `AssignNode(a, b)` y mientras ni `a`
+    ni `b` se vuelvan a escribir, las lecturas de `a` leen `b`. El estado
+    asocia cada variable copiada con la variable de la que es copia. Al
+    sustituir las lecturas la copia suele quedar sin usos y la elimina
+    `DeadCodeElimination`.
+    """
+    name = "copies"
+
+    @staticmethod
+    def meet(a: dict, b: dict) -> dict:
+        return {k: v for k, v in a.items() if k in b and variable(b[k]) == variable(v)}
+
+    def transfer(self, instruction: InstructionNode, state: dict) -> Optional[InstructionNode]:
+        written = written_field(instruction)
+        replaced = None
+        for field, key in operands(instruction):
+            if field != written and key in state:
+                if replaced is None:
+                    replaced = copy(instruction)
+                setattr(replaced, field, state[key])
+        instruction = replaced or instruction
+
+        for key in defs(instruction):
+            state.pop(key, None)
+            for copied in [k for k, v in state.items() if variable(v) == key]:
+                del state[copied]
+
+        if isinstance(instruction, AssignNode):
+            dest, source = variable(instruction.dest), variable(instruction.source)
+            if dest is not None and source is not None and dest != source:
+                state[dest] = instruction.source
+        return instruction
+
+
+class DeadCodeElimination(FunctionPass):
+    """
+    Eliminacion de codigo muerto con un analisis de variables vivas hacia
+    atras. Se eliminan las instrucciones de `PURE` cuyo destino no esta
+    vivo despues de ellas y las asignaciones de una variable a si misma.
+    Las lecturas de una instruccion eliminada no cuentan, asi que una
+    cadena de asignaciones que no llega a usarse desaparece entera.
+    """
+    name = "dce"
+
+    @staticmethod
+    def removable(instruction: InstructionNode, written: List[Variable], live: Set[Variable]) -> bool:
+        if isinstance(instruction, AssignNode):
+            source = variable(instruction.source)
+            if source is not None and source == variable(instruction.dest):
+                return True
+        return isinstance(instruction, PURE) and bool(written) and not any(k in live for k in written)
+
+    def sweep(self, block: List[InstructionNode], live: Set[Variable]):
+        """
+        Recorre el bloque hacia atras a partir de las variables vivas a su
+        salida. Devuelve las instrucciones que se quedan y las variables
+        vivas a su entrada.
+        """
+        kept = []
+        for instruction in reversed(block):
+            written = defs(instruction)
+            if self.removable(instruction, written, live):
+                continue
+            live.difference_update(written)
+            live.update(uses(instruction))
+            kept.append(instruction)
+        kept.reverse()
+        return kept, live
+
+    def run(self, function: FunctionNode) -> bool:
+        graph = FlowGraph.build(function.instructions)
+        if graph is None:
+            return False
+
+        blocks = graph.blocks
+        successors = [graph.successors(i, block[-1]) for i, block in enumerate(blocks)]
+        predecessors = graph.predecessors()
+        live_in: List[Set[Variable]] = [set() for _ in blocks]
+        pending = list(range(len(blocks)))
+        while pending:
+            index = pending.pop()
+            live = set().union(*(live_in[s] for s in successors[index]))
+            _, live = self.sweep(blocks[index], live)
+            if live != live_in[index]:
+                live_in[index] = live
+                pending.extend(predecessors[index])
+
+        instructions: List[InstructionNode] = []
+        for index, block in enumerate(blocks):
+            live = set().union(*(live_in[s] for s in successors[index]))
+            instructions.extend(self.sweep(block, live)[0])
+        changed = len(instructions) != len(function.instructions)
+        function.instructions = instructions
+        return changed
+
+
+class JumpCleanup(FunctionPass):
+    """
+    Elimina los bloques a los que no se llega desde el inicio de la funcion,
+    los saltos a la instruccion siguiente y los labels a los que ya no
+    salta ninguna instruccion.
+    """
+    name = "jumps"
+
+    @staticmethod
+    def falls_into(instructions: List[InstructionNode], start: int, label: str) -> bool:
+        for instruction in instructions[start:]:
+            if not isinstance(instruction, LabelNode):
+                return False
+            if instruction.label == label:
+                return True
+        return False
+
+    def run(self, function: FunctionNode) -> bool:
+        graph = FlowGraph.build(function.instructions)
+        if graph is None:
+            return False
+
+        reachable = {0}
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            for successor in graph.successors(index, graph.blocks[index][-1]):
+                if successor not in reachable:
+                    reachable.add(successor)
+                    pending.append(successor)
+        instructions = [i for index, block in enumerate(graph.blocks) if index in reachable for i in block]
+
+        instructions = [
+            instruction for index, instruction in enumerate(instructions)
+            if not (isinstance(instruction, JUMPS) and self.falls_into(instructions, index + 1, instruction.label))
+        ]
+        targets = {i.label for i in instructions if isinstance(i, JUMPS)}
+        instructions = [i for i in instructions if not isinstance(i, LabelNode) or i.label in targets]
+
+        changed = len(instructions) != len(function.instructions)
+        function.instructions = instructions
+        return changed
+
+
+class CompactLocals(FunctionPass):
+    """
+    Quita de `localvars` los locales que ninguna instruccion usa.
+    """
+    name = "locals"
+
+    def run(self, function: FunctionNode) -> bool:
+        used = {key for instruction in function.instructions for _, key in operands(instruction)}
+        localvars = [local for local in function.localvars if variable(local) in used]
+        changed = len(localvars) != len(function.localvars)
+        function.localvars = localvars
+        return changed
+
+
+class PassManager:
+    """
+    Aplica una secuencia de pasadas a cada funcion del programa. Con
+    `fixpoint` la secuencia se repite hasta que ninguna pasada cambia nada
+    (a lo sumo `max_rounds` veces). `changes` cuenta cuantas funciones
+    cambio cada pasada.
+    """
+    def __init__(self, passes: List[FunctionPass], fixpoint: bool = False, max_rounds: int = 10):
+        self.passes = passes
+        self.fixpoint = fixpoint
+        self.max_rounds = max_rounds
+        self.changes: Dict[str, int] = {p.name: 0 for p in passes}
+
+    def optimize(self, function: FunctionNode) -> None:
+        for _ in range(self.max_rounds if self.fixpoint else 1):
+            changed = False
+            for optimization in self.passes:
+                if optimization.run(function):
+                    self.changes[optimization.name] += 1
+                    changed = True
+            if not changed:
+                break
+
+    def run(self, program: CilProgramNode) -> None:
+        # Las clases tomadas de la cache (CachedCodeNode) ya son codigo MIPS
+        for function in program.dotcode:
+            if isinstance(function, FunctionNode):
+                self.optimize(function)
+
+
+PASSES = {p.name: p for p in (ConstantFolding, CopyPropagation, DeadCodeElimination, JumpCleanup, CompactLocals)}
+
+# Pasadas de cada nivel de optimizacion, en el orden en que se aplican
+LEVELS: Dict[int, Tuple[str, ...]] = {
+    0: (),
+    1: ("fold", "copies", "dce", "jumps", "locals"),
+    2: ("fold", "copies", "dce", "jumps", "locals"),
+}
+
+
+def pass_manager(level: int) -> PassManager:
+    """
+    Las pasadas del nivel `level` (`-O`). En el nivel 2 se repiten hasta
+    que el codigo no cambia.
+    """
+    level = min(level, max(LEVELS))
+    return PassManager([PASSES[name]() for name in LEVELS[level]], fixpoint=level >= 2)
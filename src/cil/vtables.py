@@ -0,0 +1,89 @@
+"""
+Disposicion de las tablas virtuales.
+
+El generador de MIPS despacha un metodo por el indice de su nombre en la
+tabla virtual del tipo (ver `RuntimeLayout.method_index`), asi que un mismo
+nombre debe ocupar el mismo indice en todas las tablas en que aparezca. Antes
+cada tabla tenia una entrada por cada nombre de metodo del programa, con lo
+que su tamanno total crecia como tipos x nombres.
+
+Aqui cada nombre recibe un unico indice y dos nombres solo pueden compartirlo
+si ningun tipo tiene los dos. Los nombres se recorren en el orden en que
+aparecen en las tablas, que estan ordenadas por herencia, y cada uno toma el
+menor indice libre en todos los tipos que lo tienen:
+    - un metodo heredado conserva el indice que tiene en el padre y los
+      nuevos ocupan los siguientes, como en una tabla de herencia simple,
+    - un nombre definido en clases no relacionadas queda en un indice libre
+      en todas ellas (coloreo de selectores), lo que puede dejar huecos.
+Cada tabla termina en su mayor indice ocupado y los huecos se rellenan con
+`PADDING`.
+"""
+from typing import Dict, List, Set, Tuple
+
+Table = List[Tuple[str, str]]
+
+# Entrada de una tabla en un indice que el tipo no usa
+PADDING = ("__not_a_func", "dummy")
+
+
+def selectors(tables: List[Table]) -> List[str]:
+    # En el orden en que aparecen, para que los indices no dependan del hash
+    # de los nombres y sean los mismos en cada compilacion
+    return list(dict.fromkeys(
+        entry[0] for table in tables for entry in table if entry != PADDING
+    ))
+
+
+def color_selectors(tables: List[Table]) -> Dict[str, int]:
+    """
+    Indice de cada nombre de metodo en las tablas virtuales.
+    """
+    owners: Dict[str, List[int]] = {}
+    for i, table in enumerate(tables):
+        for method, _ in table:
+            owners.setdefault(method, []).append(i)
+
+    occupied: List[Set[int]] = [set() for _ in tables]
+    slots: Dict[str, int] = {}
+    for method in selectors(tables):
+        used = set().union(*(occupied[i] for i in owners[method]))
+        slot = next(k for k in range(len(used) + 1) if k not in used)
+        slots[method] = slot
+        for i in owners[method]:
+            occupied[i].add(slot)
+    return slots
+
+
+def layout_vtables(tables: List[Table]) -> List[Table]:
+    """
+    Reordena las tablas de modo que cada metodo quede en su indice.
+    """
+    slots = color_selectors(tables)
+    new_tables = []
+    for table in tables:
+        new_table = [PADDING] * (max((slots[m] for m, _ in table), default=-1) + 1)
+        for method, function in table:
+            new_table[slots[method]] = (method, function)
+        new_tables.append(new_table)
+    return new_tables
+
+
+def method_slots(tables: List[Table]) -> Dict[str, int]:
+    """
+    Indice de cada metodo en unas tablas ya dispuestas.
+    """
+    slots: Dict[str, int] = {}
+    for table in tables:
+        for i, entry in enumerate(table):
+            if entry != PADDING:
+                slots.setdefault(entry[0], i)
+    return slots
+
+
+def saved_bytes(tables: List[Table]) -> int:
+    """
+    Bytes que se ahorran frente a tablas con una entrada por cada nombre de
+    metodo del programa.
+    """
+    union = len(tables) * len(selectors(tables))
+    return 4 * (union - sum(len(table) for table in tables))
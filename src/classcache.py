@@ -0,0 +1,177 @@
+"""
+Cache del codigo generado para cada clase.
+
+Al recompilar un programa en el que solo cambiaron algunas clases, el codigo
+MIPS de las demas se toma de `build/classes` en lugar de generarse otra vez.
+El chequeo semantico se sigue haciendo sobre el programa completo: es barato
+y una clase que no cambio puede dejar de estar bien tipada por cambios en
+otra.
+
+Cada clase se guarda con una clave que resume todo lo que su traduccion
+puede leer:
+    - el hash de los modulos que generan CIL y MIPS,
+    - el AST de la clase sin posiciones,
+    - los tipos de las variables de sus scopes,
+    - la interfaz (padre, atributos y metodos) de todos los tipos del programa,
+    - el nivel de optimizacion del codigo CIL.
+Lo unico que falta son las posiciones que el codigo toma del programa
+completo (indices de tipos y metodos, disposicion de los atributos, ver
+`RuntimeLayout`). Esas consultas se anotan con su resultado al generar la
+clase y al reutilizarla se repiten: si alguna da otro valor la clase se
+vuelve a generar.
+
+Las entradas son ficheros JSON con el texto MIPS de las funciones de la
+clase, sus cadenas y las consultas de las que depende.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from abstract.semantics import Context, Scope, SemanticError, Type
+from abstract.tree import Node
+from mips.baseMipsVisitor import RuntimeLayout
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIR = os.path.join(BASE, "build", "classes")
+SOURCES = ("abstract", "cil", "mips", "travels/ctcill.py", "travels/ciltomips.py", "classcache.py")
+POSITIONS = ("line", "column", "ret_col")
+
+
+@lru_cache(maxsize=None)
+def compiler_hash() -> str:
+    digest = hashlib.sha256()
+    for source in SOURCES:
+        path = os.path.join(BASE, source)
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".py"))
+        else:
+            files = [path]
+        for file in files:
+            with open(file, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def fingerprint(node) -> Any:
+    """
+    Representacion del AST como valores JSON, sin las posiciones de los
+    nodos. Los tipos ya resueltos se representan por su nombre.
+    """
+    if isinstance(node, Node):
+        fields = sorted((k, v) for k, v in node.fields() if k not in POSITIONS)
+        return [type(node).__name__] + [[k, fingerprint(v)] for k, v in fields]
+    if isinstance(node, (list, tuple)):
+        return [fingerprint(item) for item in node]
+    if isinstance(node, Type):
+        return node.name
+    if node is None or isinstance(node, (str, int, float, bool)):
+        return node
+    return type(node).__name__
+
+
+def scope_types(scope: Scope) -> list:
+    variables = [[v.name, v.type.name if isinstance(v.type, Type) else v.type] for v in scope.locals]
+    return [variables, [scope_types(child) for child in scope.children]]
+
+
+def interface(context: Context) -> list:
+    """
+    Padre, atributos y metodos de cada tipo del programa.
+    """
+    types = []
+    for name in sorted(context.types):
+        type_ = context.types[name]
+        types.append([
+            name,
+            type_.parent.name if type_.parent is not None else None,
+            [str(a) for a in (type_.attribute_table or {}).values()],
+            [str(m) for m in (type_.method_table or {}).values()],
+        ])
+    return types
+
+
+class ClassCache:
+    def __init__(self, directory: str = DEFAULT_DIR, optimize: int = 0):
+        self.directory = directory
+        self.optimize = optimize
+        self.hits = 0
+        self.misses = 0
+        self.__interface = (None, None)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def interface_hash(self, context: Context) -> str:
+        # La interfaz es la misma para todas las clases de un programa
+        cached_context, digest = self.__interface
+        if cached_context is not context:
+            text = json.dumps(interface(context))
+            digest = hashlib.sha256(text.encode()).hexdigest()
+            self.__interface = (context, digest)
+        return digest
+
+    def key(self, node: Node, scope: Scope, context: Context) -> str:
+        content = json.dumps([fingerprint(node), scope_types(scope)])
+        digest = hashlib.sha256()
+        digest.update(compiler_hash().encode())
+        digest.update(str(self.optimize).encode())
+        digest.update(self.interface_hash(context).encode())
+        digest.update(content.encode())
+        return digest.hexdigest()
+
+    def layout(self, types) -> RuntimeLayout:
+        return RuntimeLayout(types)
+
+    def load(self, key: str, layout: RuntimeLayout, types: Callable[[str], Type]) -> Optional[dict]:
+        """
+        Devuelve la entrada de la clase si existe y todas las consultas de
+        las que depende dan el mismo resultado en `layout`.
+        """
+        try:
+            with open(self.path(key), "r") as f:
+                entry = json.load(f)
+            valid = all(
+                layout.query(query, types) == value
+                for query, value in entry["dependencies"].items()
+            )
+        except (OSError, ValueError, KeyError, SemanticError):
+            valid = False
+        if not valid:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, key: str, entry: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "w") as f:
+                json.dump(entry, f)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+
+    def store_classes(self, compiled_classes: List[tuple], generator) -> None:
+        """
+        Guarda las clases generadas en esta compilacion, `generator` es el
+        `MipsCodeGenerator` (creado con `record`) que produjo su codigo.
+        """
+        for key, functions, data in compiled_classes:
+            text: List[str] = []
+            dependencies: Dict[str, Any] = {}
+            for function in functions:
+                code, queries = generator.function_code(function.name)
+                text.append(code)
+                dependencies.update(queries)
+            self.store(key, {
+                "functions": [function.name for function in functions],
+                "text": "".join(text),
+                "data": [[d.name, d.value] for d in data],
+                "dependencies": dependencies,
+            })
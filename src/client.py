@@ -0,0 +1,46 @@
+"""
+Cliente del servidor de compilacion (ver `server.py`).
+
+Recibe los mismos argumentos que `pycoolc.py`, envia la peticion al servidor
+y reproduce su salida y su codigo de retorno. Si no hay un servidor
+escuchando, compila en el propio proceso, de modo que siempre se comporta
+como `pycoolc.py`.
+"""
+import json
+import os
+import socket
+import sys
+
+
+def default_socket() -> str:
+    return os.environ.get("COOLC_SOCKET") or os.path.join(
+        os.environ.get("TMPDIR", "/tmp"), "pycoolc-%d.sock" % os.getuid()
+    )
+
+
+def request(argv, path: str) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        message = {"argv": argv, "cwd": os.getcwd()}
+        connection.sendall((json.dumps(message) + "\n").encode())
+        with connection.makefile("rb") as response:
+            line = response.readline()
+    if not line:
+        raise ConnectionError("The compile server closed the connection")
+    return json.loads(line)
+
+
+def main(argv) -> int:
+    try:
+        response = request(argv, default_socket())
+    except OSError:
+        import pycoolc
+
+        return pycoolc.main(argv)
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["status"]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
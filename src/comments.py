@@ -1,3 +1,4 @@
+import re
 from typing import Any
 
 """
@@ -7,6 +8,18 @@ no regular expresion to represet them, so we have
 to preprocess the file and strip them out.
 """
 
+# Interesting markers for every scanner state. In code, "<-" is matched
+# before "--" so "<--" is an assignment followed by a minus, as the lexer
+# would read it.
+CODE = re.compile(r'<-|\(\*|--|"')
+BLOCK = re.compile(r"\(\*|\*\)")
+STRING = re.compile(r'\\[\s\S]|"|\n')
+NOT_NEWLINE = re.compile(r"[^\n]")
+
+
+def blank(text: str) -> str:
+    return NOT_NEWLINE.sub(" ", text)
+
 
 def find_comments(program: Any) -> str:
     """
@@ -17,71 +30,60 @@ def find_comments(program: Any) -> str:
     Column.\
     In Cool a comment can be of the form (*...*) or -- ending\
     with a newline. Comments can be nested, so there is no regular\
-    expression to detect them.
+    expression to detect them.\
+    The program is scanned once, jumping between the markers of\
+    each state (code, string, line comment, nested comment), so\
+    markers inside string literals are left untouched.
     """
-    pairs = []
-    stack = []
-    line = 1
-    column = 1
-    program = list(program)
-    iter_char = iter(enumerate(program))
-    while 1:
-        try:
-            i, char = next(iter_char)
-            column += 1
-            if char == "\n":
-                line += 1
-                column = 1
-            elif char == "(":
-                i, char = next(iter_char)
-                column += 1
-                if char == "*":
-                    stack.append(i - 1)
-                elif char == "\n":
-                    line += 1
-                    column = 1
-            elif char == "*":
-                i, char = next(iter_char)
-                column += 1
-                if char == ")":
-                    first = stack.pop()
-                    pairs.append((first, i))
-                elif char == "\n":
-                    line += 1
-                    column = 1
-        except StopIteration:
-            break
-    assert not stack, "(%d, %d) - LexicographicError: EOF in comment" % (line, column)
-    
+    program = "".join(program)
+    pieces = []
     i = 0
-    while i < len(program):
-        c = program[i]
-        if c =='-' and i > 0 and program[i - 1] != '<':
-            i += 1
-            c = program[i]
-            if c == "-":
-                eol = "".join(program).find("\n", i)
-                for j in range(i - 1, eol):
-                    program[j] = " "
-                i = eol
-            else:
-                i += 1
-        elif c =='-' and i == 0:
-            i += 1
-            c = program[i]
-            if c == "-":
-                eol = "".join(program).find("\n", i)
-                for j in range(i - 1, eol):
-                    program[j] = " "
-                i = eol
-            else:
-                i += 1
+    n = len(program)
+    while i < n:
+        match = CODE.search(program, i)
+        if match is None:
+            pieces.append(program[i:])
+            break
+
+        marker = match.group()
+        start = match.start()
+        if marker == "<-":
+            pieces.append(program[i : match.end()])
+            i = match.end()
+        elif marker == '"':
+            # Copy the string literal up to its closing quote or an
+            # unescaped newline; the lexer reports malformed strings.
+            j = match.end()
+            while j < n:
+                match = STRING.search(program, j)
+                if match is None:
+                    j = n
+                    break
+                j = match.end()
+                if match.group() in ('"', "\n"):
+                    break
+            pieces.append(program[i:j])
+            i = j
+        elif marker == "--":
+            eol = program.find("\n", start)
+            eol = n if eol == -1 else eol
+            pieces.append(program[i:start])
+            pieces.append(" " * (eol - start))
+            i = eol
         else:
-            i += 1
-            
-    while pairs:
-        i, j = pairs.pop()
-        for k in range(i, j + 1):
-            if not program[k] == "\n":
-                program[k] = " "
-    return "".join(program)
+            depth = 1
+            j = match.end()
+            while depth:
+                match = BLOCK.search(program, j)
+                if match is None:
+                    line = program.count("\n") + 1
+                    column = n - program.rfind("\n")
+                    raise AssertionError(
+                        "(%d, %d) - LexicographicError: EOF in comment" % (line, column)
+                    )
+                depth += 1 if match.group() == "(*" else -1
+                j = match.end()
+            pieces.append(program[i:start])
+            pieces.append(blank(program[start:j]))
+            i = j
+    return "".join(pieces)
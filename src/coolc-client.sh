@@ -0,0 +1,11 @@
+#!/bin/bash
+# Igual que coolc.sh, pero compila a traves del servidor de compilacion
+# (python server.py) si esta corriendo.
+
+INPUT_FILE=$1
+OUTPUT_FILE=${INPUT_FILE:0: -2}mips
+VERSION=0.2  # Release, Minor
+
+echo "pycoolc: version $VERSION Developed by Eliane Puerta, Liset Alfaro, Adrian Gonzalez"
+echo "Copyright (c) 2020 School of Math and Computer Science, University of Havana"
+python "$(dirname "$0")/client.py" "$INPUT_FILE" "${@:2}"
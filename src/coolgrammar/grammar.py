@@ -24,11 +24,16 @@ from abstract.tree import NotNode, WhileBlockNode, EqualToNode, InstantiateClass
 from abstract.tree import ActionNode, CaseNode, ParentFuncCall, BlockNode, IsVoidNode
 from abstract.tree import NegNode
 
-# from lexer.tokenizer import Lexer
 from tknizer import Tokenizer
 
 
-def build_cool_grammar():
+def build_cool_grammar(tokenizer=Tokenizer):
+    """
+    Construye la gramatica de cool y el lexer para sus terminales.
+    `tokenizer` es la clase del lexer a construir a partir de la tabla de
+    expresiones regulares: `Tokenizer` (modulo re) o `lexer.tokenizer.Lexer`
+    (automata finito determinista).
+    """
     G = Grammar()
     program = G.NonTerminal("<program>", True)
 
@@ -305,13 +310,17 @@ def build_cool_grammar():
 
     factor %= opar + exp + cpar, lambda s: s[2]
 
-    factor %= num, lambda s: IntegerConstant(s[1].lex)
+    factor %= num, lambda s: IntegerConstant(
+        s[1].lex, s[1].token_line, s[1].token_column - len(s[1].lex)
+    )
 
     factor %= idx, lambda s: VariableCall(
         s[1].lex, s[1].token_line, s[1].token_column - len(s[1].lex)
     )
 
-    factor %= true, lambda s: TrueConstant()
+    factor %= true, lambda s: TrueConstant(
+        s[1].token_line, s[1].token_column - len(s[1].lex)
+    )
 
     factor %= factor + period + idx + opar + args_list_empty + cpar, lambda s: FunCall(
         s[1], s[3].lex, s[5], s[1].line, s[1].column
@@ -334,7 +343,9 @@ def build_cool_grammar():
         ),
     )
 
-    factor %= false, lambda s: FalseConstant()
+    factor %= false, lambda s: FalseConstant(
+        s[1].token_line, s[1].token_column - len(s[1].lex)
+    )
 
     factor %= instantiation, lambda s: s[1]
 
@@ -467,5 +478,5 @@ def build_cool_grammar():
         ("StringError", r'("(?:[^"\\]|\\|\\"|\\\n)*\n)'),
         ("StringEOF", r'("(?:[^\n"\\]|\\\n|\\"|\\)*)'),
     ]
-    lexer = Tokenizer(table, G.EOF)
+    lexer = tokenizer(table, G.EOF)
     return G, lexer
@@ -0,0 +1,195 @@
+"""
+Traduccion de las expresiones regulares de Python (modulo `re`) a automatas
+finitos no deterministas construidos con las operaciones de `automatons`.
+
+El alfabeto de los automatas no son los caracteres sino clases de caracteres:
+dos caracteres pertenecen a la misma clase si todos los atomos (literales,
+conjuntos, categorias, etc.) de todas las expresiones los aceptan o rechazan
+por igual. Asi el automata tiene pocas transiciones aunque el texto sea unicode,
+y cada caracter se traduce a su clase con una sola llamada a `str.translate`.
+"""
+import sys
+from bisect import bisect_right
+from automatons.nondeterministic import NFA
+from automatons.operations import (automata_union, automata_concatenation,
+                                   automata_closure)
+
+try:
+    from re import _parser as sre_parse, _compiler as sre_compile
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_compile
+    import sre_constants
+
+ATOMS = (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.IN,
+         sre_constants.ANY, sre_constants.CATEGORY)
+
+# Flags que cambian el conjunto de caracteres que acepta un atomo
+ATOM_FLAGS = (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_DOTALL
+              | sre_constants.SRE_FLAG_ASCII | sre_constants.SRE_FLAG_UNICODE
+              | sre_constants.SRE_FLAG_LOCALE)
+
+
+def _atom_key(op, av, flags):
+    return f'{op} {av!r} {flags}'
+
+
+def _subpattern(items, flags):
+    state = (getattr(sre_parse, 'State', None) or sre_parse.Pattern)()
+    state.flags = flags
+    return sre_parse.SubPattern(state, items)
+
+
+class PyRegex:
+    """
+    Expresion regular de Python ya parseada. Recolecta sus atomos para
+    calcular las clases de caracteres y luego construye el NFA equivalente.
+    """
+    def __init__(self, regex):
+        self.regex = regex
+        parsed = sre_parse.parse(regex)
+        self.tree = parsed
+        self.flags = parsed.state.flags
+
+    def atoms(self):
+        yield from self._atoms(self.tree, self.flags)
+
+    def _atoms(self, items, flags):
+        for op, av in items:
+            if op in ATOMS:
+                yield op, av, flags & ATOM_FLAGS
+            elif op is sre_constants.SUBPATTERN:
+                _, add_flags, del_flags, p = av
+                yield from self._atoms(p, (flags | add_flags) & ~del_flags)
+            elif op is sre_constants.BRANCH:
+                for p in av[1]:
+                    yield from self._atoms(p, flags)
+            elif op is sre_constants.MAX_REPEAT:
+                yield from self._atoms(av[2], flags)
+            else:
+                raise ValueError(
+                    f'Unsupported construction {op} in regex {self.regex!r}')
+
+    def to_nfa(self, classes):
+        return self._sequence(self.tree, self.flags, classes)
+
+    def _sequence(self, items, flags, classes):
+        automaton = NFA(states=1, finals=[0], transitions={})
+        for item in items:
+            automaton = automata_concatenation(
+                automaton, self._item(item, flags, classes))
+        return automaton
+
+    def _item(self, item, flags, classes):
+        op, av = item
+        if op in ATOMS:
+            symbols = classes.symbols(op, av, flags & ATOM_FLAGS)
+            return NFA(states=2, finals=[1],
+                       transitions={(0, s): [1] for s in symbols})
+
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, p = av
+            return self._sequence(p, (flags | add_flags) & ~del_flags, classes)
+
+        if op is sre_constants.BRANCH:
+            alternatives = [self._sequence(p, flags, classes) for p in av[1]]
+            automaton = alternatives[0]
+            for alternative in alternatives[1:]:
+                automaton = automata_union(automaton, alternative)
+            return automaton
+
+        # MAX_REPEAT: min copias obligatorias y el resto opcionales
+        # o una clausura si no hay maximo.
+        low, high, p = av
+        automaton = NFA(states=1, finals=[0], transitions={})
+        for _ in range(low):
+            automaton = automata_concatenation(
+                automaton, self._sequence(p, flags, classes))
+        if high == sre_constants.MAXREPEAT:
+            return automata_concatenation(
+                automaton, automata_closure(self._sequence(p, flags, classes)))
+        for _ in range(high - low):
+            optional = automata_union(self._sequence(p, flags, classes),
+                                      NFA(states=1, finals=[0], transitions={}))
+            automaton = automata_concatenation(automaton, optional)
+        return automaton
+
+
+class CharClasses(dict):
+    """
+    Tabla de traduccion para `str.translate` que lleva cada caracter a un
+    caracter cuyo codigo es el numero de su clase. Los primeros 256 codigos se
+    guardan directamente, el resto se busca por intervalos la primera vez que
+    aparece.
+    """
+    def __init__(self, regexs):
+        super().__init__()
+        atoms = {}
+        for regex in regexs:
+            for op, av, flags in regex.atoms():
+                atoms.setdefault(_atom_key(op, av, flags), (len(atoms), op, av, flags))
+        self.atoms = {key: bit for key, (bit, *_) in atoms.items()}
+
+        # Intervalos maximos de caracteres aceptados por cada atomo
+        alphabet = ''.join(map(chr, range(sys.maxunicode + 1)))
+        runs = []
+        bounds = {0, sys.maxunicode + 1}
+        for bit, op, av, flags in atoms.values():
+            atom = _subpattern([(op, av)], flags)
+            repeat = (sre_constants.MAX_REPEAT, (1, sre_constants.MAXREPEAT, atom))
+            pattern = sre_compile.compile(_subpattern([repeat], flags), flags)
+            for match in pattern.finditer(alphabet):
+                runs.append((match.start(), match.end(), bit))
+                bounds.add(match.start())
+                bounds.add(match.end())
+
+        bounds = sorted(bounds)
+        masks = [0] * (len(bounds) - 1)
+        for start, end, bit in runs:
+            for i in range(bisect_right(bounds, start) - 1, bisect_right(bounds, end) - 1):
+                masks[i] |= 1 << bit
+
+        # Cada mascara distinta es una clase; intervalos contiguos con la
+        # misma clase se unen.
+        self.masks = []
+        self.starts = []
+        self.classes = []
+        index = {}
+        for start, mask in zip(bounds, masks):
+            if mask not in index:
+                index[mask] = len(self.masks)
+                self.masks.append(mask)
+            if not self.classes or self.classes[-1] != index[mask]:
+                self.starts.append(start)
+                self.classes.append(index[mask])
+
+        self.size = len(self.masks)
+        assert self.size <= 256, 'Too many character classes'
+        self._fill()
+
+    @classmethod
+    def from_runs(cls, starts, classes, size):
+        """
+        Reconstruye la tabla a partir de los intervalos ya calculados, sin
+        los atomos: sirve para traducir texto pero no para construir automatas.
+        """
+        table = cls.__new__(cls)
+        table.atoms = table.masks = None
+        table.starts = list(starts)
+        table.classes = list(classes)
+        table.size = size
+        table._fill()
+        return table
+
+    def _fill(self):
+        for code in range(256):
+            self[code]
+
+    def __missing__(self, code):
+        value = self[code] = chr(self.classes[bisect_right(self.starts, code) - 1])
+        return value
+
+    def symbols(self, op, av, flags):
+        bit = self.atoms[_atom_key(op, av, flags)]
+        return [n for n, mask in enumerate(self.masks) if mask >> bit & 1]
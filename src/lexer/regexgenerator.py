@@ -3,6 +3,7 @@ from automatons.nondeterministic import NFA
 from automatons.operations import (automata_union, automata_concatenation,
                                    automata_closure)
 from automatons.transformation import nfa_to_deterministic
+from automatons.minimization import minimize
 from grammar.grammar import Grammar
 from lexer.tokens import Token
 from parserr.ll1 import build_ll1_parser
@@ -140,7 +141,7 @@ class Regex(object):
         left_parse = parser(toks)
         tree = evaluate_parse(left_parse, toks)
         automatom = tree.evaluate()
-        automaton = nfa_to_deterministic(automatom)
+        automaton = minimize(nfa_to_deterministic(automatom))
         return automaton
 
     def __call__(self, w: str):
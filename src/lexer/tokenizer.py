@@ -1,18 +1,22 @@
+from array import array
 from automatons.state import State
-from lexer.regexgenerator import Regex
+from automatons.minimization import hopcroft
+from lexer.pyregex import PyRegex, CharClasses
 from lexer.tokens import Token
-from grammar.grammar import Terminal
+from tknizer import Tokenizer
 
 
 class TokenLine(Token):
     '''
     Clase para representar el token constante de cambio de Linea
     '''
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('\n', 'Line')
 
 
-class Lexer:
+class Lexer(Tokenizer):
     """
     El generador de lexer se basa en un conjunto de expresiones regulares.
     Cada una de ellas está asociada a un tipo de token.
@@ -21,145 +25,107 @@ class Lexer:
       y convertirlo a determinista.
     - Cada estado final almacena los tipos de tokens que se reconocen al alcanzarlo.
       Se establece una prioridad entre ellos para poder desambiaguar.
-    - Para tokenizar, la cadena de entrada viaja repetidas veces por el autómata.
-    - Cada vez, se comienza por el estado inicial, pero se continúa a partir de la última sección de la
-      cadena que fue reconocida.
-    - Cuando el autómata se "traba" durante el reconocimiento de una cadena, se reporta la ocurrencia de un token.
-      Su lexema está formado por la concatenación de los símbolos que fueron consumidos desde el inicio y hasta pasar
-      por el último estado final antes de trabarse. Su tipo de token es el de mayor relevancia entre los anotados en el
-      estado final.
+    - El autómata se aplana en arreglos de enteros: una tabla de transiciones densa
+      (estado x clase de caracter) y un arreglo con la regla de mayor prioridad que acepta
+      cada estado (-1 si no es final).
+    - Para tokenizar, el texto se traduce una sola vez a un buffer de bytes con la clase de
+      cada caracter y el autómata lo recorre desde la posición actual hasta trabarse.
+      El token es el prefijo que llevó al último estado final visitado.
     - Al finalizar de consumir toda la cadena, se reporta el token de fin de cadena.
+
+    Recibe la misma tabla que `Tokenizer`, reconoce los mismos tokens y reporta
+    los mismos errores.
     """
-    def __init__(self, table, eof, ignore_white_space=False):
+    def __init__(self, table, eof):
+        self.regexs = self._build_regexs(table)
+        self.classes, self.transitions, self.accept = self._build_automaton(self.regexs)
+        self.width = self.classes.size
         self.eof = eof
-        self.regexs = self._build_regexs(table, ignore_white_space)
-        self.automaton = self._build_automaton()
-        self.ignore_white_space = ignore_white_space
         self.line = 1
         self.column = 1
 
-    def _build_regexs(self, table, ignore_white_space):
-        regexs = []
-        # fixed blank tokens
-        fixed_line_token = Regex('\n', ignore_white_space=False)
-        fixed_space_token = Regex(' ', ignore_white_space=False)
-
-        for n, (token_type, regex) in enumerate(table):
-
-            regex = Regex(regex, ignore_white_space)
-
-            start = State.from_nfa(regex.automaton)
-
-            for state in start:
-                if state.final:
-                    state.tag = (n, token_type)
-            regexs.append(start)
-
-        line_automaton = State.from_nfa(fixed_line_token.automaton)
-        space_automaton = State.from_nfa(fixed_space_token.automaton)
-
-        for state in line_automaton:
-            if state.final:
-                state.tag = (len(table) + 1, 'Line')
+    @classmethod
+    def from_tables(cls, regexs, eof, starts, classes, transitions, accept):
+        """
+        Crea el lexer a partir de tablas ya construidas (ver `tablecache`).
+        `regexs` es la tabla de expresiones regulares de un `Tokenizer`
+        construido con la misma gramatica, de donde se toman los tipos de token.
+        """
+        lexer = cls.__new__(cls)
+        lexer.regexs = regexs
+        lexer.classes = CharClasses.from_runs(starts, classes, len(transitions) // len(accept))
+        lexer.transitions = transitions
+        lexer.accept = accept
+        lexer.width = lexer.classes.size
+        lexer.eof = eof
+        lexer.line = 1
+        lexer.column = 1
+        return lexer
+
+    def _build_automaton(self, regexs):
+        rules = [PyRegex(regex) for _, regex in regexs]
+        classes = CharClasses(rules)
 
-        for state in space_automaton:
-            if state.final:
-                state.tag = (len(table) + 2, 'Space')
-
-        regexs.append(line_automaton)
-        regexs.append(space_automaton)
-        return regexs
-
-    def _build_automaton(self):
         start = State('start')
-
-        for regex in self.regexs:
-            start.add_epsilon_transition(regex)
-        return start.to_deterministic()
-
-    def _walk(self, string):
-        state = self.automaton
-        final = state if state.final else None
-        lex = ''
-        suffix = ''
-        continues = 0
-
-        for i, symbol in enumerate(string):
-            # handle special character for regex !:
-            if symbol == '!' and suffix and suffix[0] == '"':
-                suffix += symbol
-                self.column += 1
-                continue
-            if symbol == '\\':
-                if suffix and suffix[0] == '"' and i < len(
-                        string) - 1 and string[i + 1] not in ('n', '"'):
-                    self.column += 1
-                    continues += 1
-                    continue
-            # Handle spcial case with a newline in a string
-            if symbol == '\n' and suffix and suffix[0] == '"':
-                if string[i - 1] == '\\':
-                    self.column = 1
-                    self.line += 1
-                    continues += 1
-                    continue
-            next_state = state.transitions.get(symbol, None)
-            if next_state:
-                suffix += symbol
-                self.column += 1
-                state = next_state[0]
+        for n, rule in enumerate(rules):
+            automaton = State.from_nfa(rule.to_nfa(classes))
+            for state in automaton:
                 if state.final:
-                    lex += suffix
-                    suffix = ''
-                    final = state
-            else:
+                    state.tag = n
+            start.add_epsilon_transition(automaton)
+        start = start.to_deterministic()
+
+        # Numerar los estados del DFA
+        states = {start: 0}
+        pending = [start]
+        while pending:
+            state = pending.pop()
+            for (destination,) in state.transitions.values():
+                if destination not in states:
+                    states[destination] = len(states)
+                    pending.append(destination)
+
+        delta = {}
+        rules = {}
+        for state, n in states.items():
+            for symbol, (destination,) in state.transitions.items():
+                delta[n, symbol] = states[destination]
+            tags = [s.tag for s in state.state if s.final]
+            if tags:
+                rules.setdefault(min(tags), set()).add(n)
+
+        # Minimizar: dos estados solo son equivalentes si aceptan la misma
+        # regla. Luego aplanar las transiciones del DFA minimo.
+        block = hopcroft(len(states), range(classes.size), delta, rules.values())
+        size = max(block) + 1
+        transitions = array('i', [-1] * (size * classes.size))
+        accept = array('i', [-1] * size)
+        for (n, symbol), destination in delta.items():
+            if block[n] >= 0 and block[destination] >= 0:
+                transitions[block[n] * classes.size + symbol] = block[destination]
+        for rule, group in rules.items():
+            for n in group:
+                accept[block[n]] = rule
+        return classes, transitions, accept
+
+    def _walk(self, text: str, pos: int):
+        transitions, accept, width = self.transitions, self.accept, self.width
+        state = 0
+        rule = -1
+        end = i = pos
+        for symbol in self.buffer[pos:]:
+            state = transitions[state * width + symbol]
+            if state < 0:
                 break
+            i += 1
+            if accept[state] >= 0:
+                rule = accept[state]
+                end = i
 
-        return final, lex, suffix, continues
+        if rule < 0:
+            return "", None
+        return text[pos:end], self.regexs[rule][0]
 
     def _tokenize(self, text):
-        while text:
-            string = text
-            final, lex, suffix, continues = self._walk(string)
-            if final:
-                n = 2**64
-                token_type = None
-                for state in final.state:
-                    try:
-                        priority, tt = state.tag
-                        if priority < n:
-                            n = priority
-                            token_type = tt
-                    except TypeError:
-                        pass
-                # suffix contains characters that didnt match
-                # so they would be count twice. We must substract
-                # them from column
-                self.column -= (len(suffix) + continues)
-                yield lex, token_type
-                text = string[len(lex) + continues:]
-            else:
-                if len(text) == len(suffix) + continues and suffix[0] == '"':
-                    raise SyntaxError(
-                        f'({self.line},{self.column}) - LexicographicError: String contains EOF'
-                    )
-                raise SyntaxError(
-                    f'({self.line},{self.column}) - LexicographicError: ERROR "%r"'
-                    % text[len(suffix) + continues])
-
-        yield '$', self.eof
-
-    def __call__(self, text: str):
-        tokens = []
-        for lex, ttype in self._tokenize(text):
-            if isinstance(ttype, str) and ttype == 'Line':
-                self.line += 1
-                self.column = 1
-            elif isinstance(ttype, str) and ttype == 'Space':
-                # IGNORE WHITE SPACE
-                pass
-            else:
-                tok = Token(lex, ttype, self.column, self.line)
-                tokens.append(tok)
-
-        return tokens
+        self.buffer = memoryview(text.translate(self.classes).encode('latin-1'))
+        yield from super()._tokenize(text)
@@ -12,6 +12,8 @@ class Token:
     token_type : Enum
         Token's type.
     """
+    __slots__ = ('lex', 'token_type', 'token_column', 'token_line')
+
     def __init__(self,
                  lex: str,
                  token_type: Terminal,
@@ -2,9 +2,10 @@ from abstract.semantics import Attribute
 from abstract.semantics import Type as SemanticType
 from cil.nodes import TypeNode
 from cil.nodes import CilNode, FunctionNode
-from mips import load_store
+from cil.vtables import method_slots
+from mips import gc, load_store
 from mips.arithmetic import ADDU, SUBU
-from mips.branch import JAL, JALR
+from mips.branch import BGEZ, J, JAL, JALR
 import mips.instruction as instrNodes
 import mips.arithmetic as arithNodes
 from mips.instruction import (
@@ -17,9 +18,10 @@ from mips.instruction import (
     ra,
     sp,
     v0,
+    zero,
 )
 import mips.load_store as lsNodes
-from typing import List, Optional, Type, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Type, Union
 import time
 import cil.nodes as cil
 from mips.load_store import LA, LI, LW, SW
@@ -102,9 +104,24 @@ class BaseCilToMipsVisitor:
         # Necesitamos acceso a los tipos del programa
         self.types: List[TypeNode] = []
 
+        # Indices de los tipos y los metodos y disposicion de los atributos
+        self.layout = RuntimeLayout([])
+
+        # Si no es None, para cada funcion generada se guarda donde empieza y
+        # termina en el programa y las consultas a `layout` que hizo
+        self.recorded: Optional[Dict[str, Tuple[int, int, Dict[str, Any]]]] = None
+
         # Tipos accesibles en el codigo
         self.mips_types: List[str] = []
 
+        # Tamanno inicial del heap y si al terminar se imprimen las
+        # estadisticas del recolector de basura (ver `mips.gc`)
+        self.heap_size = gc.DEFAULT_HEAP_SIZE
+        self.gc_stats = False
+
+        # Reservas de memoria en la funcion actual, para nombrar sus labels
+        self.allocations = 0
+
         # Construir el header del programa.
         self.__program_header()
 
@@ -154,7 +171,8 @@ class BaseCilToMipsVisitor:
             )
 
             assert index > -1
-            index += 1
+            # -4($fp) es el descriptor del marco
+            index += 2
             return f"-{index * 4}($fp)"
 
     def get_available_register(self) -> Optional[int]:
@@ -191,81 +209,25 @@ class BaseCilToMipsVisitor:
     def operate(self, dest, left, right, operand: Type):
         """
         Realiza la operacion indicada por operand entre left y right
-        y la guarda en dest.
+        y la guarda en dest. Los operandos y el resultado son enteros sin
+        encapsular (left y right pueden ser constantes).
         """
-        # left es una direccion de memoria
         reg = self.get_available_register()
-        reg2 = self.get_available_register()
         right_reg = self.get_available_register()
 
         assert reg is not None
-        assert reg2 is not None
         assert right_reg is not None
 
-        self.register_instruction(lsNodes.LW(reg2, left))
-        # Load integer value
-        self.register_instruction(lsNodes.LW(reg, f"12(${REG_TO_STR[reg2]})"))
-        # right no es una constante
-        self.register_instruction(lsNodes.LW(reg2, right))
-        # Cargar el valor
-        self.register_instruction(lsNodes.LW(right_reg, f"12(${REG_TO_STR[reg2]})"))
+        for register, operand_ in ((reg, left), (right_reg, right)):
+            if isinstance(operand_, int):
+                self.register_instruction(lsNodes.LI(register, operand_))
+            else:
+                self.register_instruction(lsNodes.LW(register, operand_))
         self.register_instruction(operand(reg, reg, right_reg))
-
-        # Crear la nueva instancia de Int
-
-        size = 20
-
-        # Reservar memoria para el tipo
-        self.allocate_memory(size)
-
-        self.comment("Allocating string for type Int")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg2, "String"))
-        self.register_instruction(SW(reg2, "0($v0)"))
-
-        self.register_instruction(LA(reg2, "String_start"))
-        self.register_instruction(SW(reg2, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg2, offset))
-        self.register_instruction(SW(reg2, "8($v0)"))
-
-        self.register_instruction(LA(reg2, "Int"))
-        self.register_instruction(SW(reg2, "12($v0)"))
-
-        self.register_instruction(LI(reg2, 3))
-        self.register_instruction(SW(reg2, "16($v0)"))
-
-        # devolver la instancia
-        self.register_instruction(MOVE(reg2, v0))
-
-        size = 16
-
-        self.allocate_memory(size)
-
-        # Almacenar el string al tipo Int
-        self.register_instruction(SW(reg2, f"0($v0)"))
-
-        self.register_instruction(LA(reg2, "Int_start"))
-        self.register_instruction(SW(reg2, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "Int") * 4
-        self.register_instruction(LI(reg2, offset))
-        self.register_instruction(SW(reg2, "8($v0)"))
-
-        self.register_instruction(SW(reg, "12($v0)"))
-
-        # devolver la instancia
-        self.register_instruction(SW(v0, dest))
+        self.register_instruction(SW(reg, dest))
 
         self.used_registers[reg] = False
         self.used_registers[right_reg] = False
-        self.used_registers[reg2] = False
 
     def create_type_array(self, types: List[TypeNode]):
         """
@@ -280,24 +242,67 @@ class BaseCilToMipsVisitor:
             self.register_instruction(FixedData(t.name, f'"{t.name}"', "asciiz"))
             self.comment("Function END")
 
+    def create_prototype(self, node: TypeNode):
+        """
+        Crea en la seccion .data el String con el nombre del tipo, al que
+        apunta la primera palabra de cada instancia, y el prototipo de las
+        instancias del tipo: una instancia con el valor por defecto de cada
+        atributo, que AllocateNode copia. Los prototipos de Int, Bool y
+        String son el 0, el false y el "" que toman por defecto los atributos
+        de esos tipos. Las instancias de los tipos basicos no se modifican
+        nunca, asi que se pueden compartir.
+        """
+        string_offset = self.layout.type_index("String") * 4
+        self.register_instruction(
+            FixedData(
+                name_label(node.name),
+                f"{name_label('String')}, String_start, {string_offset}, {node.name}, {len(node.name)}",
+            )
+        )
+
+        values = [
+            name_label(node.name),
+            f"{node.name}_start",
+            str(self.layout.type_index(node.name) * 4),
+        ]
+        if node.name in ("Int", "Bool"):
+            values.append("0")
+        elif node.name == "String":
+            self.register_instruction(FixedData(f"{node.name}__empty", '""', "asciiz"))
+            values.extend((f"{node.name}__empty", "0"))
+        for attribute in node.attributes:
+            if attribute.type.name in ("Int", "Bool", "String"):
+                values.append(prototype_label(attribute.type.name))
+            else:
+                values.append("0")
+        self.register_instruction(FixedData(prototype_label(node.name), ", ".join(values)))
+
     def allocate_memory(self, bytes_num: int):
         """
         Reserva @bytes_num bytes en heap y devuelve la direccion de memoria asignada
-        en $v0.
+        en $v0. Modifica $a0.
+        La reserva puede recolectar basura y mover las instancias, asi que
+        no se puede tener punteros al heap en registros (salvo $s1).
         """
+        assert self.current_function is not None
         self.register_instruction(
             instrNodes.LineComment(f"Allocating {bytes_num} bytes of memory")
         )
-
-        # Cargar la cantidad de bytes en el registro $a0
-        self.register_instruction(load_store.LI(a0, bytes_num))
-
-        # $v0 = 9 (syscall 9 = sbrk)
-        self.register_instruction(load_store.LI(v0, 9))
-
-        # syscall
-        self.register_instruction(instrNodes.SYSCALL())
-        # la direccion del espacio en memoria esta ahora en v0
+        fits = f"{self.current_function.name}__alloc_{self.allocations}"
+        self.allocations += 1
+
+        # Descontar los bytes de los que quedan libres y recolectar si no
+        # alcanzan
+        self.register_instruction(LW(v0, "__gc_free"))
+        self.register_instruction(SUBU(v0, v0, bytes_num, True))
+        self.register_instruction(BGEZ(v0, fits))
+        self.register_instruction(JAL("__gc_collect"))
+        self.register_instruction(instrNodes.Label(fits))
+        self.register_instruction(SW(v0, "__gc_free"))
+
+        # La instancia empieza donde terminan los bytes que quedan libres
+        self.register_instruction(LW(a0, "__gc_floor"))
+        self.register_instruction(ADDU(v0, v0, a0))
 
     def conditional_jump(self, node, condition, value=0, const=True):
         """
@@ -318,25 +323,27 @@ class BaseCilToMipsVisitor:
 
         self.used_registers[reg] = False
 
+    def frame_size(self, node: FunctionNode) -> int:
+        """
+        Bytes del marco de pila de la funcion representada por @node: $fp y $ra
+        viejos, el descriptor del marco y las variables locales.
+        """
+        # MIPS fuerza a un minimo de 32 bytes por stack frame
+        return max(32, len(node.localvars) * 4 + 12)
+
     def allocate_stack_frame(self, node: FunctionNode):
         """
         Crea el marco de pila necesario para ejecutar la funcion representada por @node.
+        Los locales que son punteros deben ir primero en node.localvars.
         """
         # Crear el marco de pila para la funcion
-        locals_count = len(node.localvars)
         self.register_instruction(
             instrNodes.LineComment(f"Allocate stack frame for function {node.name}.")
         )
 
         # Salvar primero espacio para las variables locales
-        if locals_count * 4 < 24:  # MIPS fuerza a un minimo de 32 bytes por stack frame
-            self.register_instruction(arithNodes.SUBU(sp, sp, 32, True))
-            ret = 32
-        else:
-            self.register_instruction(
-                arithNodes.SUBU(sp, sp, locals_count * 4 + 8, True)
-            )
-            ret = locals_count * 4 + 8
+        ret = self.frame_size(node)
+        self.register_instruction(arithNodes.SUBU(sp, sp, ret, True))
 
         # Salvar ra y fp
         self.register_instruction(lsNodes.SW(ra, "4($sp)"))
@@ -345,21 +352,31 @@ class BaseCilToMipsVisitor:
         # mover fp al inicio del frame
         self.register_instruction(arithNodes.ADDU(fp, sp, ret, True))
 
+        # El descriptor del marco le dice al recolector de basura su tamanno
+        # y cuantos locales son punteros. Estos empiezan en 0 para que el
+        # recolector no encuentre basura de otros marcos. Si la funcion no
+        # puede recolectar (no reserva memoria ni llama a otra) el recolector
+        # no la ve nunca.
+        if may_collect(node):
+            pointers = sum(1 for local in node.localvars if not local.raw)
+        else:
+            pointers = 0
+        self.register_instruction(lsNodes.LI(v0, gc.type_layout(ret, pointers)))
+        self.register_instruction(lsNodes.SW(v0, "-4($fp)"))
+        for i in range(pointers):
+            self.register_instruction(lsNodes.SW(zero, f"-{(i + 2) * 4}($fp)"))
+
     def deallocate_stack_frame(self, node: FunctionNode):
         """
         Deshace el marco de pila creado por un llamado a @allocate_stack_frame anterior.
         Esta funcion solo es un espejo de lo que realiza @allocate_stack_frame.
         """
-        locals_count = len(node.localvars)
         self.register_instruction(
             instrNodes.LineComment(f"Deallocate stack frame for function {node.name}.")
         )
 
         # Calcular cuantos bytes fueron reservados
-        if locals_count * 4 < 24:  # MIPS fuerza a un minimo de 32 bytes por stack frame
-            ret = 32
-        else:
-            ret = locals_count * 4 + 8
+        ret = self.frame_size(node)
 
         # restaurar ra y fp
         self.comment("Restore $ra")
@@ -376,11 +393,7 @@ class BaseCilToMipsVisitor:
         Devuelve el indice de un metodo en las tablas virtuales.
         Los metodos, ocupan el mismo indice en todas las vtables que aparezcan.
         """
-        for typ in self.types:
-            for i, (methodName, _) in enumerate(typ.methods):
-                if methodName == method:
-                    return i
-        return 0
+        return self.layout.method_index(method)
 
     def comment(self, message: str):
         self.register_instruction(instrNodes.LineComment(message))
@@ -393,30 +406,30 @@ class BaseCilToMipsVisitor:
 
     def define_entry_point(self):
         self.register_instruction(instrNodes.Label("main"))
+        # Reservar el heap
+        for instruction in gc.initialize(self.heap_size):
+            self.register_instruction(instruction)
         # Realizar un jump a entry
         self.register_instruction(JAL("entry"))
         # registrar instrucciones para terminar la ejecucion
-        self.comment("syscall code 10 is for exit")
-        self.register_instruction(lsNodes.LI(v0, 10))
-        self.register_instruction(instrNodes.SYSCALL())
+        self.exit_program()
         self.comment("Function END\n")
 
-    def locate_attribute(self, attrname: str, attributes: List[Attribute]):
+    def exit_program(self):
+        """
+        Termina la ejecucion a traves de `__gc_exit`, que imprime antes las
+        estadisticas del recolector de basura si se pidieron.
+        """
+        self.register_instruction(J("__gc_exit"))
+
+    def locate_attribute(self, attrname: str, itype: SemanticType):
         # Para ubicar el atributo que vamos a manejar
         # buscamos el offset del atributo en el tipo
         # y luego apuntamos a ese offset en el registro
         # que contiene el objeto self. Recordar que en
         # COOL los atributos solo pueden ser accedidos
         # directamente desde el interior de la clase.
-
-        # Hallar el offset del atributo en el tipo que se
-        # esta ejecutando
-        offset: int = 12
-        for i, attribute in enumerate(attributes):
-            if attribute.name == attrname:
-                offset += i * 4
-                break
-        return offset
+        return self.layout.attribute_offset(itype, attrname)
 
     def push_register(self, reg):
         """
@@ -445,4 +458,108 @@ def locate_attribute_in_type_hierarchy(attribute: Attribute, base_type: Semantic
     while 1:
         if attribute not in last.parent.attributes:
             return last.name
-        last = last.parent
\ No newline at end of file
+        last = last.parent
+
+COLLECTING_NODES = (
+    cil.AllocateNode,
+    cil.AllocateIntNode,
+    cil.AllocateBoolNode,
+    cil.AllocateStringNode,
+    cil.StaticCallNode,
+    cil.DynamicCallNode,
+    cil.ReadNode,
+    cil.ReadIntNode,
+    cil.SubstringNode,
+    cil.ConcatString,
+    cil.CopyNode,
+)
+
+
+def may_collect(node: FunctionNode) -> bool:
+    # Si la funcion puede llegar a recolectar basura: reserva memoria o
+    # llama a otra funcion
+    return any(isinstance(instruction, COLLECTING_NODES) for instruction in node.instructions)
+
+
+def name_label(type_name: str) -> str:
+    # String estatico con el nombre del tipo
+    return f"{type_name}__name"
+
+
+def prototype_label(type_name: str) -> str:
+    # Instancia del tipo con los valores por defecto de sus atributos
+    return f"{type_name}__proto"
+
+
+class RuntimeLayout:
+    """
+    Posiciones que el codigo de una funcion toma del programa completo: el
+    indice de cada tipo en la lista de tipos, el indice de cada metodo en las
+    tablas virtuales, la disposicion de los atributos de cada tipo y cuales
+    de ellos tienen expresion de inicializacion.
+
+    Si `dependencies` no es None, cada consulta se anota junto con su
+    resultado, de modo que el codigo generado se pueda reutilizar en otra
+    compilacion en la que todas esas consultas den lo mismo (ver
+    `classcache`).
+    """
+    def __init__(self, types: List[TypeNode]):
+        self.type_indexes: Dict[str, int] = {}
+        self.initialized: Dict[str, Set[str]] = {}
+        for i, typ in enumerate(types):
+            self.type_indexes.setdefault(typ.name, i)
+            self.initialized.setdefault(typ.name, typ.initialized)
+        self.method_indexes: Dict[str, int] = method_slots([typ.methods for typ in types])
+        self.dependencies: Optional[Dict[str, Any]] = None
+
+    def record(self, key: str, value):
+        if self.dependencies is not None:
+            self.dependencies[key] = value
+        return value
+
+    def type_index(self, name: str) -> int:
+        return self.record(f"type {name}", self.type_indexes[name])
+
+    def method_index(self, method: str) -> int:
+        return self.record(f"method {method}", self.method_indexes.get(method, 0))
+
+    def attribute_offset(self, itype: SemanticType, attrname: str) -> int:
+        offset: int = 12
+        if itype.attribute_slots is not None and attrname in itype.attribute_slots:
+            offset += itype.attribute_slots[attrname] * 4
+        else:
+            for i, attribute in enumerate(itype.attributes):
+                if attribute.name == attrname:
+                    offset += i * 4
+                    break
+        return self.record(f"attribute {itype.name} {attrname}", offset)
+
+    def attribute_initializers(self, itype: SemanticType) -> List[Optional[str]]:
+        # Funciones que inicializan cada atributo de una instancia del tipo,
+        # en el orden en que se guardan en la instancia. None si el atributo
+        # no tiene expresion de inicializacion y conserva el valor del
+        # prototipo.
+        initialized = self.initialized.get(itype.name, set())
+        initializers = [
+            f"__{locate_attribute_in_type_hierarchy(attribute, itype)}__attrib__{attribute.name}__init"
+            if attribute.name in initialized
+            else None
+            for attribute in itype.attributes
+        ]
+        return self.record(f"initializers {itype.name}", initializers)
+
+    def query(self, key: str, types) -> Any:
+        """
+        Repite una consulta anotada, `types` devuelve el tipo semantico
+        dado su nombre.
+        """
+        kind, *args = key.split(" ")
+        if kind == "type":
+            return self.type_index(args[0])
+        if kind == "method":
+            return self.method_index(args[0])
+        if kind == "attribute":
+            return self.attribute_offset(types(args[0]), args[1])
+        if kind == "initializers":
+            return self.attribute_initializers(types(args[0]))
+        raise KeyError(key)
@@ -0,0 +1,453 @@
+"""
+Reserva de memoria y recolector de basura del programa MIPS generado.
+
+El heap se divide en dos semiespacios del mismo tamanno. Se reserva en el
+semiespacio actual moviendo un puntero (ver
+`BaseCilToMipsVisitor.allocate_memory`):
+
+    __gc_free       bytes libres del semiespacio
+    __gc_floor      direccion donde empiezan los bytes libres
+
+Una instancia de n bytes se crea en `__gc_floor + __gc_free - n`. Cuando no
+quedan bytes suficientes se llama a `__gc_collect`, un recolector de Cheney
+que copia las instancias vivas al otro semiespacio y los intercambia. Si
+despues de recolectar sigue ocupada mas de la mitad del semiespacio se
+reserva uno nuevo con el doble de tamanno.
+
+Las instancias no tienen cabecera: su tamanno y cuantos de sus atributos son
+punteros se toman de `__gc_layout`, indexada por el offset del tipo que
+guarda cada instancia en 8($obj). Una instancia ya copiada guarda en su
+primera palabra la nueva direccion + 1 (la primera palabra es normalmente el
+puntero al nombre del tipo, que es multiplo de 4). Los Int, Bool y String no
+tienen atributos que sean punteros; los caracteres de un String reservado en
+el heap (ver `__gc_alloc_string`) van en un bloque aparte precedido por una
+palabra con su tamanno + 2, que se copia junto con el String.
+
+Las raices son $s1 (self) y la pila. Cada marco (ver
+`BaseCilToMipsVisitor.allocate_stack_frame`) guarda en -4($fp) su tamanno y,
+en los 16 bits altos, cuantos de sus locales son punteros: estos van
+primero, a partir de -8($fp). Ademas se recorre todo lo que hay entre un
+marco y el siguiente: los argumentos y los $s1 que se guardaron en la pila,
+que siempre son punteros. El codigo generado no mantiene punteros al heap en
+registros mientras reserva memoria (salvo $s1).
+"""
+from typing import List
+
+from mips.arithmetic import ADDU, AND, OR, SLL, SRL, SUBU
+from mips.branch import BEQ, BEQZ, BGE, BGEU, BGEZ, BGTZ, BLTU, BNE, J, JAL, JR
+from mips.instruction import (
+    SYSCALL,
+    FixedData,
+    Label,
+    LineComment,
+    MipsNode,
+    MOVE,
+    a0,
+    a1,
+    a2,
+    a3,
+    fp,
+    ra,
+    s1,
+    sp,
+    t0,
+    t1,
+    t2,
+    t3,
+    t4,
+    t5,
+    t6,
+    t7,
+    t8,
+    t9,
+    v0,
+    zero,
+)
+from mips.load_store import LA, LI, LW, SW
+
+# Tamanno por defecto del heap (los dos semiespacios)
+DEFAULT_HEAP_SIZE = 512 * 1024
+
+# Registros que el recolector usa y restaura
+SAVED_REGISTERS = (t0, t1, t2, t3, t4, t5, t6, t7, t8, t9, a0, a1, a2, a3)
+
+# Marca de la palabra que precede a los caracteres de un String
+CHARS = 2
+# Marca de la primera palabra de una instancia ya copiada
+FORWARDED = 1
+
+WORDS = (
+    "__gc_base",  # inicio del semiespacio actual
+    "__gc_size",  # tamanno de cada semiespacio
+    "__gc_floor",
+    "__gc_free",
+    "__gc_spare",  # el otro semiespacio
+    "__gc_spare_size",
+    "__gc_need",  # bytes que pidio la reserva que provoco la recoleccion
+    "__gc_start",  # __gc_free al terminar la ultima recoleccion
+    "__gc_stack_top",  # $sp al empezar el programa
+    "__gc_return",
+    "__gc_copy_return",
+    "__gc_string_return",
+    "__gc_string_length",
+    "__gc_string_buffer",
+    "__gc_collections",
+    "__gc_allocated",
+    "__gc_copied",
+)
+
+
+def type_layout(size: int, pointers: int) -> int:
+    # Entrada de __gc_layout: tamanno en bytes y atributos que son punteros
+    assert size < 1 << 16 and pointers < 1 << 16, "Type too large"
+    return pointers << 16 | size
+
+
+def runtime_data(layouts: List[int], stats: bool) -> List[MipsNode]:
+    """
+    Variables del recolector en la seccion .data. `layouts` es la entrada
+    de __gc_layout de cada tipo, en el orden de la lista de tipos.
+    """
+    data: List[MipsNode] = [LineComment(" **** Garbage collector ****")]
+    data.extend(FixedData(name, 0) for name in WORDS)
+    data.append(FixedData("__gc_registers", ", ".join("0" for _ in SAVED_REGISTERS)))
+    data.append(FixedData("__gc_layout", ", ".join(str(x) for x in layouts)))
+    if stats:
+        for name, text in (
+            ("collections", "gc: collections="),
+            ("allocated", " allocated="),
+            ("copied", " copied="),
+            ("heap", " heap="),
+            ("newline", "\\n"),
+        ):
+            data.append(FixedData(f"__gc_report_{name}", f'"{text}"', "asciiz"))
+    return data
+
+
+def initialize(heap_size: int) -> List[MipsNode]:
+    """
+    Codigo de `main` que reserva el heap antes de llamar a entry.
+    """
+    size = max(heap_size // 8 * 4, 4)
+    return [
+        SW(sp, "__gc_stack_top"),
+        LI(a0, 2 * size),
+        JAL("__gc_space"),
+        SW(v0, "__gc_base"),
+        SW(v0, "__gc_floor"),
+        ADDU(a0, v0, size, True),
+        SW(a0, "__gc_spare"),
+        LI(a0, size),
+        SW(a0, "__gc_size"),
+        SW(a0, "__gc_spare_size"),
+        SW(a0, "__gc_free"),
+        SW(a0, "__gc_start"),
+    ]
+
+
+def forward_word(address: str) -> List[MipsNode]:
+    # Actualizar la palabra en address con la nueva direccion de su instancia
+    return [LW(a0, address), JAL("__gc_forward"), SW(v0, address)]
+
+
+def runtime_code(string_offset: int, stats: bool) -> List[MipsNode]:
+    """
+    Rutinas del recolector. `string_offset` es el offset del tipo String.
+    """
+    code: List[MipsNode] = []
+    emit = code.extend
+
+    # __gc_space: reserva $a0 bytes con sbrk y los devuelve en $v0
+    emit([
+        Label("__gc_space"),
+        LI(v0, 9),
+        SYSCALL(),
+        JR(ra),
+        LineComment("Function END\n"),
+    ])
+
+    # __gc_collect: se llama cuando una reserva no cabe, con $v0 = __gc_free
+    # menos los bytes pedidos. Devuelve en $v0 el nuevo valor de __gc_free
+    # con la reserva ya descontada. Solo modifica $v0 y $ra.
+    emit([Label("__gc_collect"), SW(ra, "__gc_return")])
+    emit(SW(reg, f"__gc_registers+{4 * i}") for i, reg in enumerate(SAVED_REGISTERS))
+    emit([
+        LW(a0, "__gc_free"),
+        SUBU(a1, a0, v0),
+        SW(a1, "__gc_need"),
+        LineComment("Count the bytes allocated since the last collection"),
+        LW(a1, "__gc_start"),
+        SUBU(a1, a1, a0),
+        LW(a2, "__gc_allocated"),
+        ADDU(a2, a2, a1),
+        SW(a2, "__gc_allocated"),
+        LW(a2, "__gc_collections"),
+        ADDU(a2, a2, 1, True),
+        SW(a2, "__gc_collections"),
+        LineComment("Copy the live objects to the spare semispace"),
+        LW(t3, "__gc_base"),
+        LW(t0, "__gc_size"),
+        ADDU(t4, t3, t0),
+        LW(t5, "__gc_spare"),
+        LW(a1, "__gc_spare_size"),
+        BGE(a1, t0, "__gc_collect_copy"),
+        MOVE(a0, t0),
+        JAL("__gc_space"),
+        MOVE(t5, v0),
+        Label("__gc_collect_copy"),
+        MOVE(t2, t5),
+        JAL("__gc_copy"),
+        LW(t0, "__gc_size"),
+        SW(t3, "__gc_spare"),
+        SW(t0, "__gc_spare_size"),
+        SW(t5, "__gc_base"),
+        SW(t2, "__gc_floor"),
+        SUBU(t1, t2, t5),
+        LW(a2, "__gc_copied"),
+        ADDU(a2, a2, t1),
+        SW(a2, "__gc_copied"),
+        SUBU(t6, t0, t1),
+        LW(a0, "__gc_need"),
+        SUBU(t7, t6, a0),
+        LineComment("Grow the heap if less than half of it is free"),
+        SRL(t8, t0, 1, True),
+        BGE(t7, t8, "__gc_collect_end"),
+        SLL(t0, t0, 1, True),
+        ADDU(t0, t0, a0),
+        SW(t0, "__gc_size"),
+        MOVE(a0, t0),
+        JAL("__gc_space"),
+        MOVE(t3, t5),
+        MOVE(t4, t2),
+        MOVE(t5, v0),
+        MOVE(t2, t5),
+        JAL("__gc_copy"),
+        LW(t0, "__gc_size"),
+        SW(t5, "__gc_base"),
+        SW(t2, "__gc_floor"),
+        SW(zero, "__gc_spare_size"),
+        SUBU(t1, t2, t5),
+        LW(a2, "__gc_copied"),
+        ADDU(a2, a2, t1),
+        SW(a2, "__gc_copied"),
+        SUBU(t6, t0, t1),
+        LW(a0, "__gc_need"),
+        SUBU(t7, t6, a0),
+        Label("__gc_collect_end"),
+        SW(t6, "__gc_free"),
+        SW(t6, "__gc_start"),
+        MOVE(v0, t7),
+    ])
+    emit(LW(reg, f"__gc_registers+{4 * i}") for i, reg in enumerate(SAVED_REGISTERS))
+    emit([LW(ra, "__gc_return"), JR(ra), LineComment("Function END\n")])
+
+    # __gc_copy: copia las instancias alcanzables en [$t3, $t4) a partir de
+    # $t2, que al terminar apunta al final de lo copiado
+    emit([
+        Label("__gc_copy"),
+        SW(ra, "__gc_copy_return"),
+        MOVE(t1, t2),
+        MOVE(a0, s1),
+        JAL("__gc_forward"),
+        MOVE(s1, v0),
+        LineComment("Walk the stack frames"),
+        MOVE(t0, sp),
+        MOVE(t6, fp),
+        Label("__gc_frame"),
+        LW(t7, "-4($t6)"),
+        AND(t8, t7, 0xFFFF, True),
+        SUBU(t8, t6, t8),
+        LineComment("Arguments and registers pushed below the frame"),
+        Label("__gc_pushed"),
+        BGEU(t0, t8, "__gc_locals"),
+        *forward_word("0($t0)"),
+        ADDU(t0, t0, 4, True),
+        J("__gc_pushed"),
+        Label("__gc_locals"),
+        SRL(t7, t7, 16, True),
+        SUBU(t9, t6, 8, True),
+        Label("__gc_locals_loop"),
+        BEQZ(t7, "__gc_next_frame"),
+        *forward_word("0($t9)"),
+        SUBU(t9, t9, 4, True),
+        SUBU(t7, t7, 1, True),
+        J("__gc_locals_loop"),
+        Label("__gc_next_frame"),
+        LW(a0, "__gc_stack_top"),
+        BEQ(t6, a0, "__gc_scan"),
+        MOVE(t0, t6),
+        LW(t6, "0($t8)"),
+        J("__gc_frame"),
+        LineComment("Scan the copied objects"),
+        Label("__gc_scan"),
+        BGEU(t1, t2, "__gc_copy_end"),
+        LW(t7, "0($t1)"),
+        AND(t8, t7, CHARS, True),
+        BEQZ(t8, "__gc_scan_object"),
+        ADDU(t7, t7, 4 - CHARS, True),
+        ADDU(t1, t1, t7),
+        J("__gc_scan"),
+        Label("__gc_scan_object"),
+        LW(t7, "8($t1)"),
+        LA(t8, "__gc_layout"),
+        ADDU(t8, t8, t7),
+        LW(t7, "0($t8)"),
+        AND(t8, t7, 0xFFFF, True),
+        SRL(t7, t7, 16, True),
+        ADDU(t9, t1, 12, True),
+        ADDU(t1, t1, t8),
+        Label("__gc_scan_fields"),
+        BEQZ(t7, "__gc_scan"),
+        *forward_word("0($t9)"),
+        ADDU(t9, t9, 4, True),
+        SUBU(t7, t7, 1, True),
+        J("__gc_scan_fields"),
+        Label("__gc_copy_end"),
+        LW(ra, "__gc_copy_return"),
+        JR(ra),
+        LineComment("Function END\n"),
+    ])
+
+    # __gc_forward: devuelve en $v0 la direccion de la instancia $a0 en el
+    # nuevo semiespacio, copiandola si hace falta. Lo que no esta en
+    # [$t3, $t4) (void, los prototipos, los nombres de los tipos) no cambia.
+    # Usa $a1, $a2 y $a3.
+    emit([
+        Label("__gc_forward"),
+        MOVE(v0, a0),
+        BLTU(a0, t3, "__gc_forward_end"),
+        BGEU(a0, t4, "__gc_forward_end"),
+        LW(a1, "0($a0)"),
+        AND(a2, a1, FORWARDED, True),
+        BEQZ(a2, "__gc_forward_copy"),
+        SUBU(v0, a1, FORWARDED, True),
+        JR(ra),
+        Label("__gc_forward_copy"),
+        LW(a2, "8($a0)"),
+        LA(a3, "__gc_layout"),
+        ADDU(a3, a3, a2),
+        LW(a2, "0($a3)"),
+        AND(a2, a2, 0xFFFF, True),
+        MOVE(v0, t2),
+        MOVE(a3, a0),
+        Label("__gc_forward_loop"),
+        LW(a1, "0($a3)"),
+        SW(a1, "0($t2)"),
+        ADDU(a3, a3, 4, True),
+        ADDU(t2, t2, 4, True),
+        SUBU(a2, a2, 4, True),
+        BGTZ(a2, "__gc_forward_loop"),
+        OR(a1, v0, FORWARDED, True),
+        SW(a1, "0($a0)"),
+        LineComment("A String also takes its characters"),
+        LW(a1, "0($v0)"),
+        LA(a2, "String__name"),
+        BNE(a1, a2, "__gc_forward_end"),
+        LW(a0, "12($v0)"),
+        BLTU(a0, t3, "__gc_forward_end"),
+        BGEU(a0, t4, "__gc_forward_end"),
+        LW(a1, "-4($a0)"),
+        AND(a2, a1, FORWARDED, True),
+        BEQZ(a2, "__gc_forward_chars"),
+        SUBU(a1, a1, FORWARDED, True),
+        SW(a1, "12($v0)"),
+        JR(ra),
+        Label("__gc_forward_chars"),
+        SW(a1, "0($t2)"),
+        ADDU(t2, t2, 4, True),
+        OR(a2, t2, FORWARDED, True),
+        SW(a2, "-4($a0)"),
+        SW(t2, "12($v0)"),
+        SUBU(a2, a1, CHARS, True),
+        MOVE(a3, a0),
+        Label("__gc_forward_chars_loop"),
+        LW(a1, "0($a3)"),
+        SW(a1, "0($t2)"),
+        ADDU(a3, a3, 4, True),
+        ADDU(t2, t2, 4, True),
+        SUBU(a2, a2, 4, True),
+        BGTZ(a2, "__gc_forward_chars_loop"),
+        Label("__gc_forward_end"),
+        JR(ra),
+        LineComment("Function END\n"),
+    ])
+
+    # __gc_alloc_string: crea un String de $a0 caracteres con espacio para
+    # el 0 final y lo devuelve en $v0. Solo modifica $v0, $a0 y $ra.
+    emit([
+        Label("__gc_alloc_string"),
+        SW(ra, "__gc_string_return"),
+        SW(a0, "__gc_string_length"),
+        ADDU(a0, a0, 4, True),
+        AND(a0, a0, -4, True),
+        SW(a0, "__gc_string_buffer"),
+        LW(v0, "__gc_free"),
+        SUBU(v0, v0, a0),
+        SUBU(v0, v0, 24, True),
+        BGEZ(v0, "__gc_alloc_string_fits"),
+        JAL("__gc_collect"),
+        Label("__gc_alloc_string_fits"),
+        SW(v0, "__gc_free"),
+        LW(a0, "__gc_floor"),
+        ADDU(v0, v0, a0),
+        LW(a0, "__gc_string_buffer"),
+        OR(ra, a0, CHARS, True),
+        SW(ra, "0($v0)"),
+        ADDU(ra, v0, 4, True),
+        ADDU(v0, ra, a0),
+        SW(ra, "12($v0)"),
+        LA(ra, "String__name"),
+        SW(ra, "0($v0)"),
+        LA(ra, "String_start"),
+        SW(ra, "4($v0)"),
+        LI(ra, string_offset),
+        SW(ra, "8($v0)"),
+        LW(ra, "__gc_string_length"),
+        SW(ra, "16($v0)"),
+        LW(ra, "__gc_string_return"),
+        JR(ra),
+        LineComment("Function END\n"),
+    ])
+
+    # __gc_exit: termina el programa, imprimiendo antes las estadisticas del
+    # recolector si se pidieron. Las funciones siempre saltan aqui, de modo que
+    # su codigo no depende de `stats`
+    emit([Label("__gc_exit")])
+    if stats:
+        emit([
+            LW(a0, "__gc_start"),
+            LW(a1, "__gc_free"),
+            SUBU(a0, a0, a1),
+            LW(a1, "__gc_allocated"),
+            ADDU(a0, a0, a1),
+            SW(a0, "__gc_allocated"),
+            LW(a0, "__gc_size"),
+            SLL(a0, a0, 1, True),
+            SW(a0, "__gc_size"),
+        ])
+        for name, value in (
+            ("collections", "__gc_collections"),
+            ("allocated", "__gc_allocated"),
+            ("copied", "__gc_copied"),
+            ("heap", "__gc_size"),
+        ):
+            emit([
+                LA(a0, f"__gc_report_{name}"),
+                LI(v0, 4),
+                SYSCALL(),
+                LW(a0, value),
+                LI(v0, 1),
+                SYSCALL(),
+            ])
+        emit([
+            LA(a0, "__gc_report_newline"),
+            LI(v0, 4),
+            SYSCALL(),
+        ])
+    emit([
+        LineComment("syscall code 10 is for exit"),
+        LI(v0, 10),
+        SYSCALL(),
+        LineComment("Function END\n"),
+    ])
+    return code
@@ -271,4 +271,16 @@ class FixedData(MipsNode):
         self.type = type_
 
     def __str__(self):
-        return f"{self.name}:   .{self.type}    {self.value}"
\ No newline at end of file
+        return f"{self.name}:   .{self.type}    {self.value}"
+
+
+class Fragment(MipsNode):
+    """
+    Codigo MIPS ya formateado que se copia tal cual al programa, por ejemplo
+    las funciones de una clase tomadas de la cache de clases compiladas.
+    """
+    def __init__(self, text: str):
+        self.text = text
+
+    def __str__(self):
+        return self.text
\ No newline at end of file
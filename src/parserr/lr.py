@@ -107,7 +107,7 @@ def build_LR1_automaton(G: Grammar):
     return automaton
 
 
-def build_lalr_automaton(G):
+def build_lalr_automaton_by_merging(G):
     def centers(items: Iterable[Optional[Item]]):
         return frozenset(item.Center() for item in items)
 
@@ -124,7 +124,7 @@ def build_lalr_automaton(G):
     start_production = G.startSymbol.productions[0]
     start_item = Item(start_production, 0, (G.EOF, ))
 
-    start = State((closure_lr1(start_item, firsts)), True)
+    start = State((closure_lr1([start_item], firsts)), True)
 
     pending = [start_item]
     visisted_centers = {centers(start.state): start}
@@ -158,6 +158,153 @@ def build_lalr_automaton(G):
     return start
 
 
+def build_lr0_automaton(G):
+    """
+    Construye el automata LR(0) de la gramatica aumentada `G`.
+    Los items son pares (produccion, posicion) con las producciones numeradas
+    segun `G.Productions`. Devuelve la lista de estados, cada uno como la
+    lista de items de su clausura (primero los del kernel), y las
+    transiciones `goto[estado][simbolo] = estado`.
+    """
+    assert len(G.startSymbol.productions) == 1, 'Grammar must be augmented'
+    productions = {id(p): i for i, p in enumerate(G.Productions)}
+    rights = [p.Right for p in G.Productions]
+
+    def closure(kernel):
+        items = list(kernel)
+        seen = set(items)
+        for production, pos in items:
+            right = rights[production]
+            if pos < len(right) and right[pos].IsNonTerminal:
+                for p in right[pos].productions:
+                    item = (productions[id(p)], 0)
+                    if item not in seen:
+                        seen.add(item)
+                        items.append(item)
+        return items
+
+    start = ((productions[id(G.startSymbol.productions[0])], 0), )
+    states = [closure(start)]
+    goto = [{}]
+    kernels = {frozenset(start): 0}
+    pending = [0]
+    while pending:
+        current = pending.pop()
+        following: Dict[object, list] = {}
+        for production, pos in states[current]:
+            right = rights[production]
+            if pos < len(right):
+                following.setdefault(right[pos], []).append((production, pos + 1))
+
+        for symbol, kernel in following.items():
+            key = frozenset(kernel)
+            try:
+                target = kernels[key]
+            except KeyError:
+                target = kernels[key] = len(states)
+                states.append(closure(kernel))
+                goto.append({})
+                pending.append(target)
+            goto[current][symbol] = target
+
+    return states, goto
+
+
+def build_lalr_automaton(G):
+    """
+    Construye el automata LALR(1) a partir del automata LR(0), calculando los
+    lookaheads por propagacion en lugar de construir el automata LR(1) completo
+    y mezclar los estados con el mismo centro.
+
+    Cada par (estado, item) de las clausuras LR(0) es un nodo con su conjunto
+    de lookaheads, representado como un entero usado como conjunto de bits.
+    Un item A -> a.Bb genera en su estado los lookaheads First(b) para cada
+    item B -> .g, y si b es anulable le propaga ademas sus propios lookaheads.
+    Un item A -> a.Xb propaga sus lookaheads al item A -> aX.b del estado
+    goto(estado, X). Partiendo de S' -> .S con $ se propaga hasta el punto fijo.
+
+    Devuelve un automata de `State` equivalente al que construye
+    `build_lalr_automaton_by_merging`: los mismos estados, items,
+    lookaheads y transiciones, en el mismo orden.
+    """
+    firsts = compute_firsts(G)
+    firsts[G.EOF] = ContainerSet(G.EOF)
+    terminals = [G.EOF] + [t for t in G.terminals if t != G.EOF]
+    bit = {t: 1 << i for i, t in enumerate(terminals)}
+
+    states, goto = build_lr0_automaton(G)
+    rights = [p.Right for p in G.Productions]
+    productions = {id(p): i for i, p in enumerate(G.Productions)}
+
+    # First de cada sufijo de cada produccion: (bits, es anulable)
+    suffix_firsts = []
+    for right in rights:
+        suffixes = [(0, True)] * (len(right) + 1)
+        for pos in range(len(right) - 1, -1, -1):
+            symbol_first = firsts[right[pos]]
+            bits = 0
+            for t in symbol_first:
+                bits |= bit[t]
+            nullable = symbol_first.contains_epsilon
+            rest_bits, rest_nullable = suffixes[pos + 1]
+            suffixes[pos] = (bits | rest_bits if nullable else bits,
+                             nullable and rest_nullable)
+        suffix_firsts.append(suffixes)
+
+    nodes = {}
+    for n, items in enumerate(states):
+        for item in items:
+            nodes[n, item] = len(nodes)
+    lookaheads = [0] * len(nodes)
+    edges = [[] for _ in nodes]
+
+    for n, items in enumerate(states):
+        for production, pos in items:
+            right = rights[production]
+            if pos == len(right):
+                continue
+            node = nodes[n, (production, pos)]
+            symbol = right[pos]
+            edges[node].append(nodes[goto[n][symbol], (production, pos + 1)])
+            if symbol.IsNonTerminal:
+                bits, nullable = suffix_firsts[production][pos + 1]
+                for p in symbol.productions:
+                    target = nodes[n, (productions[id(p)], 0)]
+                    lookaheads[target] |= bits
+                    if nullable:
+                        edges[node].append(target)
+
+    start = nodes[0, (productions[id(G.startSymbol.productions[0])], 0)]
+    lookaheads[start] |= bit[G.EOF]
+
+    pending = list(range(len(nodes)))
+    while pending:
+        node = pending.pop()
+        bits = lookaheads[node]
+        for target in edges[node]:
+            if lookaheads[target] | bits != lookaheads[target]:
+                lookaheads[target] |= bits
+                pending.append(target)
+
+    # Construir los estados con los items LR(1) y las transiciones en el
+    # orden de los simbolos de la gramatica, que determina la numeracion.
+    automaton = []
+    for n, items in enumerate(states):
+        lr1_items = []
+        for production, pos in items:
+            bits = lookaheads[nodes[n, (production, pos)]]
+            lr1_items.append(Item(G.Productions[production], pos,
+                                  [t for t in terminals if bits & bit[t]]))
+        automaton.append(State(frozenset(lr1_items), True))
+
+    for n, state in enumerate(automaton):
+        for symbol in G.terminals + G.nonTerminals:
+            if symbol in goto[n]:
+                state.add_transition(symbol.Name, automaton[goto[n][symbol]])
+
+    return automaton[0]
+
+
 class LR1Parser(ShiftReduceParser):
     def _build_parsing_table(self):
         # G = self.G.AugmentedGrammar() if not self.G.IsAugmentedGrammar else self.G
@@ -2,7 +2,8 @@
 Este modulo contiene la declaracion de la clase ShiftReduceParser, la cual
 sirve de base para los parsers SLR, LALR y LR
 """
-from typing import Dict, List, Literal, Tuple, Union
+from array import array
+from typing import Dict, Iterable, List, Literal, Tuple, Union
 from grammar.grammar import EOF, Grammar
 from grammar.symbols import Production, Terminal
 from lexer.tokens import Token
@@ -27,63 +28,197 @@ class ShiftReduceParser:
     def __init__(self, G: Grammar, verbose: bool = False):
         self.G = G
         self.verbose = verbose
+        self.reductions = 0
         self.action: Dict[ActionTableEntry, Tuple[Action, Tag]] = {}
         self.goto = {}
         self._build_parsing_table()
+        self._compile_parsing_table()
 
     def _build_parsing_table(self):
         raise NotImplementedError()
 
-    def __call__(self, tokens: List[Token]):
-        stack = [0]
-        cursor = 0
-        output = []
-
-        if isinstance(tokens[0].token_type, EOF):
-            raise SyntaxError("(0,0) - SyntacticError: Cool program must not be empty.")
-
-        while True:
-            state = stack[-1]
-            lookahead = tokens[cursor].token_type
+    def _compile_parsing_table(self):
+        """
+        Compila las tablas action y goto a arreglos densos de enteros para
+        que el parser no tenga que hashear simbolos en cada paso.
+
+        - Los terminales y los no terminales se numeran por su nombre y las
+          producciones por orden de aparicion, recorriendo la tabla action
+          por estado y terminal. Asi la numeracion no depende del orden de
+          iteracion de los conjuntos y las tablas son reproducibles.
+        - Cada entrada de action es 0 si hay error, s + 1 si hay que hacer
+          shift al estado s y -(p + 1) si hay que reducir por la produccion p.
+          La produccion `self.accept` es la que acepta la cadena (OK).
+        - Cada entrada de goto es el estado destino, o -1.
+        """
+        states = 1 + max(
+            [state for state, _ in self.action] + [state for state, _ in self.goto]
+        )
+        names = sorted({terminal.Name for _, terminal in self.action})
+        self.terminals: Dict[str, int] = {name: i for i, name in enumerate(names)}
+        entries = sorted(
+            self.action.items(), key=lambda entry: (entry[0][0], entry[0][1].Name)
+        )
+
+        self.productions: List[Production] = []
+        numbers: Dict[Production, int] = {}
+        self.accept = -1
+
+        def number(production):
             try:
-                action, tag = self.action[state, lookahead]
+                return numbers[production]
             except KeyError:
-                col = tokens[cursor].token_column - len(tokens[cursor].lex)
-                if lookahead.Name == "self" or (
-                    lookahead.Name == "assign"
-                    and tokens[cursor - 1].token_type.Name == "self"
-                ):
-                    raise SyntaxError(
-                        f"({tokens[cursor].token_line},{col}) - "
-                        + f' SemanticError: ERROR "%s"' % tokens[cursor].lex
-                    )
-                raise SyntaxError(
-                    f"({tokens[cursor].token_line},{col}) - "
-                    + f' SyntacticError: ERROR "%s"' % tokens[cursor]
-                )
-
+                numbers[production] = len(self.productions)
+                self.productions.append(production)
+                return numbers[production]
+
+        width = len(self.terminals)
+        self.action_table = array("i", [0] * (states * width))
+        for (state, terminal), (action, tag) in entries:
+            index = state * width + self.terminals[terminal.Name]
             if action == self.SHIFT:
-                cursor += 1
-                assert isinstance(tag, int)
-                stack.append(tag)
+                self.action_table[index] = tag + 1
+            else:
+                self.action_table[index] = -(number(tag) + 1)
+                if action == self.OK:
+                    self.accept = numbers[tag]
+
+        heads = {nonterminal for _, nonterminal in self.goto}
+        heads.update(production.Left for production in self.productions)
+        nonterminals: Dict[object, int] = {
+            nonterminal: i
+            for i, nonterminal in enumerate(sorted(heads, key=lambda n: n.Name))
+        }
+        self.goto_width = len(nonterminals)
+        self.goto_table = array("i", [-1] * (states * self.goto_width))
+        for (state, nonterminal), target in self.goto.items():
+            self.goto_table[state * self.goto_width + nonterminals[nonterminal]] = target
+
+        self.lengths = array("i", [len(p.Right) for p in self.productions])
+        self.heads = array("i", [nonterminals[p.Left] for p in self.productions])
+
+    @classmethod
+    def from_tables(cls, G: Grammar, terminals: List[str], action_table,
+                    goto_table, goto_width: int, productions: List[Production],
+                    lengths, heads, accept: int):
+        """
+        Crea el parser a partir de las tablas ya compiladas (ver `tablecache`),
+        sin construir el automata. Las tablas action y goto originales no
+        estan disponibles en este caso.
+        """
+        parser = cls.__new__(cls)
+        parser.G = G
+        parser.verbose = False
+        parser.reductions = 0
+        parser.action = {}
+        parser.goto = {}
+        parser.terminals = {name: i for i, name in enumerate(terminals)}
+        parser.action_table = action_table
+        parser.goto_table = goto_table
+        parser.goto_width = goto_width
+        parser.productions = productions
+        parser.lengths = lengths
+        parser.heads = heads
+        parser.accept = accept
+        return parser
+
+    def __call__(self, tokens: Iterable[Token], evaluate: bool = False):
+        """
+        Analiza los tokens y devuelve la derivacion extrema derecha (la lista
+        de producciones aplicadas, empezando por la inicial).
+
+        Con `evaluate` en cambio se ejecuta la regla de atributos de cada
+        produccion al reducir, sobre una pila de valores paralela a la pila de
+        estados, y se devuelve el valor de la produccion inicial (el AST). El
+        valor de un terminal es su token. Asi el AST se construye en la misma
+        pasada, sin la lista de producciones y sin recursion.
 
-            elif action == self.REDUCE:
-                assert isinstance(tag, Production)
-                head, body = tag
+        `tokens` puede ser una lista o un generador (ver `Tokenizer.stream`):
+        se consumen de uno en uno con un token de lookahead, de modo que
+        con un generador el lexer avanza a la par del parser.
 
-                for _ in range(len(body)):
-                    stack.pop()
+        Al aceptar, `self.reductions` queda con la cantidad de producciones
+        reducidas.
+        """
+        tokens = iter(tokens)
+        token = next(tokens)
+        previous = None
+        if isinstance(token.token_type, EOF):
+            raise SyntaxError("(0,0) - SyntacticError: Cool program must not be empty.")
 
-                output.append(tag)
-                new_state = self.goto[stack[-1], head]
-                stack.append(new_state)
+        terminals = self.terminals
+        action_table, width = self.action_table, len(terminals)
+        goto_table, goto_width = self.goto_table, self.goto_width
+        lengths, heads = self.lengths, self.heads
+        productions, accept = self.productions, self.accept
 
-            elif action == self.OK:
-                output.append(tag)
-                return output[::-1]
+        stack = [0]
+        state = 0
+        output = []
+        reductions = 0
+        lookahead = terminals.get(token.token_type.Name, -1)
+        if evaluate:
+            rules = [production.attributes[0] for production in productions]
+            values = []
+
+        while True:
+            action = action_table[state * width + lookahead] if lookahead >= 0 else 0
+
+            if action > 0:
+                state = action - 1
+                stack.append(state)
+                if evaluate:
+                    values.append(token)
+                previous, token = token, next(tokens)
+                lookahead = terminals.get(token.token_type.Name, -1)
+
+            elif action < 0:
+                production = -action - 1
+                length = lengths[production]
+                reductions += 1
+                if evaluate:
+                    # synteticed[0] es el lugar de la cabeza, como en las
+                    # reglas de atributos de la gramatica
+                    rule = rules[production]
+                    synteticed = [None]
+                    if length:
+                        synteticed += values[-length:]
+                        del values[-length:]
+                    value = rule(synteticed) if rule else None
+                    if production == accept:
+                        self.reductions = reductions
+                        return value
+                    values.append(value)
+                else:
+                    output.append(productions[production])
+                    if production == accept:
+                        self.reductions = reductions
+                        return output[::-1]
+
+                if length:
+                    del stack[-length:]
+                state = goto_table[stack[-1] * goto_width + heads[production]]
+                stack.append(state)
 
             else:
-                raise Exception("La cadena no pertenece al lenguaje")
+                # Un error lexico mas adelante tiene prioridad, como cuando
+                # se tokenizaba todo el programa antes de analizarlo
+                for _ in tokens:
+                    pass
+                col = token.token_column - len(token.lex)
+                if token.token_type.Name == "self" or (
+                    token.token_type.Name == "assign"
+                    and previous is not None
+                    and previous.token_type.Name == "self"
+                ):
+                    raise SyntaxError(
+                        f"({token.token_line},{col}) - "
+                        + f' SemanticError: ERROR "%s"' % token.lex
+                    )
+                raise SyntaxError(
+                    f"({token.token_line},{col}) - "
+                    + f' SyntacticError: ERROR "%s"' % token
+                )
 
     def dumps_parser_state(self, file):
         """
@@ -0,0 +1,163 @@
+"""
+Instrumentacion de las fases del compilador.
+
+Un `Profiler` mide cada fase del pipeline (comentarios, lexer y parser,
+que construyen el AST en una sola pasada, fases del chequeo semantico,
+generacion de CIL y de MIPS): tiempo real, tiempo de CPU, pico de memoria
+reservada durante la fase segun `tracemalloc` y contadores propios de la
+fase (caracteres, nodos del AST, instrucciones CIL y MIPS, ...).
+
+Cuando no se esta perfilando se usa `NULL_PROFILER`, que no mide nada, para
+no afectar el tiempo de compilacion normal.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+
+class Stage:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = None
+        self.counts: Dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "wall_ms": round(self.wall * 1000, 3),
+            "cpu_ms": round(self.cpu * 1000, 3),
+            "peak_kib": None if self.peak is None else round(self.peak / 1024, 1),
+            "counts": self.counts,
+        }
+
+
+class Profiler:
+    """
+    Registra las fases en el orden en que se ejecutan. Si `memory` es
+    verdadero se activa `tracemalloc` y se mide el pico de memoria de cada
+    fase desde el inicio de la misma, sin incluir lo que ya estaba
+    reservado antes. El rastreo de memoria hace mas lenta la compilacion,
+    asi que los tiempos solo son representativos sin el.
+    """
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.stages: List[Stage] = []
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str):
+        stage = Stage(name)
+        self.stages.append(stage)
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield stage
+        finally:
+            stage.wall = time.perf_counter() - wall
+            stage.cpu = time.process_time() - cpu
+            if tracing:
+                stage.peak = tracemalloc.get_traced_memory()[1] - base
+
+    def count(self, name: str, value: int):
+        """
+        Agrega un contador a la ultima fase medida.
+        """
+        self.stages[-1].counts[name] = value
+
+    def to_json(self) -> str:
+        return json.dumps([stage.to_dict() for stage in self.stages], indent=2)
+
+    def to_table(self) -> str:
+        header = f"{'stage':<22}{'wall ms':>10}{'cpu ms':>10}{'peak KiB':>11}  counts"
+        lines = [header, "-" * len(header)]
+        for stage in self.stages:
+            counts = ", ".join(f"{k}={v}" for k, v in stage.counts.items())
+            peak = "-" if stage.peak is None else f"{stage.peak / 1024:.1f}"
+            lines.append(
+                f"{stage.name:<22}{stage.wall * 1000:>10.2f}{stage.cpu * 1000:>10.2f}"
+                f"{peak:>11}  {counts}"
+            )
+        wall = sum(stage.wall for stage in self.stages)
+        cpu = sum(stage.cpu for stage in self.stages)
+        lines.append("-" * len(header))
+        lines.append(f"{'total':<22}{wall * 1000:>10.2f}{cpu * 1000:>10.2f}")
+        return "\n".join(lines)
+
+
+class NullProfiler:
+    def stage(self, name: str):
+        return nullcontext()
+
+    def count(self, name: str, value: int):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def count_nodes(node) -> int:
+    """
+    Cuenta los nodos de un arbol recorriendo los atributos de cada nodo
+    (y las listas y tuplas que contengan) que sean del mismo modulo de
+    nodos que la raiz. Los nodos con `__slots__` (como los del AST) dan sus
+    campos con `fields()`.
+    """
+    module = type(node).__module__
+    total = 0
+    pending = [node]
+    seen = set()
+    while pending:
+        item = pending.pop()
+        if isinstance(item, (list, tuple)):
+            pending.extend(item)
+        elif type(item).__module__ == module and id(item) not in seen:
+            seen.add(id(item))
+            total += 1
+            fields = getattr(item, "fields", None)
+            if fields is not None:
+                pending.extend(value for _, value in fields())
+            else:
+                pending.extend(vars(item).values())
+    return total
+
+
+def count_instructions(program) -> int:
+    """
+    Cuenta las instrucciones de un programa MIPS, sin etiquetas,
+    comentarios, datos, directivas ni el codigo tomado de la cache.
+    """
+    from mips.baseMipsVisitor import AbstractDirective
+    from mips.instruction import FixedData, Fragment, Label, LineComment
+
+    skip = (AbstractDirective, FixedData, Fragment, Label, LineComment)
+    return sum(1 for node in program if not isinstance(node, skip))
+
+
+class Counter:
+    """
+    Envuelve un iterable y cuenta los elementos a medida que se consumen,
+    por ejemplo los tokens que el lexer le pasa al parser sin guardarlos en
+    una lista.
+    """
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.count = 0
+
+    def __iter__(self):
+        for item in self.iterable:
+            self.count += 1
+            yield item
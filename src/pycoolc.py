@@ -1,75 +1,243 @@
-from argparse import ArgumentParser
-from build.compiler_struct import LEXER, PARSER
-from cil.nodes import CilProgramNode
+from argparse import ArgumentParser, ArgumentTypeError
+from cil.nodes import CilProgramNode, FunctionNode
+from cil.optimizer import pass_manager
 from travels.ciltomips import MipsCodeGenerator
-from typecheck.evaluator import evaluate_right_parse
+from mips.gc import DEFAULT_HEAP_SIZE
+from classcache import DEFAULT_DIR, ClassCache
 from comments import find_comments
+from tablecache import load_lexer, load_parser
+from profiling import NULL_PROFILER, Counter, Profiler, count_instructions, count_nodes
 from travels.ctcill import CilDisplayFormatter, CoolToCILVisitor
+import os
 import sys
 
 
 def report(errors: list):
-    for error in set(errors):
+    # Sin repetidos y en el orden en que se encontraron: el primero es el
+    # que comprueban los tests
+    for error in dict.fromkeys(errors):
         print(error)
 
 
-def pipeline(program: str, deep: int, file_name) -> None:
-    try:
-        program = find_comments(program)
-        program = program.replace('\t', ' ' * 4)
-    except AssertionError as e:
-        print(e)
-        sys.exit(1)
+class CompilationError(Exception):
+    """
+    Errores que detienen la compilacion de un programa, ya formateados
+    como se reportan al usuario.
+    """
+    def __init__(self, errors: list):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+def compile_program(program: str, lexer="re", profiler=NULL_PROFILER, all_errors=False,
+                    cache: ClassCache = None, optimize: int = 0, heap_size: int = DEFAULT_HEAP_SIZE,
+                    gc_stats: bool = False) -> str:
+    """
+    Compila el texto de un programa Cool y devuelve el codigo MIPS.
+    Lanza CompilationError si el programa tiene errores.
+    Cada fase se mide con `profiler` (ver `profiling`). Con `all_errors`
+    el chequeo semantico reporta todos los errores ordenados por posicion
+    en lugar de detenerse en el primero. Con `cache` se reutiliza el codigo
+    de las clases que no cambiaron desde una compilacion anterior (ver
+    `classcache`). `optimize` es el nivel de optimizacion del codigo CIL
+    (ver `cil.optimizer`). `heap_size` y `gc_stats` configuran el recolector
+    de basura del programa generado (ver `mips.gc`).
+    """
+    with profiler.stage("tables"):
+        tokenizer = load_lexer(lexer)
+        parser = load_parser()
 
-    # Right now, program has no comments, so is safe to pass it to the LEXER
     try:
-        tokens = LEXER(program)
-    except Exception as e:
-        print(e)
-        sys.exit(1)
+        with profiler.stage("comments"):
+            program = find_comments(program)
+            program = program.replace('\t', ' ' * 4)
+        profiler.count("chars", len(program))
+    except AssertionError as e:
+        raise CompilationError([str(e)])
 
-    # Parse the tokens to obtain a derivation tree
+    # Right now, program has no comments, so is safe to pass it to the LEXER.
+    # The parser consumes the tokens as the lexer produces them and builds
+    # the AST in the same pass
+    tokens = tokenizer.stream(program)
+    if profiler is not NULL_PROFILER:
+        tokens = Counter(tokens)
     try:
-        parse = PARSER(tokens)
+        with profiler.stage("parser"):
+            ast = parser(tokens, evaluate=True)
     except Exception as e:
-        print(e)
-        sys.exit(1)
-    # build the AST from the obtained parse
-    # try:
-    ast = evaluate_right_parse(parse, tokens[:-1])
-    # except Exception as e:
-    #     print(e)
-    #     sys.exit(1)
+        raise CompilationError([str(e)])
+    if profiler is not NULL_PROFILER:
+        profiler.count("tokens", tokens.count)
+        profiler.count("reductions", parser.reductions)
+        profiler.count("nodes", count_nodes(ast))
     #####################
     # Start the visitors #
     ######################
 
     # Run type checker visitor
-    errors, context, scope = ast.check_semantics(deep)
+    errors, context, scope = ast.check_semantics(profiler, recover=all_errors)
     if errors:
-        report(errors)
-        sys.exit(1)
+        raise CompilationError(errors)
 
-    cil_travel = CoolToCILVisitor(context)
-    cil_program_node = cil_travel.visit(ast, scope)
+    with profiler.stage("cil"):
+        cil_travel = CoolToCILVisitor(context, cache)
+        cil_program_node = cil_travel.visit(ast, scope)
     # formatter = CilDisplayFormatter()
     # print(formatter(cil_program_node))
+    functions = [f for f in cil_program_node.dotcode if isinstance(f, FunctionNode)]
+    profiler.count("types", len(cil_program_node.dottypes))
+    profiler.count("functions", len(functions))
+    profiler.count("vtable_saved", cil_travel.vtable_saved)
+    profiler.count("instructions", sum(len(f.instructions) for f in functions))
+    if cache is not None:
+        profiler.count("cached", cil_travel.cached_classes)
 
-    mips_gen = MipsCodeGenerator()
-    assert isinstance(cil_program_node, CilProgramNode)
-    source = mips_gen(cil_program_node)
+    if optimize:
+        with profiler.stage("optimize"):
+            pass_manager(optimize).run(cil_program_node)
+        profiler.count("instructions", sum(len(f.instructions) for f in functions))
+        profiler.count("locals", sum(len(f.localvars) for f in functions))
 
-    with open(f"{file_name[: len(file_name) - 3]}.mips", "w+") as f:
-        f.write(source)
+    with profiler.stage("mips"):
+        mips_gen = MipsCodeGenerator(cache is not None, heap_size, gc_stats)
+        assert isinstance(cil_program_node, CilProgramNode)
+        source = mips_gen(cil_program_node)
+    profiler.count("instructions", count_instructions(mips_gen.program))
+    profiler.count("bytes", len(source))
 
+    if cache is not None:
+        with profiler.stage("cache"):
+            cache.store_classes(cil_travel.compiled_classes, mips_gen)
+        profiler.count("classes", len(cil_travel.compiled_classes))
+    return source
 
-if __name__ == "__main__":
+
+def output_path(file_name: str) -> str:
+    return f"{file_name[: len(file_name) - 3]}.mips"
+
+
+def write_atomic(path: str, source: str) -> None:
+    """
+    Escribe el fichero en un temporal del mismo directorio y luego lo
+    renombra, de modo que nunca queda un .mips a medio escribir.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as f:
+            f.write(source)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def pipeline(program: str, file_name, lexer="re", profiler=NULL_PROFILER, all_errors=False,
+             cache: ClassCache = None, optimize: int = 0, heap_size: int = DEFAULT_HEAP_SIZE,
+             gc_stats: bool = False) -> int:
+    """
+    Compila el programa y escribe el .mips junto a `file_name`. Reporta los
+    errores en la salida estandar y devuelve el codigo de salida.
+    """
+    try:
+        source = compile_program(program, lexer, profiler, all_errors, cache, optimize,
+                                 heap_size, gc_stats)
+    except CompilationError as e:
+        report(e.errors)
+        return 1
+
+    with profiler.stage("write"):
+        write_atomic(output_path(file_name), source)
+    return 0
+
+
+def heap_size(text: str) -> int:
+    size = int(text)
+    if size < 8:
+        raise ArgumentTypeError("the heap needs at least 8 bytes")
+    return size
+
+
+def main(argv=None) -> int:
     parser = ArgumentParser()
     parser.add_argument("file", type=str, help="Cool source file.")
-    parser.add_argument("--deep", type=int)
-    args = parser.parse_args()
-    deep = 1 if args.deep is None else args.deep
+    parser.add_argument(
+        "--deep",
+        type=int,
+        help="Ignored, kept for compatibility: type inference runs until a fixpoint.",
+    )
+    parser.add_argument(
+        "--lexer",
+        choices=("re", "dfa"),
+        default="re",
+        help="Lexer backend: re (regex table) or dfa (table-driven automaton).",
+    )
+    parser.add_argument(
+        "--all-errors",
+        action="store_true",
+        help="Report every semantic error, sorted by position, instead of stopping at the first.",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=DEFAULT_DIR,
+        metavar="DIR",
+        help=f"Reuse the generated code of unchanged classes, stored in DIR (default: {DEFAULT_DIR}).",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimize",
+        type=int,
+        nargs="?",
+        const=1,
+        default=0,
+        choices=(0, 1, 2),
+        metavar="LEVEL",
+        help="Optimize the CIL code: 1 runs each pass once, 2 repeats them until nothing changes "
+        "(default: 0, -O alone means 1).",
+    )
+    parser.add_argument(
+        "--heap-size",
+        type=heap_size,
+        default=DEFAULT_HEAP_SIZE,
+        metavar="BYTES",
+        help="Initial heap of the generated program, split in two semispaces by the garbage "
+        f"collector; it grows when needed (default: {DEFAULT_HEAP_SIZE}).",
+    )
+    parser.add_argument(
+        "--gc-stats",
+        action="store_true",
+        help="Make the generated program print garbage collector statistics when it exits.",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=("table", "json"),
+        help="Report time and counts per compiler stage on stderr.",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="With --profile, also trace the peak memory of each stage (slower).",
+    )
+    args = parser.parse_args(argv)
     with open(args.file, "r") as f:
         program = f.read()
-        pipeline(program, deep, args.file)
-        sys.exit(0)
+    cache = ClassCache(args.cache, args.optimize) if args.cache is not None else None
+    if args.profile is None:
+        return pipeline(program, args.file, args.lexer, all_errors=args.all_errors, cache=cache,
+                        optimize=args.optimize, heap_size=args.heap_size, gc_stats=args.gc_stats)
+
+    profiler = Profiler(memory=args.profile_memory)
+    profiler.start()
+    try:
+        status = pipeline(program, args.file, args.lexer, profiler, args.all_errors, cache, args.optimize,
+                          args.heap_size, args.gc_stats)
+    finally:
+        profiler.stop()
+    profile = profiler.to_table() if args.profile == "table" else profiler.to_json()
+    print(profile, file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
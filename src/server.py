@@ -0,0 +1,126 @@
+"""
+Servidor de compilacion persistente.
+
+Mantiene en un proceso de larga vida todo lo que `pycoolc.py` tiene que
+preparar en cada invocacion: los modulos del compilador importados, la
+gramatica, las tablas del parser y los lexers. Cada peticion se compila
+dentro del mismo proceso, capturando la salida y el codigo de retorno que
+habria producido `pycoolc.py`.
+
+El protocolo es una linea JSON por peticion y una linea JSON por respuesta:
+
+    peticion:  {"argv": ["file.cl", "--lexer", "dfa"], "cwd": "/ruta"}
+    respuesta: {"status": 0, "stdout": "...", "stderr": "..."}
+
+`argv` son los mismos argumentos que recibe `pycoolc.py`. El fichero `.mips`
+se escribe junto al `.cl`, igual que en una compilacion normal.
+
+El servidor escucha en un socket Unix (por defecto `default_socket()`) o, con
+`--stdio`, lee las peticiones de la entrada estandar y escribe las respuestas
+en la salida estandar. El cliente `client.py` y `coolc-client.sh` son los
+reemplazos directos de `coolc.sh` que hablan con el servidor.
+"""
+import io
+import json
+import os
+import socketserver
+import sys
+import traceback
+from argparse import ArgumentParser
+from contextlib import redirect_stderr, redirect_stdout
+from client import default_socket
+
+
+def warm_up():
+    """
+    Importa el compilador y carga la gramatica, el parser y los lexers.
+    """
+    import pycoolc
+    from tablecache import load_lexer, load_parser
+
+    load_parser()
+    load_lexer("re")
+    load_lexer("dfa")
+    return pycoolc
+
+
+def compile_request(request: dict) -> dict:
+    """
+    Ejecuta `pycoolc.main` con los argumentos de la peticion y devuelve la
+    salida capturada y el codigo de retorno.
+    """
+    pycoolc = warm_up()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+    cwd = os.getcwd()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                os.chdir(request.get("cwd", cwd))
+                status = pycoolc.main(list(request["argv"]))
+            except SystemExit as e:
+                if e.code is None:
+                    status = 0
+                elif isinstance(e.code, int):
+                    status = e.code
+                else:
+                    print(e.code, file=sys.stderr)
+                    status = 1
+            except Exception:
+                traceback.print_exc()
+                status = 1
+    finally:
+        os.chdir(cwd)
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def handle(line: bytes) -> bytes:
+    try:
+        response = compile_request(json.loads(line))
+    except (ValueError, KeyError, TypeError) as e:
+        response = {"status": 2, "stdout": "", "stderr": "Bad request: %s\n" % e}
+    return (json.dumps(response) + "\n").encode()
+
+
+class CompileHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(handle(line))
+                self.wfile.flush()
+
+
+def serve_socket(path: str):
+    if os.path.exists(path):
+        os.unlink(path)
+    # Las peticiones se atienden de una en una: la salida se captura
+    # redirigiendo sys.stdout, que es global al proceso.
+    with socketserver.UnixStreamServer(path, CompileHandler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+def serve_stdio():
+    for line in sys.stdin.buffer:
+        if line.strip():
+            sys.stdout.buffer.write(handle(line))
+            sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Persistent Cool compile server.")
+    parser.add_argument("--socket", type=str, default=None,
+                        help="Unix socket path (default: $COOLC_SOCKET or /tmp/pycoolc-UID.sock).")
+    parser.add_argument("--stdio", action="store_true",
+                        help="Read requests from stdin and write responses to stdout.")
+    args = parser.parse_args()
+    warm_up()
+    try:
+        if args.stdio:
+            serve_stdio()
+        else:
+            serve_socket(args.socket or default_socket())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,211 @@
+"""
+Cache binario de las tablas del lexer y del parser.
+
+Las tablas se guardan en `build/cool.tables` como arreglos planos de enteros
+(int32 en el orden de bytes de la maquina) mas una tabla con los nombres de
+los terminales. El fichero se abre con mmap y cada seccion se expone como un
+memoryview, de modo que solo se leen del disco las paginas que se usan y no
+hace falta deserializar ningun objeto.
+
+El fichero esta versionado y guarda el hash de `coolgrammar/grammar.py`: si la
+gramatica, el formato o el orden de bytes cambian, las tablas se reconstruyen
+y se vuelven a escribir automaticamente. Las acciones semanticas de las
+producciones no se guardan, se toman de la gramatica construida en memoria,
+que es barata de crear.
+
+Formato:
+    cabecera:   magic, version, orden de bytes, sha256 de la gramatica,
+                numero de secciones
+    directorio: nombre, tipo ('i' enteros, 'B' bytes), desplazamiento y
+                tamano de cada seccion
+    datos:      las secciones, alineadas a 8 bytes
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from functools import lru_cache
+
+MAGIC = b"COOLTBL\0"
+VERSION = 1
+BASE = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR = os.path.join(BASE, "coolgrammar", "grammar.py")
+DEFAULT_PATH = os.path.join(BASE, "build", "cool.tables")
+
+HEADER = struct.Struct("<8sIc32sI")
+ENTRY = struct.Struct("<24scQQ")
+ALIGN = 8
+
+
+def grammar_hash(path: str = GRAMMAR) -> bytes:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _byteorder() -> bytes:
+    return b"l" if sys.byteorder == "little" else b"b"
+
+
+def build_tables(digest: bytes) -> bytes:
+    """
+    Construye la gramatica, el parser LALR y el lexer DFA y devuelve el
+    contenido del fichero de tablas.
+    """
+    from coolgrammar.grammar import build_cool_grammar
+    from lexer.tokenizer import Lexer
+    from parserr.lr import LALRParser
+
+    G, _ = build_cool_grammar()
+    _, dfa = build_cool_grammar(Lexer)
+    parser = LALRParser(G)
+
+    numbers = {id(p): i for i, p in enumerate(G.Productions)}
+    productions = [numbers[id(p)] for p in parser.productions]
+    terminals = sorted(parser.terminals, key=parser.terminals.__getitem__)
+
+    sections = {
+        "parser.action": parser.action_table,
+        "parser.goto": parser.goto_table,
+        "parser.lengths": parser.lengths,
+        "parser.heads": parser.heads,
+        "parser.productions": array("i", productions),
+        "parser.meta": array("i", [parser.goto_width, parser.accept]),
+        "parser.terminals": "\0".join(terminals).encode(),
+        "lexer.transitions": dfa.transitions,
+        "lexer.accept": dfa.accept,
+        "lexer.starts": array("i", dfa.classes.starts),
+        "lexer.classes": array("i", dfa.classes.classes),
+    }
+
+    offset = HEADER.size + ENTRY.size * len(sections)
+    directory = []
+    data = []
+    for name, section in sections.items():
+        payload = section.tobytes() if isinstance(section, array) else section
+        padding = -offset % ALIGN
+        data.append(b"\0" * padding)
+        offset += padding
+        typecode = b"i" if isinstance(section, array) else b"B"
+        directory.append(ENTRY.pack(name.encode(), typecode, offset, len(payload)))
+        data.append(payload)
+        offset += len(payload)
+
+    header = HEADER.pack(MAGIC, VERSION, _byteorder(), digest, len(sections))
+    return b"".join([header] + directory + data)
+
+
+def write_tables(path: str = DEFAULT_PATH, digest: bytes = None) -> bytes:
+    """
+    Reconstruye las tablas y las escribe en `path` de forma atomica
+    (se escribe un temporal y luego se renombra). Devuelve su contenido.
+    """
+    content = build_tables(grammar_hash() if digest is None else digest)
+    temporary = "%s.%d.tmp" % (path, os.getpid())
+    with open(temporary, "wb") as f:
+        f.write(content)
+    os.replace(temporary, path)
+    return content
+
+
+class Tables:
+    """
+    Vista de solo lectura sobre el contenido de un fichero de tablas.
+    Lanza ValueError si el contenido no corresponde a `digest`.
+    """
+    def __init__(self, buffer, digest: bytes):
+        if len(buffer) < HEADER.size:
+            raise ValueError("Truncated tables")
+        magic, version, order, stored, count = HEADER.unpack_from(buffer)
+        if (magic, version, order, stored) != (MAGIC, VERSION, _byteorder(), digest):
+            raise ValueError("Stale tables")
+
+        self.buffer = buffer
+        view = memoryview(buffer)
+        self.sections = {}
+        for i in range(count):
+            name, typecode, offset, size = ENTRY.unpack_from(
+                buffer, HEADER.size + i * ENTRY.size
+            )
+            section = view[offset : offset + size]
+            if typecode == b"i":
+                section = section.cast("i")
+            self.sections[name.rstrip(b"\0").decode()] = section
+
+    @staticmethod
+    def open(path: str, digest: bytes):
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return Tables(buffer, digest)
+
+    def __getitem__(self, name: str):
+        return self.sections[name]
+
+
+@lru_cache(maxsize=None)
+def load_tables(path: str = DEFAULT_PATH) -> Tables:
+    """
+    Abre las tablas de `path`, reconstruyendolas si faltan o estan
+    desactualizadas. Si no se pueden escribir se usan desde memoria.
+    """
+    digest = grammar_hash()
+    try:
+        return Tables.open(path, digest)
+    except (OSError, ValueError):
+        pass
+    try:
+        write_tables(path, digest)
+        return Tables.open(path, digest)
+    except OSError:
+        return Tables(build_tables(digest), digest)
+
+
+@lru_cache(maxsize=None)
+def load_grammar():
+    from coolgrammar.grammar import build_cool_grammar
+
+    return build_cool_grammar()
+
+
+@lru_cache(maxsize=None)
+def load_parser():
+    from parserr.lr import LALRParser
+
+    G, _ = load_grammar()
+    tables = load_tables()
+    goto_width, accept = tables["parser.meta"]
+    return LALRParser.from_tables(
+        G,
+        bytes(tables["parser.terminals"]).decode().split("\0"),
+        tables["parser.action"],
+        tables["parser.goto"],
+        goto_width,
+        [G.Productions[i] for i in tables["parser.productions"]],
+        tables["parser.lengths"],
+        tables["parser.heads"],
+        accept,
+    )
+
+
+@lru_cache(maxsize=None)
+def load_lexer(backend: str = "re"):
+    """
+    Devuelve el lexer `re` (la tabla de expresiones regulares de la gramatica)
+    o el lexer `dfa` (el automata guardado en las tablas).
+    """
+    G, tokenizer = load_grammar()
+    if backend == "re":
+        return tokenizer
+
+    from lexer.tokenizer import Lexer
+
+    tables = load_tables()
+    return Lexer.from_tables(
+        tokenizer.regexs,
+        G.EOF,
+        tables["lexer.starts"],
+        tables["lexer.classes"],
+        tables["lexer.transitions"],
+        tables["lexer.accept"],
+    )
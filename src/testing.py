@@ -1,8 +1,8 @@
-from build.compiler_struct import LEXER, PARSER
 from cil.nodes import CilProgramNode
 from travels.ciltomips import MipsCodeGenerator
 from typecheck.evaluator import evaluate_right_parse
 from comments import find_comments
+from tablecache import load_lexer, load_parser
 from travels.ctcill import CilDisplayFormatter, CoolToCILVisitor
 import sys
 
@@ -12,7 +12,7 @@ def report(errors: list):
         print(error)
 
 
-def pipeline(program: str, deep: int) -> None:
+def pipeline(program: str) -> None:
     try:
         program = find_comments(program)
         program = program.replace('\t', ' ' * 4)
@@ -22,14 +22,14 @@ def pipeline(program: str, deep: int) -> None:
 
     # Right now, program has no comments, so is safe to pass it to the LEXER
     try:
-        tokens = LEXER(program)
+        tokens = load_lexer()(program)
     except Exception as e:
         print(e)
         sys.exit(1)
 
     # Parse the tokens to obtain a derivation tree
     try:
-        parse = PARSER(tokens)
+        parse = load_parser()(tokens)
     except Exception as e:
         print(e)
         sys.exit(1)
@@ -44,7 +44,7 @@ def pipeline(program: str, deep: int) -> None:
     ######################
 
     # Run type checker visitor
-    errors, context, scope = ast.check_semantics(deep)
+    errors, context, scope = ast.check_semantics()
     if errors:
         report(errors)
         sys.exit(1)
@@ -87,4 +87,4 @@ class Complex inherits IO {
 };
 
 """
-pipeline(text, 1)
+pipeline(text)
@@ -1,4 +1,6 @@
 import re
+from operator import itemgetter
+from sys import intern
 from typing import List, Tuple, Union
 from grammar.symbols import EOF
 from lexer.tokens import Token
@@ -10,6 +12,7 @@ RegexTypes = Tuple[Union[str, Terminal], str]
 class Tokenizer:
     def __init__(self, regex_table: List[RegexTypes], eof: EOF):
         self.regexs = self._build_regexs(regex_table)
+        self.master, self.spans = self._build_master(self.regexs)
         self.eof = eof
         self.line = 1
         self.column = 1
@@ -23,26 +26,49 @@ class Tokenizer:
         regexs.append(("Space", fixed_space_token))
         return regexs
 
-    def _walk(self, string: str):
-        matched_suffix = ""
-        tt = None
+    def _build_master(self, regexs):
+        """
+        Compila toda la tabla en una unica expresion regular. Cada regla se
+        envuelve en un lookahead opcional con un grupo con nombre, de forma
+        que un solo match en la posicion actual devuelve lo que hubiera
+        reconocido cada regla por separado. Esto permite conservar la
+        semantica de match mas largo y, en caso de empate, la primera regla
+        de la tabla.
+        """
+        alternatives = []
+        for i, (_, regex) in enumerate(regexs):
+            # Los flags globales como (?i) solo son validos al inicio del
+            # patron, asi que se convierten en flags locales al grupo.
+            flags = re.match(r"\(\?([aiLmsux]+)\)", regex)
+            if flags is not None:
+                regex = f"(?{flags.group(1)}:{regex[flags.end():]})"
+            alternatives.append(f"(?:(?=(?P<_rule{i}>{regex})))?")
+        master = re.compile("".join(alternatives))
+        # Siempre hay al menos dos reglas (Line y Space), por lo que
+        # itemgetter devuelve una tupla con un span por regla.
+        spans = itemgetter(*(master.groupindex[f"_rule{i}"] for i in range(len(regexs))))
+        return master, spans
 
-        for token_type, regex in self.regexs:
-            match = re.match(regex, string)
-            if match is not None:
-                msuffix = match.group()
-                if len(msuffix) > len(matched_suffix):
-                    matched_suffix = msuffix
-                    tt = token_type
-
-        return matched_suffix, tt
+    def _walk(self, text: str, pos: int):
+        # Spans de cada regla en la posicion actual, (-1, -1) si no reconoce
+        # nada. index devuelve la primera ocurrencia del maximo, asi que en
+        # caso de empate gana la regla que aparece primero en la tabla.
+        spans = self.spans(self.master.match(text, pos).regs)
+        best = max(spans)
+        if best[1] <= pos:
+            return "", None
+        return text[pos : best[1]], self.regexs[spans.index(best)][0]
 
     def _tokenize(self, text):
-        while text:
-            string = text
-            suffix, token_type = self._walk(string)
+        # La posicion se reinicia en cada texto para poder reutilizar el
+        # tokenizador (por ejemplo desde el servidor de compilacion).
+        self.line = 1
+        self.column = 1
+        pos = 0
+        while pos < len(text):
+            suffix, token_type = self._walk(text, pos)
             if token_type is None:
-                next_token = string.split()[0]
+                next_token = text[pos:].split()[0]
                 raise SyntaxError(
                     f"({self.line},{self.column}) - LexicographicError: Unexpected Token %s"
                     % next_token
@@ -89,12 +115,25 @@ class Tokenizer:
             else:
                 self.column += len(suffix)
             yield suffix, token_type
-            text = text[len(suffix) :]
+            pos += len(suffix)
         yield "$", self.eof
 
-    def __call__(self, text):
-        tokens = []
+    def stream(self, text):
+        """
+        Genera los tokens del texto a medida que se reconocen, terminando con
+        el de fin de cadena. Los errores lexicos se lanzan al llegar a ellos.
+
+        Los lexemas se internan (`sys.intern`): todas las apariciones de un
+        identificador, nombre de tipo o palabra clave comparten el mismo
+        objeto, tambien con las constantes del codigo del compilador
+        ("Object", "self", ...). Asi las comparaciones y busquedas por nombre
+        de las fases siguientes (`Context.get_type`, `Type.__eq__`, scopes,
+        tablas de metodos) se resuelven por identidad con el hash ya
+        calculado.
+        """
         for lex, token_type in self._tokenize(text):
             if token_type not in ("Line", "Space"):
-                tokens.append(Token(lex, token_type, self.column, self.line))
-        return tokens
+                yield Token(intern(lex), token_type, self.column, self.line)
+
+    def __call__(self, text):
+        return list(self.stream(text))
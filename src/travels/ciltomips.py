@@ -14,21 +14,28 @@ from cil.nodes import (
     GetValue,
     JumpIfGreater,
     LocalNode,
+    LowerEqualCilNode,
+    LowerThanCilNode,
     MinusNodeComp,
     PureMinus,
     ReferenceEqualNode,
 )
 from mips.arithmetic import ADD, ADDU, DIV, MUL, NOR, NOT, SUB, SUBU
+from mips.comparison import SEQ, SLE, SLT
 from mips.baseMipsVisitor import (
     BaseCilToMipsVisitor,
     DotDataDirective,
     DotTextDirective,
-    locate_attribute_in_type_hierarchy,
+    RuntimeLayout,
+    name_label,
+    prototype_label,
 )
+from mips import gc
 import cil.nodes as cil
-from mips.branch import BEQ, BEQZ, BGT, BGTU, J
+from mips.branch import BEQ, BEQZ, BGT, BGTU, J, JAL
 from mips.instruction import (
     FixedData,
+    Fragment,
     Label,
     MOVE,
     REG_TO_STR,
@@ -62,6 +69,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         # .TYPES, .DATA y .CODE
 
         self.types = node.dottypes
+        self.layout = RuntimeLayout(node.dottypes)
 
         # Los tipos los definiremos en la seccion .data
         self.register_instruction(DotDataDirective())
@@ -82,11 +90,23 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
             self.visit(data_node)
             self.comment("\n\n")
 
+        # Variables del recolector de basura y disposicion de las instancias
+        # de cada tipo
+        layouts = [self.instance_layout(type_node) for type_node in node.dottypes]
+        for instruction in gc.runtime_data(layouts, self.gc_stats):
+            self.register_instruction(instruction)
+        self.comment("\n\n")
+
         # El codigo referente a cada funcion debe ir en la seccion de texto.
         self.register_instruction(DotTextDirective())
 
         self.define_entry_point()
 
+        # Rutinas del recolector de basura
+        string_offset = self.layout.type_index("String") * 4
+        for instruction in gc.runtime_code(string_offset, self.gc_stats):
+            self.register_instruction(instruction)
+
         # Visitar cada nodo de la seccion .CODE
         for code_node in node.dotcode:
             self.visit(code_node)
@@ -143,8 +163,21 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         # sizeof
         self.register_instruction(Label(f"{node.name}_end"))
 
+        # Nombre del tipo y prototipo de sus instancias
+        self.create_prototype(node)
+
         self.current_type = None
 
+    def instance_layout(self, node: cil.TypeNode) -> int:
+        # Tamanno de las instancias del tipo y cuantos atributos son punteros.
+        # Los Int y los Bool guardan su valor y el String su longitud y sus
+        # caracteres, que el recolector copia junto con el.
+        if node.name in ("Int", "Bool"):
+            return gc.type_layout(16, 0)
+        if node.name == "String":
+            return gc.type_layout(20, 0)
+        return gc.type_layout(12 + len(node.attributes) * 4, len(node.attributes))
+
     @visit.register
     def _(self, node: cil.DataNode):
         if isinstance(node.value, str):
@@ -169,9 +202,25 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         elif isinstance(node.value, int):
             self.register_instruction(FixedData(node.name, node.value))
 
+    @visit.register
+    def _(self, node: cil.CachedCodeNode):
+        self.register_instruction(Fragment(node.text))
+
     @visit.register
     def _(self, node: cil.FunctionNode):
+        if self.recorded is not None:
+            # Anotar que posiciones del programa usa la funcion para poder
+            # guardarla en la cache de clases
+            self.layout.dependencies = {}
+            start = len(self.program)
         self.current_function = node
+        self.allocations = 0
+
+        # Los locales que guardan punteros van primero en el marco, el
+        # recolector de basura solo recorre esos (ver allocate_stack_frame)
+        node.localvars = [l for l in node.localvars if not l.raw] + [
+            l for l in node.localvars if l.raw
+        ]
 
         # Documentar la signatura de la funcion (parametros que recibe, valor que devuelve)
         self.cil_func_signature(node)
@@ -189,6 +238,10 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
 
         self.comment("Function END\n\n")
 
+        if self.recorded is not None:
+            self.recorded[node.name] = (start, len(self.program), self.layout.dependencies)
+            self.layout.dependencies = None
+
     @visit.register
     def _(self, node: cil.InitSelfNode):
         src = self.visit(node.src)
@@ -321,7 +374,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.add_source_line_comment(node)
 
         # Localizar el atributo
-        offset = self.locate_attribute(node.attrname, node.itype.attributes)
+        offset = self.locate_attribute(node.attrname, node.itype)
 
         dest = self.visit(node.dest)
         reg = self.get_available_register()
@@ -342,7 +395,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.add_source_line_comment(node)
 
         # Localizar el atributo
-        offset = self.locate_attribute(node.attrname, node.itype.attributes)
+        offset = self.locate_attribute(node.attrname, node.itype)
 
         source = self.visit(node.source)
         reg = self.get_available_register()
@@ -366,54 +419,29 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         dest = self.visit(node.dest)
         assert dest is not None
 
-        size = 20
+        size = 16
 
-        # Reservar memoria para el tipo
         self.allocate_memory(size)
         reg = self.get_available_register()
 
         assert reg is not None
 
-        self.comment("Allocating string for type Bool")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg, "String"))
+        # Almacenar el nombre del tipo BOOL
+        self.register_instruction(LA(reg, name_label("Bool")))
         self.register_instruction(SW(reg, "0($v0)"))
 
-        self.register_instruction(LA(reg, "String_start"))
-        self.register_instruction(SW(reg, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg, offset))
-        self.register_instruction(SW(reg, "8($v0)"))
-
-        self.register_instruction(LA(reg, "Bool"))
-        self.register_instruction(SW(reg, "12($v0)"))
-
-        self.register_instruction(LI(reg, 4))
-        self.register_instruction(SW(reg, "16($v0)"))
-
-        # devolver la instancia
-        self.register_instruction(MOVE(reg, v0))
-
-        size = 16
-
-        self.allocate_memory(size)
-
-        # Almacenar el string al tipo BOOL
-        self.register_instruction(SW(reg, f"0($v0)"))
-
         self.register_instruction(LA(reg, "Bool_start"))
         self.register_instruction(SW(reg, "4($v0)"))
 
         self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "Bool") * 4
+        offset = self.layout.type_index("Bool") * 4
         self.register_instruction(LI(reg, offset))
         self.register_instruction(SW(reg, "8($v0)"))
 
-        self.register_instruction(LI(reg, node.value))
+        if isinstance(node.value, int):
+            self.register_instruction(LI(reg, node.value))
+        else:
+            self.register_instruction(LW(reg, self.visit(node.value)))
         self.register_instruction(SW(reg, "12($v0)"))
 
         # devolver la instancia
@@ -427,50 +455,22 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         value = self.visit(node.value)
         assert dest is not None
 
-        size = 20
+        size = 16
 
-        # Reservar memoria para el tipo
         self.allocate_memory(size)
         reg = self.get_available_register()
 
         assert reg is not None
 
-        self.comment("Allocating string for type Int")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg, "String"))
+        # Almacenar el nombre del tipo Int
+        self.register_instruction(LA(reg, name_label("Int")))
         self.register_instruction(SW(reg, "0($v0)"))
 
-        self.register_instruction(LA(reg, "String_start"))
-        self.register_instruction(SW(reg, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg, offset))
-        self.register_instruction(SW(reg, "8($v0)"))
-
-        self.register_instruction(LA(reg, "Int"))
-        self.register_instruction(SW(reg, "12($v0)"))
-
-        self.register_instruction(LI(reg, 3))
-        self.register_instruction(SW(reg, "16($v0)"))
-
-        # devolver la instancia
-        self.register_instruction(MOVE(reg, v0))
-
-        size = 16
-
-        self.allocate_memory(size)
-
-        # Almacenar el string al tipo BOOL
-        self.register_instruction(SW(reg, f"0($v0)"))
-
         self.register_instruction(LA(reg, "Int_start"))
         self.register_instruction(SW(reg, "4($v0)"))
 
         self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "Int") * 4
+        offset = self.layout.type_index("Int") * 4
         self.register_instruction(LI(reg, offset))
         self.register_instruction(SW(reg, "8($v0)"))
 
@@ -501,7 +501,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.comment("Allocating string")
 
         # Inicializar la instancia
-        self.register_instruction(LA(reg, "String"))
+        self.register_instruction(LA(reg, name_label("String")))
         self.register_instruction(SW(reg, "0($v0)"))
 
         self.register_instruction(LA(reg, "String_start"))
@@ -509,7 +509,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
 
         # Cargar el offset del tipo
         self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
+        offset = self.layout.type_index("String") * 4
         self.register_instruction(LI(reg, offset))
         self.register_instruction(SW(reg, "8($v0)"))
 
@@ -527,24 +527,29 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
     @visit.register
     def _(self, node: cil.AllocateNode):
         # Cada instancia debe almacenar lo siguiente:
+        # - Un puntero al nombre de su tipo
         # - Un puntero a la vTable de su tipo
-        # - Espacio para cada atributo
         # - Un puntero a su tipo en el array de tipos, de modo que sea facil calcular typeof
+        # - Espacio para cada atributo
 
         #################################  address
         #          TYPE_POINTER         #
         #################################  address + 4
         #          VTABLE_POINTER       #
         #################################  address  + 8
-        #           ATTRIBUTE_1         #
+        #           TYPE_OFFSET         #
         #################################  address + 12
-        #           ATTRIBUTE_2         #
+        #           ATTRIBUTE_1         #
         #################################
         #               ...             #
         #               ...             #
         #               ...             #
         #################################
 
+        # La instancia se crea copiando el prototipo del tipo (ver
+        # create_prototypes), que ya tiene el valor por defecto de cada
+        # atributo. Solo se llaman las funciones de los atributos que tienen
+        # expresion de inicializacion.
         num_bytes = 12  # inicialmente necesita al menos 3 punteros
         dest = self.visit(node.dest)
 
@@ -554,93 +559,54 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
 
         self.add_source_line_comment(node)
 
-        num_bytes += len(instance_type.attributes) * 4
+        initializers = self.layout.attribute_initializers(instance_type)
+        num_bytes += len(initializers) * 4
 
         reg = self.get_available_register()
         temp = self.get_available_register()
         assert reg is not None and temp is not None, "Out of registers."
 
-        # Inicializar la instancia
-
-        # Crear el string referente al nombre del tipo
-        length = len(instance_type.name)
-
-        size = 20
-
-        # Reservar memoria para el tipo
-        self.allocate_memory(size)
-        self.comment("Allocating string for type name")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg, "String"))
-        self.register_instruction(SW(reg, "0($v0)"))
-
-        self.register_instruction(LA(reg, "String_start"))
-        self.register_instruction(SW(reg, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg, offset))
-        self.register_instruction(SW(reg, "8($v0)"))
-
-        self.register_instruction(LA(reg, instance_type.name))
-        self.register_instruction(SW(reg, "12($v0)"))
-
-        self.register_instruction(LI(reg, length))
-        self.register_instruction(SW(reg, "16($v0)"))
-
-        self.register_instruction(MOVE(reg, v0))
-
         # Reservar memoria para la instancia
         self.allocate_memory(num_bytes)
 
-        # Cargar el puntero al tipo de la instancia
-        self.register_instruction(SW(dest=reg, src="0($v0)"))
-
-        # Cargar el puntero a la VTABLE
-        self.register_instruction(LA(dest=reg, src=f"{instance_type.name}_start"))
-        self.register_instruction(SW(dest=reg, src="4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = (
-            next(i for i, t in enumerate(self.mips_types) if t == instance_type.name)
-            * 4
-        )
-        self.register_instruction(LI(reg, offset))
-        self.register_instruction(SW(reg, "8($v0)"))
-
-        self.register_instruction(MOVE(temp, v0))
-
-        # Cada atributo puede hacer referencia a atributos anteriormente
-        # definidos, o sea que tenemos que salvar self
-        self.push_register(s1)
-        self.register_instruction(MOVE(s1, v0))
-
-        # Los atributos comienzan en el indice 8($v0)
-        for i, attribute in enumerate(instance_type.attributes):
-            attrib_type_name = locate_attribute_in_type_hierarchy(
-                attribute, instance_type
-            )
-            # llamar la funcion de inicializacion del atributo
-            # Salvar el registro temp
-            self.push_register(temp)
-            self.register_instruction(
-                branchNodes.JAL(f"__{attrib_type_name}__attrib__{attribute.name}__init")
-            )
-            # Restaurar el valor del registro temp
-            self.pop_register(temp)
-            # El valor de retorno viene en v0
-            self.register_instruction(
-                SW(dest=v0, src=f"{12 + i*4}(${REG_TO_STR[temp]})")
-            )
+        # Copiar el prototipo palabra a palabra, su tamanno se conoce al
+        # compilar
+        self.comment(f"Copy prototype of type {instance_type.name}")
+        self.register_instruction(LA(reg, prototype_label(instance_type.name)))
+        for offset in range(0, num_bytes, 4):
+            self.register_instruction(LW(temp, f"{offset}(${REG_TO_STR[reg]})"))
+            self.register_instruction(SW(temp, f"{offset}($v0)"))
+
+        if any(initializers):
+            self.register_instruction(MOVE(temp, v0))
+
+            # Cada atributo puede hacer referencia a atributos anteriormente
+            # definidos, o sea que tenemos que salvar self
+            self.push_register(s1)
+            self.register_instruction(MOVE(s1, v0))
+
+            # Los atributos comienzan en el indice 12($v0)
+            for i, initializer in enumerate(initializers):
+                if initializer is None:
+                    continue
+                # llamar la funcion de inicializacion del atributo
+                # Salvar el registro temp
+                self.push_register(temp)
+                self.register_instruction(branchNodes.JAL(initializer))
+                # Restaurar el valor del registro temp
+                self.pop_register(temp)
+                # El valor de retorno viene en v0
+                self.register_instruction(
+                    SW(dest=v0, src=f"{12 + i*4}(${REG_TO_STR[temp]})")
+                )
 
-        # Restaurar self
-        self.pop_register(s1)
+            # Restaurar self
+            self.pop_register(s1)
 
-        # mover la direccion que almacena la instancia hacia dest
-        self.register_instruction(SW(temp, dest))
+            # mover la direccion que almacena la instancia hacia dest
+            self.register_instruction(SW(temp, dest))
+        else:
+            self.register_instruction(SW(v0, dest))
 
         self.used_registers[reg] = False
         self.used_registers[temp] = False
@@ -716,9 +682,8 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         assert src is not None
         assert dest is not None
 
+        # src es el valor sin encapsular
         self.register_instruction(LW(reg, src))
-        # cargar el valor
-        self.register_instruction(LW(reg, f"12(${REG_TO_STR[reg]})"))
         self.register_instruction(NOT(reg, reg))
         self.register_instruction(ADD(reg, reg, 1, True))
         self.register_instruction(SW(reg, dest))
@@ -865,7 +830,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.add_source_line_comment(node)
         val = node.value
         if val is not None:
-            if isinstance(val, LocalNode):
+            if isinstance(val, (LocalNode, cil.ParamNode)):
                 src = self.get_location_address(val)
                 # almacenar el resultado en $v0
                 self.register_instruction(LW(v0, src))
@@ -915,13 +880,21 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         reg = self.get_available_register()
         reg2 = self.get_available_register()
         temp = self.get_available_register()
-        size_reg = self.get_available_register()
         assert reg is not None
         assert reg2 is not None
         assert temp is not None
-        assert size_reg is not None
 
-        # Cargar el string sobre el que se llama substr
+        # Crear el string con la longitud del substr
+        if isinstance(r, int):
+            self.register_instruction(LI(a0, r))
+        else:
+            self.register_instruction(LW(a0, r))
+            # cargar el valor
+            self.register_instruction(LW(a0, f"12($a0)"))
+        self.register_instruction(JAL("__gc_alloc_string"))
+
+        # Cargar el string sobre el que se llama substr, despues de reservar
+        # porque el recolector pudo moverlo
         self.register_instruction(LW(reg, "12($s1)"))
 
         # Hacer que reg apunte al inicio del substr
@@ -933,23 +906,8 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
             self.register_instruction(LW(temp, f"12(${REG_TO_STR[temp]})"))
             self.register_instruction(ADDU(reg, reg, temp))
 
-        if isinstance(r, int):
-            self.register_instruction(LI(a0, r))
-        else:
-            self.register_instruction(LW(a0, r))
-            # cargar el valor
-            self.register_instruction(LW(a0, f"12($a0)"))
-
-        self.register_instruction(MOVE(size_reg, a0))
-        self.register_instruction(MOVE(reg2, a0))
-        # Agregar un byte mas para el fin de cadena
-        self.register_instruction(ADDU(a0, a0, 1, True))
-
-        # $v0 = 9 (syscall 9 = sbrk)
-        self.register_instruction(LI(v0, 9))
-        self.register_instruction(SYSCALL())
-
-        self.register_instruction(MOVE(temp, v0))
+        self.register_instruction(LW(reg2, "16($v0)"))
+        self.register_instruction(LW(temp, "12($v0)"))
 
         # Mientras reg != reg2 : Copiar a v0
         self.register_instruction(Label("substr_loop"))
@@ -969,41 +927,12 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         # Agregar el null al final de la cadena
         self.register_instruction(SB(zero, f"0(${REG_TO_STR[temp]})"))
 
-        # v0 contiene el substr
-        self.register_instruction(MOVE(reg2, v0))
-        # Crear la instancia de str
-        size = 20
-
-        # Reservar memoria para el tipo
-        self.allocate_memory(size)
-
-        self.comment("Allocating string")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg, "String"))
-        self.register_instruction(SW(reg, "0($v0)"))
-
-        self.register_instruction(LA(reg, "String_start"))
-        self.register_instruction(SW(reg, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg, offset))
-        self.register_instruction(SW(reg, "8($v0)"))
-
-        # Copiar el str en v0 al atributo value de la instancia
-        self.register_instruction(SW(reg2, "12($v0)"))
-
-        self.register_instruction(SW(size_reg, "16($v0)"))
-
         # devolver la instancia
         self.register_instruction(SW(v0, dest))
 
         self.used_registers[reg] = False
         self.used_registers[reg2] = False
         self.used_registers[temp] = False
-        self.used_registers[size_reg] = False
 
     @visit.register
     def _(self, node: ConcatString):
@@ -1017,14 +946,12 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         reg = self.get_available_register()
         reg2 = self.get_available_register()
         temp = self.get_available_register()
-        size_reg = self.get_available_register()
         byte = self.get_available_register()
 
         assert (
             reg is not None
             and reg2 is not None
             and temp is not None
-            and size_reg is not None
             and byte is not None
         )
 
@@ -1037,26 +964,22 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.register_instruction(LW(v0, s))
         self.register_instruction(LW(reg2, "16($v0)"))
 
-        self.comment("Save new string length in a0 for memory allocation")
+        self.comment("Allocate a string with the new length")
         self.register_instruction(ADDU(a0, reg, reg2))
-        self.register_instruction(MOVE(size_reg, a0))
+        self.register_instruction(JAL("__gc_alloc_string"))
 
-        # Obtener el primer string desde self
+        # Obtener los strings despues de reservar porque el recolector pudo
+        # moverlos
         self.comment("Get first string from self")
         self.register_instruction(LW(reg, f"12($s1)"))
 
         # Obtener el segundo string
         self.comment("Get second string from param")
-        self.register_instruction(LW(reg2, "12($v0)"))
-
-        # Reservar memoria para el nuevo buffer
-        # $v0 = 9 (syscall 9 = sbrk)
-        self.register_instruction(ADDU(a0, a0, 4, True))
-        self.register_instruction(LI(v0, 9))
-        self.register_instruction(SYSCALL())
+        self.register_instruction(LW(reg2, s))
+        self.register_instruction(LW(reg2, f"12(${REG_TO_STR[reg2]})"))
 
-        # mover v0 a un puntero temporal que podamos mover
-        self.register_instruction(MOVE(temp, v0))
+        # Puntero temporal que podamos mover en el buffer del nuevo string
+        self.register_instruction(LW(temp, "12($v0)"))
 
         # Hacer 0 el registro byte
         self.register_instruction(MOVE(byte, zero))
@@ -1093,43 +1016,12 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         # Agregar el caracter null al final
         self.register_instruction(SB(zero, f"0(${REG_TO_STR[temp]})"))
 
-        # v0 contiene el string concatenado
-        self.comment("v0 contains resulting string")
-        self.register_instruction(MOVE(reg2, v0))
-
-        # Crear la instancia de str
-        size = 20
-
-        # Reservar memoria para el tipo
-        self.allocate_memory(size)
-
-        self.comment("Allocating string")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg, "String"))
-        self.register_instruction(SW(reg, "0($v0)"))
-
-        self.register_instruction(LA(reg, "String_start"))
-        self.register_instruction(SW(reg, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg, offset))
-        self.register_instruction(SW(reg, "8($v0)"))
-
-        # Copiar el str en v0 al atributo value de la instancia
-        self.register_instruction(SW(reg2, "12($v0)"))
-
-        self.register_instruction(SW(size_reg, "16($v0)"))
-
         # devolver la instancia
         self.register_instruction(SW(v0, dest))
 
         self.used_registers[reg] = False
         self.used_registers[reg2] = False
         self.used_registers[temp] = False
-        self.used_registers[size_reg] = False
         self.used_registers[byte] = False
 
     @visit.register
@@ -1141,7 +1033,9 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.register_instruction(LI(v0, 4))
         self.register_instruction(SYSCALL())
 
+        # src es el String con el nombre del tipo
         self.register_instruction(LW(a0, src))
+        self.register_instruction(LW(a0, "12($a0)"))
         self.register_instruction(LI(v0, 4))
         self.register_instruction(SYSCALL())
 
@@ -1149,8 +1043,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.register_instruction(LI(v0, 4))
         self.register_instruction(SYSCALL())
 
-        self.register_instruction(LI(v0, 10))
-        self.register_instruction(SYSCALL())
+        self.exit_program()
 
     @visit.register
     def _(self, node: cil.ReadNode):
@@ -1167,24 +1060,24 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         assert temp is not None
         assert reg2 is not None
 
-        # Declarar un buffer para el string
-        self.allocate_memory(size)
+        # Crear un string con espacio para la linea, su longitud se
+        # actualiza despues de leerla
+        self.register_instruction(LI(a0, size - 1))
+        self.register_instruction(JAL("__gc_alloc_string"))
         self.register_instruction(MOVE(reg, v0))
 
         # Mover la direccion del buffer a0
-        self.register_instruction(MOVE(a0, v0))
+        self.register_instruction(LW(a0, f"12(${REG_TO_STR[reg]})"))
         # declarar el espacio disponible en el buffer
         self.register_instruction(LI(a1, size))
         # syscall 8 = read_int
         self.register_instruction(LI(v0, 8))
         self.register_instruction(SYSCALL())
 
-        # reg contiene el string.
-        # Crear la instancia del tipo string.
-        # Primero calcular el length del string
+        # Calcular el length del string
         self.register_instruction(MOVE(length, zero))
         self.register_instruction(MOVE(temp, zero))
-        self.register_instruction(MOVE(reg2, reg))
+        self.register_instruction(LW(reg2, f"12(${REG_TO_STR[reg]})"))
 
         self.register_instruction(LB(temp, f"0(${REG_TO_STR[reg2]})"))
         self.register_instruction(BEQZ(temp, "end_loop"))
@@ -1206,34 +1099,10 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.register_instruction(Label("end_loop"))
 
         # length contiene el length del string
-        # Crear la instancia
-
-        size = 20
-
-        # Reservar memoria para el tipo
-        self.allocate_memory(size)
-
-        self.comment("Allocating string")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg2, "String"))
-        self.register_instruction(SW(reg2, "0($v0)"))
-
-        self.register_instruction(LA(reg2, "String_start"))
-        self.register_instruction(SW(reg2, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg2, offset))
-        self.register_instruction(SW(reg2, "8($v0)"))
-
-        self.register_instruction(SW(reg, "12($v0)"))
-
-        self.register_instruction(SW(length, "16($v0)"))
+        self.register_instruction(SW(length, f"16(${REG_TO_STR[reg]})"))
 
         # devolver la instancia
-        self.register_instruction(SW(v0, dest))
+        self.register_instruction(SW(reg, dest))
 
         self.used_registers[reg] = False
         self.used_registers[reg2] = False
@@ -1286,51 +1155,23 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         # Crear la instancia a Int
         self.register_instruction(MOVE(a2, v0))
 
-        size = 20
+        size = 16
 
-        # Reservar memoria para el tipo
         self.allocate_memory(size)
         reg2 = self.get_available_register()
 
         assert reg2 is not None
 
-        self.comment("Allocating string for type Int")
-
-        # Inicializar la instancia
-        self.register_instruction(LA(reg2, "String"))
+        # Almacenar el nombre del tipo Int
+        self.register_instruction(LA(reg2, name_label("Int")))
         self.register_instruction(SW(reg2, "0($v0)"))
 
-        self.register_instruction(LA(reg2, "String_start"))
-        self.register_instruction(SW(reg2, "4($v0)"))
-
-        # Cargar el offset del tipo
-        self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "String") * 4
-        self.register_instruction(LI(reg2, offset))
-        self.register_instruction(SW(reg2, "8($v0)"))
-
-        self.register_instruction(LA(reg2, "Int"))
-        self.register_instruction(SW(reg2, "12($v0)"))
-
-        self.register_instruction(LI(reg2, 3))
-        self.register_instruction(SW(reg2, "16($v0)"))
-
-        # devolver la instancia
-        self.register_instruction(MOVE(reg2, v0))
-
-        size = 16
-
-        self.allocate_memory(size)
-
-        # Almacenar el string al tipo Int
-        self.register_instruction(SW(reg2, f"0($v0)"))
-
         self.register_instruction(LA(reg2, "Int_start"))
         self.register_instruction(SW(reg2, "4($v0)"))
 
         # Cargar el offset del tipo
         self.comment("Load type offset")
-        offset = next(i for i, t in enumerate(self.mips_types) if t == "Int") * 4
+        offset = self.layout.type_index("Int") * 4
         self.register_instruction(LI(reg2, offset))
         self.register_instruction(SW(reg2, "8($v0)"))
 
@@ -1397,6 +1238,21 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         self.add_source_line_comment(node)
         self.register_instruction(SW(s1, dest))
 
+    @visit.register
+    def _(self, node: EqualToCilNode):
+        self.add_source_line_comment(node)
+        self.operate(self.visit(node.dest), self.visit(node.left), self.visit(node.right), SEQ)
+
+    @visit.register
+    def _(self, node: LowerThanCilNode):
+        self.add_source_line_comment(node)
+        self.operate(self.visit(node.dest), self.visit(node.left), self.visit(node.right), SLT)
+
+    @visit.register
+    def _(self, node: LowerEqualCilNode):
+        self.add_source_line_comment(node)
+        self.operate(self.visit(node.dest), self.visit(node.left), self.visit(node.right), SLE)
+
     @visit.register
     def _(self, node: GetValue):
         dest = self.visit(node.dest)
@@ -1438,7 +1294,7 @@ class CilToMipsVisitor(BaseCilToMipsVisitor):
         assert src is not None
         self.comment(f"Comparing {src} type with String")
         # Cargar el puntero al tipo que queremos comparar
-        self.register_instruction(LA(v0, "String"))
+        self.register_instruction(LA(v0, name_label("String")))
 
         # Cargar el puntero al string del tipo
         self.register_instruction(LW(a0, src))
@@ -1566,21 +1422,51 @@ class MipsCodeGenerator(CilToMipsVisitor):
     lista para ejecutarse en SPIM.
     """
 
+    def __init__(self, record: bool = False, heap_size: int = gc.DEFAULT_HEAP_SIZE,
+                 gc_stats: bool = False):
+        super().__init__()
+        # Con `record` se puede obtener el codigo de cada funcion generada
+        # (ver `function_code`)
+        if record:
+            self.recorded = {}
+        # `heap_size` es el tamanno inicial del heap en bytes y con
+        # `gc_stats` el programa imprime al terminar las estadisticas del
+        # recolector de basura
+        self.heap_size = heap_size
+        self.gc_stats = gc_stats
+
     def __call__(self, ast: cil.CilProgramNode) -> str:
         self.visit(ast)
         return self.to_str()
 
     def to_str(self) -> str:
-        program = ""
-        indent = 0
-        for instr in self.program:
-            line = str(instr)
-            if ".data" in line or ".text" in line:
-                indent = 0
-            program += "\n" + " " * (3 * indent) + line
-            if "#" not in line and (":" in line and "end" not in line):
-                if "word" not in line and "asciiz" not in line and "byte" not in line:
-                    indent += 1
-            if "# Function END" in line or "label_END" in line:
-                indent = 0
-        return program
+        return format_program(self.program)
+
+    def function_code(self, name: str):
+        """
+        Devuelve el texto de una funcion generada con `record` y las consultas
+        a la disposicion del programa de las que depende.
+        """
+        start, end, dependencies = self.recorded[name]
+        return format_program(self.program[start:end]), dependencies
+
+
+def format_program(instructions) -> str:
+    lines = []
+    indent = 0
+    for instr in instructions:
+        line = str(instr)
+        if isinstance(instr, Fragment):
+            # Ya viene formateado y termina con el fin de una funcion
+            lines.append(line)
+            indent = 0
+            continue
+        if ".data" in line or ".text" in line:
+            indent = 0
+        lines.append("\n" + " " * (3 * indent) + line)
+        if "#" not in line and (":" in line and "end" not in line):
+            if "word" not in line and "asciiz" not in line and "byte" not in line:
+                indent += 1
+        if "# Function END" in line or "label_END" in line:
+            indent = 0
+    return "".join(lines)
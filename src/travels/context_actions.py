@@ -18,11 +18,6 @@ def update_scope_variable(vname: str,
                           new_type: Type,
                           scope: Scope,
                           index=None):
-    if not index:
-        index = 0
-    for i in range(index, len(scope.locals)):
-        if scope.locals[i].name == vname:
-            scope.locals[i].type = new_type
-            return
-    if scope.parent:
-        update_scope_variable(vname, new_type, scope.parent, scope.index)
+    var_info = scope.find_variable_from(vname, index or 0)
+    if var_info is not None:
+        var_info.type = new_type
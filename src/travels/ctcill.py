@@ -12,21 +12,21 @@ from abstract.tree import (
 import cil.baseCilVisitor as baseCilVisitor
 import abstract.tree as coolAst
 import abstract.semantics as semantics
-from typing import List, Optional, Tuple
+from typing import List, Optional, Set, Tuple
 from functools import singledispatchmethod
 import re
 
 import cil.nodes
+from cil.vtables import layout_vtables, saved_bytes
 
 from cil.nodes import (
     AbortNode,
-    AllocateBoolNode,
-    AllocateIntNode,
     AllocateNode,
     AllocateStringNode,
     ArgNode,
     AssignNode,
     BitwiseNotNode,
+    CachedCodeNode,
     CharToCharStringCompare,
     CilNode,
     CilProgramNode,
@@ -50,6 +50,8 @@ from cil.nodes import (
     LabelNode,
     LoadNode,
     LocalNode,
+    LowerEqualCilNode,
+    LowerThanCilNode,
     MinusNode,
     MinusNodeComp,
     NotZeroJump,
@@ -76,25 +78,6 @@ from cil.nodes import (
 )
 
 
-def find_min_i(vtables: List[List[Tuple[str, str]]], method: str):
-    return min(
-        [i for vtable in vtables for i, (m, _) in enumerate(vtable) if m == method]
-    )
-
-
-def sort_methods_tables(vtables: List[List[Tuple[str, str]]]):
-    methods = set([m for v in vtables for m, _ in v])
-    new_tables = [[] for _ in vtables]
-    for m in methods:
-        for i, vtable in enumerate(vtables):
-            if m in [x for x, _ in vtable]:
-                name = next(n for x, n in vtable if x == m)
-                new_tables[i].append((m, name))
-            else:
-                new_tables[i].append(("__not_a_func", "dummy"))
-    return new_tables
-
-
 def find_method_in_parent(type_: Type, method: str, typeNodes: List[TypeNode]):
     methods = []
     if type_.parent is not None:
@@ -109,6 +92,23 @@ ExpressionReturn = Tuple[List[InstructionNode], List[LocalNode]]
 Scope = semantics.Scope
 
 
+def assigned_names(node) -> Set[str]:
+    """
+    Nombres de las variables a las que se asigna en una expresion.
+    """
+    names: Set[str] = set()
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, coolAst.AssignNode):
+            names.add(current.idx)
+        if isinstance(current, coolAst.Node):
+            pending.extend(value for _, value in current.fields())
+        elif isinstance(current, (list, tuple)):
+            pending.extend(current)
+    return names
+
+
 class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @singledispatchmethod
     def visit(self, node, scope: Scope) -> CilNode:
@@ -146,20 +146,46 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         for c in class_list:
             self.register_type(c.idx)
 
-        for klass, child_scope in zip(class_list, children):
-            self.visit(klass, child_scope)
+        for klass in class_list:
+            self.define_type_node(klass)
 
-        # print("\n".join(str(x) for x in sort_methods_tables([t.methods for t in self.dot_types])))
-        new_vtable = sort_methods_tables([t.methods for t in self.dot_types])
+        # Ubicar cada metodo en su indice de las tablas virtuales
+        new_vtable = layout_vtables([t.methods for t in self.dot_types])
         for i in range(len(self.dot_types)):
             self.dot_types[i].methods = new_vtable[i]
+        self.vtable_saved = saved_bytes(new_vtable)
+
+        # Con la disposicion de los tipos ya fijada se puede decidir que
+        # clases se toman de la cache.
+        layout = self.cache.layout(self.dot_types) if self.cache is not None else None
+        for klass, child_scope in zip(class_list, children):
+            if self.cache is None:
+                self.visit(klass, child_scope)
+                continue
+            key = self.cache.key(klass, child_scope, self.context)
+            entry = self.cache.load(key, layout, self.context.get_type)
+            if entry is not None:
+                self.reuse_class(entry)
+                continue
+            code, data = len(self.dot_code), len(self.dot_data)
+            self.visit(klass, child_scope)
+            self.compiled_classes.append(
+                (key, self.dot_code[code:], self.dot_data[data:])
+            )
 
         return CilProgramNode(self.dot_types, self.dot_data, self.dot_code)
 
+    def reuse_class(self, entry: dict) -> None:
+        # El codigo MIPS de la clase ya esta en la cache, solo hace falta
+        # registrar sus cadenas con los mismos nombres.
+        for name, value in entry["data"]:
+            self.dot_data.append(DataNode(name, value))
+        self.dot_code.append(CachedCodeNode(entry["functions"], entry["text"]))
+        self.cached_classes += 1
+
     #  *************** IMPLEMENTACION DE LAS DEFINICIONES DE CLASES *****************
 
-    @visit.register
-    def _(self, node: coolAst.ClassDef, scope: Scope) -> None:
+    def define_type_node(self, node: coolAst.ClassDef) -> None:
         # Registrar el tipo que creamos en .Types section
         self.current_type = self.context.get_type(node.idx)
         new_type_node = next(x for x in self.dot_types if x.name == node.idx)
@@ -175,6 +201,7 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
             parent = next(
                 t for t in self.dot_types if t.name == self.current_type.parent.name
             )
+            new_type_node.initialized.update(parent.initialized)
 
             for method, _ in parent.methods:
                 # Manejar la redefinicion de metodos
@@ -209,6 +236,10 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         for attribute in attributes:
             if attribute not in self.current_type.parent.attributes:
                 new_type_node.attributes.append(attribute)
+        new_type_node.initialized.update(
+            f.idx for f in node.features
+            if isinstance(f, AttributeDef) and f.default_value is not None
+        )
 
         for method in methods:
             if method not in defined_methods:
@@ -216,12 +247,21 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
                     (method, self.to_function_name(method, node.idx))
                 )
 
+        self.current_type.attributes = new_type_node.attributes
+        self.current_type = None
+
+    @visit.register
+    def _(self, node: coolAst.ClassDef, scope: Scope) -> None:
+        # Generar las funciones de los atributos y metodos de la clase, su
+        # TypeNode ya se construyo en define_type_node.
+        self.current_type = self.context.get_type(node.idx)
+        self.labels_count = 0
+        self.data_count = 0
+
         attrib = [x for x in node.features if isinstance(x, AttributeDef)]
         meth = [x for x in node.features if isinstance(x, MethodDef)]
         features = attrib + meth
 
-        self.current_type.attributes = new_type_node.attributes
-
         for f, s in zip(features, scope.children):
             self.visit(f, s)
 
@@ -231,33 +271,19 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
 
     @visit.register
     def _(self, node: coolAst.AttributeDef, scope: Scope) -> None:
+        # Si no tiene expresion de inicializacion el atributo conserva el
+        # valor por defecto que tiene en el prototipo del tipo: 0, false, ""
+        # o void (ver AllocateNode en ciltomips).
+        if node.default_value is None:
+            return
+
         self.current_function = self.register_function(
             f"__{self.current_type.name}__attrib__{node.idx}__init"
         )
-        local = self.define_internal_local()
-        if node.default_value is not None:
-            # Generar el codigo de la expresion de inicializacion
-            # y devolver el valor de esta
-            value = self.visit(node.default_value, scope)
-            self.register_instruction(ReturnNode(value))
-
-        else:
-            # Si no tiene expresion de inicializacion entonces devolvemos
-            # 0 en caso de que sea Int, Bool u otro tipo excepto String
-            # (0 = false y 0 = void)
-            # attribute_type = self.context.get_type(node.typex)
-            attribute_type = scope.find_variable(node.idx).type
-            if attribute_type.name == "String":
-                self.register_instruction(AllocateStringNode(local, self.null, 0))
-                self.register_instruction(ReturnNode(local))
-            elif attribute_type.name == "Bool":
-                self.register_instruction(AllocateBoolNode(local, 0))
-                self.register_instruction(ReturnNode(local))
-            elif attribute_type.name == "Int":
-                self.register_instruction(AllocateIntNode(local, 0))
-                self.register_instruction(ReturnNode(local))
-            else:
-                self.register_instruction(ReturnNode(0))
+        # Generar el codigo de la expresion de inicializacion
+        # y devolver el valor de esta
+        value = self.visit(node.default_value, scope)
+        self.register_instruction(ReturnNode(self.box(value)))
 
     @visit.register
     def _(self, node: coolAst.MethodDef, scope: Scope) -> None:
@@ -277,15 +303,25 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
             scope.find_variable(param.id) for param in node.param_list
         ]
 
-        # Establecer los parametros de la funcion.
+        # Establecer los parametros de la funcion. Los Int y Bool llegan
+        # encapsulados y el metodo trabaja con un local con su valor.
+        # Si al parametro no se le asigna nada su instancia sirve para volver
+        # a encapsularlo.
+        self.unboxed_params = {}
+        assigned = assigned_names(node.statements)
         for param in params:
             if param:
-                self.register_params(param)
+                param_node = self.register_params(param)
+                if param.type.name in ("Int", "Bool"):
+                    local = self.unbox(param_node, param.type.name)
+                    if param.name in assigned:
+                        del self.boxes[local.name]
+                    self.unboxed_params[param.name] = local
 
         # Registrar las instrucciones que conforman el cuerpo del metodo.
         last = self.visit(node.statements, scope)
         if last is not None:
-            self.register_instruction(ReturnNode(last))
+            self.register_instruction(ReturnNode(self.box(last)))
         else:
             self.register_instruction(ReturnNode())
 
@@ -301,7 +337,6 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         # Crear un LABEL al cual realizar un salto.
         false_label = self.do_label("FALSEIF")
         end_label = self.do_label("ENDIF")
-        cond_value = self.define_internal_local()
         return_expr = self.define_internal_local()
 
         # Salvar las instrucciones relacionadas con la condicion,
@@ -309,13 +344,14 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         internal_cond_vm_holder = self.visit(node.cond, scope)
 
         # Condicion es un Bool
-        self.register_instruction(GetValue(cond_value, internal_cond_vm_holder))
+        cond_value = self.unbox(internal_cond_vm_holder, "Bool")
 
         # Chequear y saltar si es necesario.
         self.register_instruction(IfZeroJump(cond_value, false_label))
 
         # Salvar las instrucciones relacionadas con la rama TRUE.
         expr = self.visit(node.expr1, scope)
+        then_index = len(self.instructions)
         self.register_instruction(AssignNode(return_expr, expr))
 
         self.register_instruction(UnconditionalJump(end_label))
@@ -323,10 +359,22 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         # Registrar las instrucciones relacionadas con la rama ELSE
         self.register_instruction(LabelNode(false_label))
         expr2 = self.visit(node.expr2, scope)
+        else_index = len(self.instructions)
         self.register_instruction(AssignNode(return_expr, expr2))
 
         self.register_instruction(LabelNode(end_label))
 
+        # Si las dos ramas dan un valor sin encapsular del mismo tipo el
+        # resultado tampoco se encapsula, si no se encapsulan las dos.
+        type_name = self.unboxed_type(expr)
+        if type_name is not None and type_name == self.unboxed_type(expr2):
+            self.unboxed[return_expr.name] = type_name
+            return_expr.raw = True
+        else:
+            for index, value in ((then_index, expr), (else_index, expr2)):
+                if self.unboxed_type(value) is not None:
+                    self.instructions[index] = self.box_into(return_expr, value)
+
         return return_expr
 
     @visit.register
@@ -342,19 +390,16 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
             assert var_info.type is not None
 
             # Si la variable es int, string o boolean, su valor por defecto es 0
-            if var_info.type.name not in ("String", "Int", "Bool"):
+            # (Int y Bool no se encapsulan)
+            if var_info.type.name != "String":
                 self.register_instruction(AssignNode(local_var, 0))
-            elif var_info.type.name == "String":
+            else:
                 self.register_instruction(AllocateStringNode(local_var, self.null, 0))
-            elif var_info.type.name == "Int":
-                self.register_instruction(AllocateIntNode(local_var, 0))
-            elif var_info.type.name == "Bool":
-                self.register_instruction(AllocateBoolNode(local_var, 0))
 
             if var_init_expr is not None:
                 expr_init_vm_holder = self.visit(var_init_expr, scope)
                 # Assignar el valor correspondiente a la variable reservada
-                self.register_instruction(AssignNode(local_var, expr_init_vm_holder))
+                self.assign(local_var, expr_init_vm_holder)
 
         # Compute the associated expr, if any, to the let declaration
         # A block defines a new scope, so it is important to manage it
@@ -368,18 +413,20 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     def _(self, node: coolAst.InstantiateClassNode, scope: Scope) -> LocalNode:
         # Reservar una variable que guarde la nueva instancia
         type_ = self.context.get_type(node.type_)
-        instance_vm_holder = self.define_internal_local()
 
-        if type_.name not in ("String", "Int", "Bool"):
-            self.register_instruction(AllocateNode(type_, instance_vm_holder))
-        elif type_.name == "String":
+        if type_.name in ("Int", "Bool"):
+            # Valor por defecto, sin encapsular
+            instance_vm_holder = self.define_unboxed_local(type_.name)
+            self.register_instruction(AssignNode(instance_vm_holder, 0))
+            return instance_vm_holder
+
+        instance_vm_holder = self.define_internal_local()
+        if type_.name == "String":
             self.register_instruction(
                 AllocateStringNode(instance_vm_holder, self.null, 0)
             )
-        elif type_.name == "Int":
-            self.register_instruction(AllocateIntNode(instance_vm_holder, 0))
-        elif type_.name == "Bool":
-            self.register_instruction(AllocateBoolNode(instance_vm_holder, 0))
+        else:
+            self.register_instruction(AllocateNode(type_, instance_vm_holder))
 
         return instance_vm_holder
 
@@ -408,26 +455,29 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         # metodo que estamos creando o si son atributos.
         if var_inf.location == "PARAM":
             # Buscar la variable en los parametros
-            var = next(
+            var = self.unboxed_params.get(var_inf.name) or next(
                 v
                 for v in self.params
                 if f"param_{self.current_function.name[9:]}_{var_inf.name}_" in v.name
             )
             # registrar la instruccion de asignacion
-            self.register_instruction(AssignNode(var, rvalue_vm_holder))
+            self.assign(var, rvalue_vm_holder)
         elif var_inf.location == "LOCAL":
             var = next(
                 v
                 for v in list(reversed(self.localvars))
                 if f"local_{self.current_function.name[9:]}_{var_inf.name}_" in v.name
             )
-            self.register_instruction(AssignNode(var, rvalue_vm_holder))
+            self.assign(var, rvalue_vm_holder)
         else:
             assert self.current_type is not None
             self.register_instruction(
-                SetAttributeNode(self.current_type, node.idx, rvalue_vm_holder)
+                SetAttributeNode(self.current_type, node.idx, self.box(rvalue_vm_holder))
             )
 
+        # El valor de la asignacion es el de la expresion
+        return rvalue_vm_holder
+
     @visit.register
     def _(self, node: str, scope: Scope):
         var_inf = scope.find_variable(node)
@@ -437,7 +487,7 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         # metodo que estamos creando o si son atributos.
         if var_inf.location == "PARAM":
             # Buscar la variable en los parametros
-            var = next(
+            var = self.unboxed_params.get(var_inf.name) or next(
                 v
                 for v in self.params
                 if f"param_{self.current_function.name[9:]}_{var_inf.name}_" in v.name
@@ -463,14 +513,13 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     def _(self, node: coolAst.WhileBlockNode, scope: Scope):
         # Evaluar la condicion y definir un LABEL al cual
         # retornar
-        cond_value = self.define_internal_local()
         while_label = self.do_label("WHILE")
         end_label = self.do_label("WHILE_END")
         self.register_instruction(LabelNode(while_label))
         cond_vm_holder = self.visit(node.cond, scope)
 
         # Lo que viene en cond es un Bool
-        self.register_instruction(GetValue(cond_value, cond_vm_holder))
+        cond_value = self.unbox(cond_vm_holder, "Bool")
 
         # Probar la condicion, si es true continuar la ejecucion, sino saltar al LABEL end
         self.register_instruction(IfZeroJump(cond_value, end_label))
@@ -485,12 +534,12 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
 
     @visit.register
     def _(self, node: coolAst.CaseNode, scope: Scope):
-        # Evalauar la expr0
-        expr_vm_holder = self.visit(node.expression, scope)
+        # Evalauar la expr0, el case necesita el objeto para saber su tipo
+        expr_vm_holder = self.box(self.visit(node.expression, scope))
 
         # Almacenar el tipo del valor retornado
-        type_internal_local_holder = self.define_internal_local()
-        sub_vm_local_holder = self.define_internal_local()
+        type_internal_local_holder = self.define_unboxed_local("Int")
+        sub_vm_local_holder = self.define_unboxed_local("Int")
         result_vm_holder = self.define_internal_local()
 
         self.register_instruction(
@@ -498,8 +547,8 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         )
 
         # Variables internas para almacenar resultados intermedios
-        min_ = self.define_internal_local()
-        tdt_result = self.define_internal_local()
+        min_ = self.define_unboxed_local("Int")
+        tdt_result = self.define_unboxed_local("Int")
 
         self.register_instruction(AssignNode(min_, len(self.context.types)))
 
@@ -543,11 +592,11 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
             assert var_info is not None
             idk = self.register_local(var_info)
             # Asignar al identificador idk el valor de expr0
-            self.register_instruction(AssignNode(idk, expr_vm_holder))
+            self.assign(idk, expr_vm_holder)
             # Generar el codigo de la expresion asociada a esta rama
             expr_val_vm_holder = self.visit(action_node.actions, s)
             # Salvar el resultado
-            self.register_instruction(AssignNode(result_vm_holder, expr_val_vm_holder))
+            self.assign(result_vm_holder, expr_val_vm_holder)
             # Generar un salto de modo que no se chequee otra rama
             self.register_instruction(UnconditionalJump(end_label))
             self.register_instruction(LabelNode(next_label))
@@ -568,13 +617,13 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @visit.register
     def _(self, node: coolAst.PlusNode, scope: Scope) -> LocalNode:
         # Definir una variable interna local para almacenar el resultado
-        sum_internal_local = self.define_internal_local()
+        sum_internal_local = self.define_unboxed_local("Int")
 
         # Obtener el resultado del primero operando
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el resultado del segundo operando
-        right_vm_holder = self.visit(node.right, scope)
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
         # registrar la instruccion de suma
         self.register_instruction(
@@ -587,13 +636,13 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @visit.register
     def _(self, node: coolAst.DifNode, scope: Scope) -> LocalNode:
         # Definir una variable interna local para almacenar el resultado intermedio
-        minus_internal_vm_holder = self.define_internal_local()
+        minus_internal_vm_holder = self.define_unboxed_local("Int")
 
         # Obtener el resultado del minuendo
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el resultado del sustraendo
-        right_vm_holder = self.visit(node.right, scope)
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
         self.register_instruction(
             MinusNode(left_vm_holder, right_vm_holder, minus_internal_vm_holder)
@@ -605,13 +654,13 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @visit.register
     def _(self, node: coolAst.MulNode, scope: Scope) -> LocalNode:
         # Definir una variable interna local para almacenar el resultado intermedio
-        mul_internal_vm_holder = self.define_internal_local()
+        mul_internal_vm_holder = self.define_unboxed_local("Int")
 
         # Obtener el resultado del primer factor
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el resultado del segundo factor
-        right_vm_holder = self.visit(node.right, scope)
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
         # Registrar la instruccion de multimplicacion
         self.register_instruction(
@@ -624,13 +673,13 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @visit.register
     def _(self, node: coolAst.DivNode, scope: Scope) -> LocalNode:
         # Definir una variable interna local para almacenar el resultado intermedio
-        div_internal_vm_holder = self.define_internal_local()
+        div_internal_vm_holder = self.define_unboxed_local("Int")
 
         # Obtener el resultad del dividendo
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el resultado del divisor
-        right_vm_holder = self.visit(node.right, scope)
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
         # Registrar la instruccion de division
         self.register_instruction(
@@ -647,8 +696,8 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @visit.register
     def _(self, node: coolAst.IntegerConstant, scope: Scope):
         # devolver el valor
-        return_vm_holder = self.define_internal_local()
-        self.register_instruction(AllocateIntNode(return_vm_holder, int(node.lex)))
+        return_vm_holder = self.define_unboxed_local("Int")
+        self.register_instruction(AssignNode(return_vm_holder, int(node.lex)))
         return return_vm_holder
 
     @visit.register
@@ -672,15 +721,15 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @visit.register
     def _(self, node: coolAst.TrueConstant, scope: Scope):
         # variable interna que devuelve el valor de la constante
-        expr = self.define_internal_local()
-        self.register_instruction(AllocateBoolNode(expr, 1))
+        expr = self.define_unboxed_local("Bool")
+        self.register_instruction(AssignNode(expr, 1))
         return expr
 
     @visit.register
     def _(self, node: coolAst.FalseConstant, scope: Scope):
         # variable interna que devuelve el valor de la constante
-        expr = self.define_internal_local()
-        self.register_instruction(AllocateBoolNode(expr, 0))
+        expr = self.define_unboxed_local("Bool")
+        self.register_instruction(AssignNode(expr, 0))
         return expr
 
     # *******************  Implementacion de las comparaciones ********************
@@ -691,34 +740,16 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
     @visit.register
     def _(self, node: coolAst.NegNode, scope: Scope):
         # Obtener el valor de la expresion
-        expr_result = self.visit(node.lex, scope)
-        result_vm_holder = self.define_internal_local()
+        expr_result = self.unbox(self.visit(node.lex, scope), "Bool")
+        result_vm_holder = self.define_unboxed_local("Bool")
 
-        if isinstance(expr_result, int):
-            self.register_instruction(
-                AssignNode(result_vm_holder, abs(expr_result - 1))
-            )
-            return result_vm_holder
-        else:
-            false_label = self.do_label("FALSE")
-            not_end_label = self.do_label("NOT_END")
-            assert isinstance(expr_result, LocalNode)
-            self.register_instruction(GetValue(expr_result, expr_result))
-            # Si expr = 0 entonces devolver 1
-            self.register_instruction(IfZeroJump(expr_result, false_label))
-            # Si expr = 1 devolver 0
-            self.register_instruction(AllocateBoolNode(result_vm_holder, 0))
-            self.register_instruction(UnconditionalJump(not_end_label))
-            self.register_instruction(LabelNode(false_label))
-            # Si expr = 0 entonces devolver 1
-            self.register_instruction(AllocateBoolNode(result_vm_holder, 1))
-            self.register_instruction(LabelNode(not_end_label))
-            return result_vm_holder
+        # not expr es 1 si expr = 0 y 0 si expr = 1
+        self.register_instruction(EqualToCilNode(expr_result, 0, result_vm_holder))
+        return result_vm_holder
 
     @visit.register
     def _(self, node: coolAst.EqualToNode, scope: Scope) -> LocalNode:
-        expr_result_vm_holder = self.define_internal_local()
-        temp_expr_vm_holder = self.define_internal_local()
+        expr_result_vm_holder = self.define_unboxed_local("Bool")
 
         # Obtener el valor de la expresion izquierda
         left_vm_holder = self.visit(node.left, scope)
@@ -726,6 +757,21 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         # obtener el valor de la expresion derecha
         right_vm_holder = self.visit(node.right, scope)
 
+        # Si uno de los lados es un Int o un Bool sin encapsular el otro es
+        # del mismo tipo y se comparan los valores
+        type_name = self.unboxed_type(left_vm_holder) or self.unboxed_type(right_vm_holder)
+        if type_name is not None:
+            self.register_instruction(
+                EqualToCilNode(
+                    self.unbox(left_vm_holder, type_name),
+                    self.unbox(right_vm_holder, type_name),
+                    expr_result_vm_holder,
+                )
+            )
+            return expr_result_vm_holder
+
+        temp_expr_vm_holder = self.define_unboxed_local("Int")
+
         false_ = self.do_label("FALSE")
         true_ = self.do_label("TRUE")
         end = self.do_label("END")
@@ -795,11 +841,11 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         self.register_instruction(IfZeroJump(temp_expr_vm_holder, true_))
 
         self.register_instruction(LabelNode(false_))
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 0))
+        self.register_instruction(AssignNode(expr_result_vm_holder, 0))
         self.register_instruction(UnconditionalJump(end))
 
         self.register_instruction(LabelNode(true_))
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 1))
+        self.register_instruction(AssignNode(expr_result_vm_holder, 1))
         self.register_instruction(LabelNode(end))
 
         # Devolver la variable con el resultado
@@ -807,132 +853,68 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
 
     @visit.register
     def _(self, node: coolAst.LowerThanNode, scope: Scope) -> LocalNode:
-        expr_result_vm_holder = self.define_internal_local()
-        false_label = self.do_label("FALSE")
-        end_label = self.do_label("END")
+        expr_result_vm_holder = self.define_unboxed_local("Bool")
 
         # Obtener el valor de la expresion izquierda
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el valor de la expresion derecha
-        right_vm_holder = self.visit(node.right, scope)
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
         self.register_instruction(
-            MinusNodeComp(left_vm_holder, right_vm_holder, expr_result_vm_holder)
+            LowerThanCilNode(left_vm_holder, right_vm_holder, expr_result_vm_holder)
         )
 
-        self.register_instruction(
-            JumpIfGreaterThanZeroNode(expr_result_vm_holder, false_label)
-        )
-        self.register_instruction(IfZeroJump(expr_result_vm_holder, false_label))
-
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 1))
-        self.register_instruction(UnconditionalJump(end_label))
-
-        self.register_instruction(LabelNode(false_label))
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 0))
-        self.register_instruction(LabelNode(end_label))
-
         return expr_result_vm_holder
 
     @visit.register
     def _(self, node: coolAst.LowerEqual, scope: Scope) -> LocalNode:
-        expr_result_vm_holder = self.define_internal_local()
-        false_label = self.do_label("FALSE")
-        end_label = self.do_label("END")
+        expr_result_vm_holder = self.define_unboxed_local("Bool")
 
         # Obtener el valor de la expresion izquierda
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el valor de la expresion derecha
-        right_vm_holder = self.visit(node.right, scope)
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
         self.register_instruction(
-            MinusNodeComp(left_vm_holder, right_vm_holder, expr_result_vm_holder)
+            LowerEqualCilNode(left_vm_holder, right_vm_holder, expr_result_vm_holder)
         )
 
-        self.register_instruction(
-            JumpIfGreaterThanZeroNode(expr_result_vm_holder, false_label)
-        )
-
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 1))
-        self.register_instruction(UnconditionalJump(end_label))
-
-        self.register_instruction(LabelNode(false_label))
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 0))
-        self.register_instruction(LabelNode(end_label))
-
         return expr_result_vm_holder
 
     @visit.register
     def _(self, node: coolAst.GreaterThanNode, scope: Scope) -> LocalNode:
-        expr_result_vm_holder = self.define_internal_local()
-        true_label = self.do_label("TRUE")
-        end_label = self.do_label("END")
+        expr_result_vm_holder = self.define_unboxed_local("Bool")
 
         # Obtener el valor de la expresion izquierda
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el valor de la expresion derecha
-        right_vm_holder = self.visit(node.right, scope)
-
-        assert isinstance(left_vm_holder, LocalNode) and isinstance(
-            right_vm_holder, LocalNode
-        )
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
+        # a > b es b < a
         self.register_instruction(
-            MinusNodeComp(left_vm_holder, right_vm_holder, expr_result_vm_holder)
+            LowerThanCilNode(right_vm_holder, left_vm_holder, expr_result_vm_holder)
         )
 
-        self.register_instruction(
-            JumpIfGreaterThanZeroNode(expr_result_vm_holder, true_label)
-        )
-
-        # False Branch
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 0))
-        self.register_instruction(UnconditionalJump(end_label))
-
-        # True Branch
-        self.register_instruction(LabelNode(true_label))
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 1))
-        self.register_instruction(LabelNode(end_label))
-
         return expr_result_vm_holder
 
     @visit.register
     def _(self, node: coolAst.GreaterEqualNode, scope: Scope) -> LocalNode:
-        expr_result_vm_holder = self.define_internal_local()
-        true_label = self.do_label("TRUE")
-        end_label = self.do_label("END")
+        expr_result_vm_holder = self.define_unboxed_local("Bool")
 
         # Obtener el valor de la expresion izquierda
-        left_vm_holder = self.visit(node.left, scope)
+        left_vm_holder = self.unbox(self.visit(node.left, scope), "Int")
 
         # Obtener el valor de la expresion derecha
-        right_vm_holder = self.visit(node.right, scope)
-
-        assert isinstance(left_vm_holder, LocalNode) and isinstance(
-            right_vm_holder, LocalNode
-        )
+        right_vm_holder = self.unbox(self.visit(node.right, scope), "Int")
 
+        # a >= b es b <= a
         self.register_instruction(
-            MinusNodeComp(left_vm_holder, right_vm_holder, expr_result_vm_holder)
+            LowerEqualCilNode(right_vm_holder, left_vm_holder, expr_result_vm_holder)
         )
 
-        self.register_instruction(
-            JumpIfGreaterThanZeroNode(expr_result_vm_holder, true_label)
-        )
-        self.register_instruction(IfZeroJump(expr_result_vm_holder, true_label))
-
-        # False Branch
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 0))
-        self.register_instruction(UnconditionalJump(end_label))
-
-        # True Branch
-        self.register_instruction(LabelNode(true_label))
-        self.register_instruction(AllocateBoolNode(expr_result_vm_holder, 1))
-        self.register_instruction(LabelNode(end_label))
-
         return expr_result_vm_holder
 
     # *********************  IMPLEMENTACION DE LOS METODOS DE DISPATCH  *******************
@@ -944,15 +926,15 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         type_vm_holder = self.define_internal_local()
         return_vm_holder = self.define_internal_local()
         # Evaluar la expresion a la izquierda del punto
-        expr = self.visit(node.obj, scope)
+        expr = self.box(self.visit(node.obj, scope))
 
         self.register_instruction(AssignNode(type_vm_holder, expr))
 
         self.register_instruction(SaveSelf())
 
-        # Evaluar los argumentos
+        # Evaluar los argumentos, que se pasan encapsulados
         for arg in node.args:
-            arg_expr = self.visit(arg, scope)
+            arg_expr = self.box(self.visit(arg, scope))
             self.register_instruction(ArgNode(arg_expr))
 
         self.register_instruction(
@@ -968,13 +950,13 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
         return_expr_vm_holder = self.define_internal_local()
 
         # Evaluar el objeto sobre el que se llama la funcion
-        obj_dispatched = self.visit(node.obj, scope)
+        obj_dispatched = self.box(self.visit(node.obj, scope))
 
         self.register_instruction(SaveSelf())
 
-        # Evaluar los argumentos
+        # Evaluar los argumentos, que se pasan encapsulados
         for arg in node.arg_list:
-            arg_expr = self.visit(arg, scope)
+            arg_expr = self.box(self.visit(arg, scope))
             self.register_instruction(ArgNode(arg_expr))
 
         # Asignar el tipo a una variable
@@ -995,25 +977,28 @@ class CoolToCILVisitor(baseCilVisitor.BaseCoolToCilVisitor):
 
     @visit.register
     def _(self, node: IsVoidNode, scope: Scope):
-        return_bool_vm_holder = self.define_internal_local()
+        return_bool_vm_holder = self.define_unboxed_local("Bool")
         val = self.visit(node.expr, scope)
+        if self.unboxed_type(val) is not None:
+            # Un Int o un Bool nunca es void
+            self.register_instruction(AssignNode(return_bool_vm_holder, 0))
+            return return_bool_vm_holder
         true_label = self.do_label("TRUE")
         end_label = self.do_label("END")
         self.register_instruction(IfZeroJump(val, true_label))
         # Bool con valor false
-        self.register_instruction(AllocateBoolNode(return_bool_vm_holder, 0))
+        self.register_instruction(AssignNode(return_bool_vm_holder, 0))
         self.register_instruction(UnconditionalJump(end_label))
         self.register_instruction(LabelNode(true_label))
-        self.register_instruction(AllocateBoolNode(return_bool_vm_holder, 1))
+        self.register_instruction(AssignNode(return_bool_vm_holder, 1))
         self.register_instruction(LabelNode(end_label))
         return return_bool_vm_holder
 
     @visit.register
     def _(self, node: NotNode, scope: Scope):
-        expr = self.define_internal_local()
-        result = self.visit(node.lex, scope)
+        expr = self.define_unboxed_local("Int")
+        result = self.unbox(self.visit(node.lex, scope), "Int")
         self.register_instruction(BitwiseNotNode(result, expr))
-        self.register_instruction(AllocateIntNode(expr, expr))
         return expr
 
 
@@ -1050,6 +1035,10 @@ class CilDisplayFormatter:
 
         return f"{node.name} {{\n\t{params}\n\n\t{localvars}\n\n\t{instructions}\n}}"
 
+    @visit.register
+    def _(self, node: CachedCodeNode):
+        return "\n".join(f"{name} {{ cached }}" for name in node.functions)
+
     @visit.register
     def _(self, node: ParamNode) -> str:
         return f"PARAM {node.name}"
@@ -1078,6 +1067,18 @@ class CilDisplayFormatter:
     def _(self, node: DivNode) -> str:
         return f"{self.visit(node.dest)} = {self.visit(node.left)} / {self.visit(node.right)}"
 
+    @visit.register
+    def _(self, node: EqualToCilNode) -> str:
+        return f"{self.visit(node.dest)} = {self.visit(node.left)} == {self.visit(node.right)}"
+
+    @visit.register
+    def _(self, node: LowerThanCilNode) -> str:
+        return f"{self.visit(node.dest)} = {self.visit(node.left)} < {self.visit(node.right)}"
+
+    @visit.register
+    def _(self, node: LowerEqualCilNode) -> str:
+        return f"{self.visit(node.dest)} = {self.visit(node.left)} <= {self.visit(node.right)}"
+
     @visit.register
     def _(self, node: AllocateNode) -> str:
         return f"{self.visit(node.dest)} = ALLOCATE {node.itype.name}"
@@ -1124,7 +1125,7 @@ class CilDisplayFormatter:
 
     @visit.register
     def _(self, node: TdtLookupNode) -> str:
-        return f"{node.dest.name} = TYPE_DISTANCE {node.i} {node.j}"
+        return f"{node.dest.name} = TYPE_DISTANCE {node.i} {node.j.name}"
 
     @visit.register
     def _(self, node: IfZeroJump) -> str:
@@ -1180,7 +1181,7 @@ class CilDisplayFormatter:
 
     @visit.register
     def _(self, node: ConcatString):
-        return f"{self.visit(node.dest)} = self.CONCAT {node.s}"
+        return f"{self.visit(node.dest)} = self.CONCAT {node.s.name}"
 
     def __call__(self, node) -> str:
         return self.visit(node)
@@ -22,6 +22,9 @@ def get_type_attribute_chain(type_: Type):
 
 
 def find_common_parent(e1, e2):
+    hierarchy = e1.hierarchy
+    if hierarchy is not None and e1 in hierarchy and e2 in hierarchy:
+        return hierarchy.common_parent(e1, e2)
     if e1.conforms_to(e2):
         return e2
     elif e2.conforms_to(e1):
@@ -69,7 +72,7 @@ class TypeInferer:
     el menor tipo T3 tal que T1 se conforme en T3 y T2 se conforme en T3.
     """
 
-    def __init__(self, context: semantic.Context, errors=[]):
+    def __init__(self, context: semantic.Context, errors=[], recover=False):
         self.context: semantic.Context = context
         self.current_type: Optional[semantic.Type] = None
         self.INTEGER = self.context.get_type("Int")
@@ -80,6 +83,30 @@ class TypeInferer:
         self.SELF_TYPE = self.context.get_type("SELF_TYPE")
         self.errors = errors
         self.current_method: Optional[semantic.Method] = None
+        self.ERROR = semantic.ErrorType()
+        self.failures = 0
+        if recover:
+            # Sustituir el visitor por uno que se recupera de los errores
+            self._dispatch = self.visit
+            self.visit = self._visit_recovering
+
+    def _visit_recovering(self, node, *args, **kwargs):
+        """
+        Modo de recuperacion: si la visita de un nodo lanza un SemanticError
+        se registra el error, el nodo toma el tipo ErrorType y se sigue con
+        el resto del programa. Si ya habia fallado algun nodo dentro de este,
+        el error se considera una consecuencia de aquel y no se reporta, lo
+        mismo si el error menciona a ErrorType.
+        """
+        failures = self.failures
+        try:
+            return self._dispatch(node, *args, **kwargs)
+        except SemanticError as e:
+            cascade = self.failures > failures or self.ERROR.name in e.text
+            if not cascade and e.text not in self.errors:
+                self.errors.append(e.text)
+            self.failures += 1
+            return self.ERROR
 
     @singledispatchmethod
     def visit(self, node, scope, infered_type=None) -> Type:
@@ -96,13 +123,50 @@ class TypeInferer:
     # ---------------------------------------------------------------
     @visit.register
     def _(self, node: coolAst.ProgramNode, scope=None, infered_type=None, deep=1):
-        program_scope = semantic.Scope() if scope is None else scope
-        if deep == 1:
-            for class_ in node.class_list:
-                self.visit(class_, program_scope.create_child())
-        else:
-            for class_, child_scope in zip(node.class_list, program_scope.children):
-                self.visit(class_, child_scope, deep=deep)
+        """
+        Las unidades de inferencia son los atributos y metodos de cada clase.
+        Primero se visitan todas en orden (deep == 1), creando sus scopes.
+        Luego se resuelven las restricciones con una lista de trabajo,
+        volviendo a visitar (deep > 1, reutilizando sus scopes) solo las
+        unidades que pueden dar otro resultado:
+            - las que leyeron un atributo, parametro o retorno AUTO_TYPE que
+              tomo un tipo concreto,
+            - la propia unidad si una variable de su scope que fue
+              AUTO_TYPE tomo un tipo concreto durante la visita, y todas las
+              de la clase si la variable es un atributo del scope de la clase.
+        Cada uno de esos eventos ocurre a lo sumo una vez por componente de
+        un slot o por variable, asi que el numero de visitas esta acotado
+        por len(units) * (variables + componentes).
+        """
+        program_scope = semantic.Scope()
+        self.units = []
+        self.slots = self._auto_slots()
+        # Componentes AUTO_TYPE de cada slot que aun no tomaron un tipo concreto
+        self.auto_parts = {
+            (key, i)
+            for key, slot in self.slots.items()
+            for i, type_ in enumerate(self._slot_types(slot))
+            if type_ == self.AUTO_TYPE
+        }
+        # Variables que fueron AUTO_TYPE y las que ya tomaron un tipo concreto
+        self.auto_variables = set()
+        self.concrete_variables = set()
+        self.readers = {}
+        self.pending = set()
+        self.reads = None
+
+        for class_ in node.class_list:
+            self.visit(class_, program_scope.create_child())
+
+        variables = len(list(self._variables(program_scope)))
+        limit = len(self.units) * (variables + len(self.auto_parts))
+        visits = 0
+        while self.pending:
+            assert visits < limit, "type inference did not reach a fixpoint"
+            index = min(self.pending)
+            self.pending.discard(index)
+            self._visit_unit(index, deep=2)
+            visits += 1
         return program_scope
 
     # -----------------------------------------------------------------
@@ -114,36 +178,110 @@ class TypeInferer:
     def _(
         self, node: coolAst.ClassDef, scope: semantic.Scope, infered_type=None, deep=1
     ):
-        self.current_type = self.context.get_type(node.idx)
+        current_type = self.context.get_type(node.idx)
         # Definir los atributos heredados
-        if deep == 1:
-            for attribute in (
-                get_type_attribute_chain(self.current_type)
-            ):
-                scope.define_variable(attribute.name, attribute.type, "ATTRIBUTE")
+        for attribute in get_type_attribute_chain(current_type):
+            self._define(scope, attribute.name, attribute.type, "ATTRIBUTE")
 
         attrib = [x for x in node.features if isinstance(x, AttributeDef)]
         meth = [x for x in node.features if isinstance(x, MethodDef)]
-        features = attrib + meth
-        
-        if deep == 1:
-            for f in features:
-                self.visit(f, scope.create_child(), deep)
+        for f in attrib + meth:
+            self.units.append((current_type, f, scope.create_child()))
+            self._visit_unit(len(self.units) - 1, deep=1)
+
+    def _auto_slots(self):
+        """
+        Atributos y metodos del programa cuyo tipo (o el de alguno de sus
+        parametros) es AUTO_TYPE, indexados por identidad.
+        """
+        slots = {}
+        for type_ in self.context.types.values():
+            for attribute in type_.attributes:
+                if attribute.type == self.AUTO_TYPE:
+                    slots[id(attribute)] = attribute
+            for method in type_.methods.values():
+                if method.return_type == self.AUTO_TYPE or self.AUTO_TYPE in method.param_types:
+                    slots[id(method)] = method
+        return slots
+
+    @staticmethod
+    def _slot_types(slot) -> List[Type]:
+        if isinstance(slot, semantic.Attribute):
+            return [slot.type]
+        return [slot.return_type] + list(slot.param_types)
+
+    def _define(self, scope: Scope, name: str, type_: Type, location) -> semantic.VariableInfo:
+        var = scope.define_variable(name, type_, location)
+        if type_ == self.AUTO_TYPE:
+            self.auto_variables.add(id(var))
+        return var
+
+    def _variables(self, scope: Scope):
+        # Variables del scope y de sus descendientes
+        yield from scope.locals
+        for child in scope.children:
+            yield from self._variables(child)
+
+    def _refined(self, variables) -> bool:
+        """
+        Indica si alguna de las variables que fueron AUTO_TYPE tomo un tipo
+        concreto por primera vez, y anota las que son AUTO_TYPE ahora.
+        """
+        refined = False
+        for var in variables:
+            key = id(var)
+            if var.type == self.AUTO_TYPE:
+                self.auto_variables.add(key)
+            elif key in self.auto_variables and key not in self.concrete_variables:
+                self.concrete_variables.add(key)
+                refined = True
+        return refined
+
+    def _read(self, slot):
+        if self.reads is not None and id(slot) in self.slots:
+            self.reads.add(id(slot))
+
+    def _read_attribute(self, name: str):
+        if self.reads is not None:
+            try:
+                self._read(self.current_type.get_attribute(name))
+            except SemanticError:
+                pass
+
+    def _visit_unit(self, index: int, deep: int):
+        current_type, feature, scope = self.units[index]
+        self.current_type = current_type
+        if deep > 1:
+            # Los atributos se copiaron en el scope de la clase en la primera
+            # visita; actualizar los que se hayan inferido desde entonces.
+            for var in scope.parent.locals:
+                if var.location == "ATTRIBUTE" and var.type == self.AUTO_TYPE:
+                    var.type = current_type.get_attribute(var.name).type
+
+        if not self.slots:
+            self.visit(feature, scope, deep=deep)
         else:
-            for f, s in zip(features, scope.children):
-                self.visit(f, s, deep)
-
-        # for feature in node.features:
-        #     if isinstance(feature, coolAst.AttributeDef):
-        #         self.visit(feature, scope, deep=deep)
-        # if deep == 1:
-        #     for feature in node.features:
-        #         if isinstance(feature, coolAst.MethodDef):
-        #             self.visit(feature, scope.create_child(), deep=deep)
-        # else:
-        #     methods = (f for f in node.features if isinstance(f, coolAst.MethodDef))
-        #     for feature, child_scope in zip(methods, scope.children):
-        #         self.visit(feature, child_scope, deep=deep)
+            self.reads = set()
+            self.visit(feature, scope, deep=deep)
+            for key in self.reads:
+                self.readers.setdefault(key, set()).add(index)
+            self.reads = None
+
+            for key, slot in self.slots.items():
+                for i, type_ in enumerate(self._slot_types(slot)):
+                    if type_ != self.AUTO_TYPE and (key, i) in self.auto_parts:
+                        self.auto_parts.discard((key, i))
+                        self.pending.update(self.readers.get(key, ()))
+
+        # Sin variables AUTO_TYPE no hay nada que refinar en los scopes
+        if not self.auto_variables:
+            return
+        if self._refined(self._variables(scope)):
+            self.pending.add(index)
+        if self._refined(scope.parent.locals):
+            self.pending.update(
+                i for i, (_, _, s) in enumerate(self.units) if s.parent is scope.parent
+            )
 
     # ---------------------------------------------------------
     # Definir un atributo en el scope.                        |
@@ -223,9 +361,14 @@ class TypeInferer:
 
     @visit.register
     def _(self, node: coolAst.Param, scope: semantic.Scope, infered_type=None, deep=1):
-        type_ = self.context.get_type(node.type)
+        try:
+            type_ = self.context.get_type(node.type)
+        except SemanticError:
+            # Solo ocurre en modo de recuperacion, TypeBuilder ya reporto
+            # el tipo no definido
+            type_ = self.ERROR
         if deep == 1:
-            scope.define_variable(node.id, type_, "PARAM")
+            self._define(scope, node.id, type_, "PARAM")
 
     # -------------------------------------------------------------------------
     # Checkear si la variable a la que se le va a asignar el resultado de la  |
@@ -240,7 +383,9 @@ class TypeInferer:
         var_info = scope.find_variable(node.idx)
         assert self.current_type is not None
         if var_info:
-            e = self.visit(node.expr, scope, infered_type)
+            if var_info.location == "ATTRIBUTE":
+                self._read_attribute(var_info.name)
+            e = self.visit(node.expr, scope, infered_type, deep)
             if var_info.type == self.AUTO_TYPE:
                 var_info.type = e
                 if not scope.is_local(var_info.name):
@@ -274,6 +419,8 @@ class TypeInferer:
         var_info = scope.find_variable(node.idx)
         assert self.current_type is not None
         if var_info:
+            if var_info.location == "ATTRIBUTE":
+                self._read_attribute(var_info.name)
             if infered_type and var_info.type == self.AUTO_TYPE:
                 var_info.type = infered_type
                 if scope.is_local(var_info.name):
@@ -305,7 +452,7 @@ class TypeInferer:
         cond = self.visit(node.cond, scope, infered_type, deep)
         e1 = self.visit(node.expr1, scope, infered_type, deep)
         e2 = self.visit(node.expr2, scope, infered_type, deep)
-        if cond != self.BOOL:
+        if cond != self.BOOL and cond != self.ERROR:
             raise SemanticError(
                 f"{node.cond.line, node.cond.column} - TypeError: Predicate of 'if' does not have type Bool."
             )
@@ -352,8 +499,8 @@ class TypeInferer:
     def _(self, node: ActionNode, scope: Scope, infered_type=None, deep=1):
         if deep == 1:
             try:
-                scope.define_variable(
-                    node.idx, self.context.get_type(node.typex), "LOCAL"
+                self._define(
+                    scope, node.idx, self.context.get_type(node.typex), "LOCAL"
                 )
             except SemanticError:
                 raise SemanticError(
@@ -409,15 +556,20 @@ class TypeInferer:
                         )
                     else:
                         if deep == 1:
-                            scope.define_variable(var_id, type_, "LOCAL")
+                            self._define(scope, var_id, type_, "LOCAL")
                 else:
                     if deep == 1:
-                        scope.define_variable(var_id, init_expr_type, "LOCAL")
+                        self._define(scope, var_id, init_expr_type, "LOCAL")
+                    else:
+                        # Al revisitar, la expresion pudo haberse inferido
+                        var_info = scope.find_variable(var_id)
+                        if var_info is not None and var_info.type == self.AUTO_TYPE:
+                            var_info.type = init_expr_type
             else:
                 # No hay expresion de inicializacion, entonces solo queda definir la variable, y si es necesario,
                 # se actualizara su tipo al chequear el contexto.
                 if not (scope.is_defined(var_id) and scope.is_local(var_id)):
-                    scope.define_variable(var_id, type_, "LOCAL")
+                    self._define(scope, var_id, type_, "LOCAL")
 
         # Visitar la expresion asociada.
         return_type = self.visit(node.block_statements, scope, infered_type, deep)
@@ -453,6 +605,7 @@ class TypeInferer:
             raise SemanticError(
                 f"{node.line, node.column} - AttributeError: Dispatch to undefined method {node.idx}."
             )
+        self._read(method)
 
         if len(method.param_names) != len(node.arg_list):
             raise SemanticError(
@@ -493,6 +646,11 @@ class TypeInferer:
         if static_expr0_type.name == "SELF_TYPE":
             static_expr0_type = self.current_type
 
+        if static_expr0_type == self.ERROR:
+            for expr_i in node.args:
+                self.visit(expr_i, scope, infered_type, deep)
+            return self.ERROR
+
         # Encontrar el metodo en el tipo.
         try:
             method: semantic.Method = static_expr0_type.get_method(node.id)
@@ -500,6 +658,7 @@ class TypeInferer:
             raise SemanticError(
                 f"{node.line, node.column} - AttributeError: Dispatch to undefined method {node.id}."
             )
+        self._read(method)
 
         if len(method.param_names) != len(node.args):
             raise SemanticError(
@@ -559,7 +718,7 @@ class TypeInferer:
         deep=1,
     ):
         cond_type = self.visit(node.cond, scope, infered_type, deep)
-        if cond_type != self.BOOL:
+        if cond_type != self.BOOL and cond_type != self.ERROR:
             raise SemanticError(
                 f"{node.cond.line, node.cond.column} - TypeError: Loop condition does not have type Bool."
             )
@@ -1,16 +1,21 @@
 from typing import List, Any, Optional
 import abstract.tree as coolAst
-from abstract.semantics import Method, ObjectType, SemanticError, Type, Context
+from abstract.semantics import ErrorType, Method, ObjectType, SemanticError, Type, Context
 from functools import singledispatchmethod
 
 INHERITABLES = ("Int", "Bool", "String", "AUTO_TYPE")
 
 
 class TypeBuilder:
-    def __init__(self, context: Context, errors=[]):
+    def __init__(self, context: Context, errors=[], recover=False):
         self.context: Context = context
         self.errors: List[Any] = errors
         self.current_type: Optional[Type] = None
+        # En modo de recuperacion cada error se registra y se sigue con la
+        # siguiente declaracion: una clase con un padre invalido hereda de
+        # Object y un tipo no definido se sustituye por ErrorType.
+        self.recover = recover
+        self.ERROR = ErrorType()
 
     @singledispatchmethod
     def visit(self, node):
@@ -24,6 +29,31 @@ class TypeBuilder:
     @visit.register
     def _(self, node: coolAst.ClassDef):
         self.current_type = self.context.get_type(node.idx)
+        try:
+            parent = self.get_parent(node)
+        except SemanticError as e:
+            if not self.recover:
+                raise
+            self.errors.append(e.text)
+            parent = self.context.get_type("Object")
+
+        self.current_type.set_parent(parent)
+
+        # Definir los atributos y metodos del padre
+        for attrib in parent.attributes:
+            self.current_type.attributes.append(attrib)
+
+        # self.current_type.methods.update(parent.methods)
+
+        for feature in node.features:
+            try:
+                self.visit(feature)
+            except SemanticError as e:
+                if not self.recover:
+                    raise
+                self.errors.append(e.text)
+
+    def get_parent(self, node: coolAst.ClassDef) -> Type:
         try:
             parent = self.context.get_type(node.parent)
         except SemanticError:
@@ -38,17 +68,7 @@ class TypeBuilder:
             raise SemanticError(
                 f"{node.line, node.column + len(node.idx) + 10} - SemanticError: Circular dependency. Class {node.idx} can not inherit from {parent.name}"
             )
-        else:
-            self.current_type.set_parent(parent)
-
-            # Definir los atributos y metodos del padre
-            for attrib in parent.attributes:
-                self.current_type.attributes.append(attrib)
-
-            # self.current_type.methods.update(parent.methods)
-
-            for feature in node.features:
-                self.visit(feature)
+        return parent
 
     @visit.register
     def _(self, node: coolAst.AttributeDef):
@@ -63,7 +83,11 @@ class TypeBuilder:
                 else node.typex
             )
         except SemanticError:
-            raise SemanticError(f"{node.line, node.column + len(node.idx) + 2} - TypeError: Class {node.typex} of attribute {node.idx} is undefined.")
+            error = SemanticError(f"{node.line, node.column + len(node.idx) + 2} - TypeError: Class {node.typex} of attribute {node.idx} is undefined.")
+            if not self.recover:
+                raise error
+            self.errors.append(error.text)
+            attr_type = self.ERROR
 
         # Definir el atributo en el tipo actual
         self.current_type.define_attribute(
@@ -129,6 +153,8 @@ class TypeBuilder:
                 self.errors.append(
                     f"({node.line}, {node.ret_col}) - TypeError: Undefined return type {node.return_type} in method {node.idx}."
                 )
+                if self.recover:
+                    self.define_erroneous_method(node)
 
         except SemanticError as e:
             for param in node.param_list:
@@ -139,3 +165,28 @@ class TypeBuilder:
                         self.errors.append(
                             f"({param.line}, {param.column + len(param.id) + 2}) - TypeError: Class {param.type} of formal parameter {param.id} is undefined"
                         )
+            if self.recover:
+                self.define_erroneous_method(node)
+
+    def define_erroneous_method(self, node: coolAst.MethodDef):
+        # Definir el metodo sustituyendo los tipos no definidos por
+        # ErrorType para que sus llamadas se sigan chequeando.
+        def resolve(typex):
+            if not isinstance(typex, str):
+                return typex
+            try:
+                return self.context.get_type(typex)
+            except SemanticError:
+                return self.ERROR
+
+        try:
+            self.current_type.define_method(
+                node.idx,
+                [param.id for param in node.param_list],
+                [resolve(param.type) for param in node.param_list],
+                resolve(node.return_type),
+                node.line,
+                node.column,
+            )
+        except SemanticError as e:
+            self.errors.append(e.text)
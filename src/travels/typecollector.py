@@ -120,9 +120,14 @@ def bootstrap_object(obj: ObjectType, strType: StringType):
 
 
 class TypeCollector:
-    def __init__(self, errors=[]):
+    def __init__(self, errors=None, recover=False):
         self.context = None
-        self.errors = errors
+        # Una lista nueva por instancia: el servidor de compilacion reutiliza
+        # el proceso y los errores de un programa no deben pasar al siguiente.
+        self.errors = [] if errors is None else errors
+        # En modo de recuperacion se reportan todas las clases redefinidas
+        # en lugar de detenerse en la primera.
+        self.recover = recover
 
     @singledispatchmethod
     def visit(self, node):
@@ -164,7 +169,12 @@ class TypeCollector:
         self.context.types["SELF_TYPE"] = SELF_TYPE
 
         for class_ in node.class_list:
-            self.visit(class_)
+            try:
+                self.visit(class_)
+            except SemanticError as e:
+                if not self.recover:
+                    raise
+                self.errors.append(e.text)
 
     @visit.register
     def _(self, node: coolAst.ClassDef):
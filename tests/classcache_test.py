@@ -0,0 +1,96 @@
+import os
+import re
+
+import pytest
+
+from classcache import ClassCache
+from pycoolc import compile_program
+
+codegen_dir = __file__.rpartition('/')[0] + '/codegen/'
+
+PROGRAM = """
+class A {
+    x : Int <- 1;
+    get() : Int { x };
+};
+
+class B inherits A {
+    twice() : Int { get() * 2 };
+};
+
+class C {
+    name() : String { "C" };
+};
+
+class Main inherits IO {
+    main() : Object { {
+        out_int((new B).twice());
+        out_string((new C).name());
+    } };
+};
+"""
+
+USER_CLASSES = 4
+
+
+def compile_with(cache, program=PROGRAM, optimize=0):
+    cache.hits = cache.misses = 0
+    return without_date(compile_program(program, cache=cache, optimize=optimize))
+
+
+def without_date(source):
+    # La cabecera del programa lleva la fecha de la compilacion
+    return re.sub(r" --- .*\n", "\n", source, count=1)
+
+
+def test_unchanged_classes_are_reused(tmp_path):
+    cache = ClassCache(str(tmp_path))
+    compile_with(cache)
+    assert (cache.hits, cache.misses) == (0, USER_CLASSES)
+    compile_with(cache)
+    assert (cache.hits, cache.misses) == (USER_CLASSES, 0)
+
+
+def test_method_body_only_invalidates_its_class(tmp_path):
+    cache = ClassCache(str(tmp_path))
+    compile_with(cache)
+    # La interfaz de C no cambia, las demas clases se reutilizan
+    compile_with(cache, PROGRAM.replace('"C"', '"D"'))
+    assert (cache.hits, cache.misses) == (USER_CLASSES - 1, 1)
+
+
+@pytest.mark.parametrize("old, new", [
+    # Un atributo nuevo en el ancestro cambia la disposicion de B
+    ("x : Int <- 1;", "x : Int <- 1; y : Int;"),
+    # Un metodo nuevo en el ancestro cambia las tablas virtuales
+    ("get() : Int { x };", "get() : Int { x }; set(v : Int) : Int { x <- v };"),
+    # El tipo de un metodo heredado cambia lo que B lee de A
+    ("get() : Int { x };", "get() : Object { x };"),
+])
+def test_ancestor_changes_invalidate_dependents(tmp_path, old, new):
+    cache = ClassCache(str(tmp_path))
+    compile_with(cache)
+    program = PROGRAM.replace(old, new)
+    if "Object" in new:
+        program = program.replace("get() * 2", "case get() of n : Int => n * 2; esac")
+    compile_with(cache, program)
+    assert cache.misses == USER_CLASSES
+    # El resultado es el mismo que sin cache
+    assert compile_with(cache, program) == without_date(compile_program(program))
+    assert (cache.hits, cache.misses) == (USER_CLASSES, 0)
+
+
+@pytest.mark.parametrize("optimize", [0, 2])
+@pytest.mark.parametrize("cool_file", sorted(f for f in os.listdir(codegen_dir) if f.endswith('.cl')))
+def test_warm_cache_output(tmp_path, cool_file, optimize):
+    with open(codegen_dir + cool_file) as f:
+        program = f.read()
+    cold = without_date(compile_program(program, optimize=optimize))
+    cache = ClassCache(str(tmp_path), optimize)
+    assert compile_with(cache, program, optimize) == cold
+    classes = cache.misses
+    assert cache.hits == 0
+    # Con la cache llena todas las clases se reutilizan y el programa es el
+    # mismo que el compilado sin cache
+    assert compile_with(cache, program, optimize) == cold
+    assert (cache.hits, cache.misses) == (classes, 0)
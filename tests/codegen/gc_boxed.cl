@@ -0,0 +1,91 @@
+(*
+ *  Garbage collector stress test: boxed Int and Bool values.
+ *
+ *  Ints and Bools stored in Object attributes, returned from if and
+ *  case branches and passed as Object arguments are heap objects. The
+ *  program keeps a list of them across many collections and checks
+ *  their values with case at the end. The input gives the number of
+ *  rounds.
+ *)
+
+class Node {
+   value : Object;
+   next : Node;
+
+   init(v : Object, n : Node) : Node {
+      {
+         value <- v;
+         next <- n;
+         self;
+      }
+   };
+
+   value() : Object { value };
+   next() : Node { next };
+};
+
+class Main inherits IO {
+   values : Node;
+   count : Int;
+
+   -- An Int or a Bool, boxed through an if
+   box(i : Int) : Object {
+      if i - (i / 3) * 3 = 0 then i - (i / 2) * 2 = 0 else i fi
+   };
+
+   -- The Int a boxed value stands for, through a case
+   unbox(o : Object) : Int {
+      case o of
+         i : Int => i;
+         b : Bool => if b then 1 else 0 fi;
+         x : Object => { abort(); 0; };
+      esac
+   };
+
+   -- Boxes that are garbage as soon as they are summed
+   churn(n : Int) : Int {
+      let sum : Int <- 0 in
+         {
+            while 0 < n loop
+               {
+                  sum <- sum + unbox(box(n));
+                  n <- n - 1;
+               }
+            pool;
+            sum;
+         }
+   };
+
+   main() : Object {
+      let rounds : Int <- in_int(), i : Int <- 0, total : Int <- 0 in
+         {
+            while i < rounds loop
+               {
+                  total <- total + churn(50);
+                  -- Keep one box per round
+                  values <- (new Node).init(box(i), values);
+                  count <- count + 1;
+                  i <- i + 1;
+               }
+            pool;
+            out_string("churn total: ").out_int(total).out_string("\n");
+
+            let n : Node <- values, ints : Int <- 0, trues : Int <- 0, falses : Int <- 0 in
+               {
+                  while not isvoid n loop
+                     {
+                        case n.value() of
+                           i : Int => ints <- ints + i;
+                           b : Bool => if b then trues <- trues + 1 else falses <- falses + 1 fi;
+                        esac;
+                        n <- n.next();
+                     }
+                  pool;
+                  out_string("kept: ").out_int(count).out_string("\n");
+                  out_string("ints: ").out_int(ints).out_string("\n");
+                  out_string("trues: ").out_int(trues).out_string("\n");
+                  out_string("falses: ").out_int(falses).out_string("\n");
+               };
+         }
+   };
+};
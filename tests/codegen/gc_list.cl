@@ -0,0 +1,95 @@
+(*
+ *  Garbage collector stress test: lists and strings that survive
+ *  collections.
+ *
+ *  Each round builds a list of strings and throws most of it away, while
+ *  a second list keeps one string per round. The kept strings are built
+ *  with concat and substr, so their characters live in the heap too. At
+ *  the end the kept list is walked and printed: if a collection lost or
+ *  moved an object without updating its references the output changes.
+ *)
+
+class List {
+   isNil() : Bool { true };
+   head() : String { { abort(); ""; } };
+   tail() : List { { abort(); self; } };
+   cons(s : String) : List { (new Cons).init(s, self) };
+   length() : Int { 0 };
+};
+
+class Cons inherits List {
+   car : String;
+   cdr : List;
+
+   isNil() : Bool { false };
+   head() : String { car };
+   tail() : List { cdr };
+   length() : Int { 1 + cdr.length() };
+
+   init(s : String, rest : List) : List {
+      {
+         car <- s;
+         cdr <- rest;
+         self;
+      }
+   };
+};
+
+class Main inherits IO {
+   kept : List <- new List;
+   digits : String <- "0123456789";
+
+   digit(i : Int) : String { digits.substr(i - (i / 10) * 10, 1) };
+
+   number(i : Int) : String {
+      if i < 10 then digit(i) else number(i / 10).concat(digit(i)) fi
+   };
+
+   -- A list of n strings that is garbage after the round
+   garbage(n : Int) : List {
+      let l : List <- new List in
+         {
+            while 0 < n loop
+               {
+                  l <- l.cons(number(n).concat(" garbage"));
+                  n <- n - 1;
+               }
+            pool;
+            l;
+         }
+   };
+
+   round(i : Int) : Object {
+      let g : List <- garbage(40),
+          s : String <- number(i).concat(": ").concat(g.head()).concat(" (dropped)") in
+         -- The head of the garbage list is the only string that survives
+         kept <- kept.cons(s.substr(0, s.length() - 10))
+   };
+
+   main() : Object {
+      let i : Int <- 0 in
+         {
+            while i < 300 loop
+               {
+                  round(i);
+                  i <- i + 1;
+               }
+            pool;
+            out_int(kept.length());
+            out_string("\n");
+            let l : List <- kept, n : Int <- 0 in
+               while not l.isNil() loop
+                  {
+                     -- Only every 25th string, the list is long
+                     if n - (n / 25) * 25 = 0 then
+                        out_string(l.head().concat("\n"))
+                     else
+                        0
+                     fi;
+                     l <- l.tail();
+                     n <- n + 1;
+                  }
+               pool;
+         }
+   };
+};
@@ -12,6 +12,8 @@ tests = [(file) for file in os.listdir(tests_dir) if file.endswith('.cl')]
 @pytest.mark.ok
 @pytest.mark.run(order=4)
 @pytest.mark.parametrize("cool_file", tests)
-def test_codegen(compiler_path, cool_file):
+# Con un heap de 64 bytes el recolector de basura corre en casi cada reserva
+@pytest.mark.parametrize("flags", [[], ['-O2'], ['--heap-size', '64']], ids=['O0', 'O2', 'heap64'])
+def test_codegen(compiler_path, cool_file, flags):
     compare_outputs(compiler_path, tests_dir + cool_file, tests_dir + cool_file[:-3] + '_input.txt',\
-        tests_dir + cool_file[:-3] + '_output.txt')
\ No newline at end of file
+        tests_dir + cool_file[:-3] + '_output.txt', args=flags)
\ No newline at end of file
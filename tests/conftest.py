@@ -1,5 +1,9 @@
 import pytest
 import os
+import sys
+
+# Los tests de unidad importan los modulos del compilador
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
 
 @pytest.fixture
 def compiler_path():
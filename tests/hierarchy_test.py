@@ -0,0 +1,127 @@
+import random
+
+import pytest
+
+from abstract.semantics import Context
+
+
+# Object
+# +-- A
+# |   +-- B
+# |   |   +-- D
+# |   |   |   +-- G
+# |   |   +-- E
+# |   +-- C
+# |       +-- F
+# +-- H
+#     +-- I
+PARENTS = {
+    "A": "Object", "B": "A", "C": "A", "D": "B", "E": "B",
+    "F": "C", "G": "D", "H": "Object", "I": "H",
+}
+
+
+def build_context(parents):
+    context = Context()
+    context.create_type("Object")
+    for name in parents:
+        context.create_type(name)
+    for name, parent in parents.items():
+        context.get_type(name).set_parent(context.get_type(parent))
+    context.build_hierarchy()
+    return context
+
+
+def ancestors(type_):
+    # Recorrido ingenuo hacia la raiz, el propio tipo incluido
+    chain = []
+    while type_ is not None:
+        chain.append(type_)
+        type_ = type_.parent
+    return chain
+
+
+def naive_common_parent(t1, t2):
+    names = [t.name for t in ancestors(t2)]
+    return next(t for t in ancestors(t1) if t.name in names)
+
+
+def naive_distance(t1, t2):
+    names = [t.name for t in ancestors(t2)]
+    return names.index(t1.name) if t1.name in names else -1
+
+
+@pytest.fixture
+def context():
+    return build_context(PARENTS)
+
+
+@pytest.mark.semantic
+@pytest.mark.parametrize("t1, t2, expected", [
+    ("G", "E", "B"),
+    ("G", "F", "A"),
+    ("D", "G", "D"),
+    ("G", "D", "D"),
+    ("E", "E", "E"),
+    ("G", "I", "Object"),
+    ("F", "C", "C"),
+    ("Object", "I", "Object"),
+])
+def test_common_parent(context, t1, t2, expected):
+    hierarchy = context.hierarchy
+    assert hierarchy.common_parent(context.get_type(t1), context.get_type(t2)).name == expected
+
+
+@pytest.mark.semantic
+def test_conforms(context):
+    hierarchy = context.hierarchy
+    get = context.get_type
+    assert hierarchy.conforms(get("G"), get("A"))
+    assert hierarchy.conforms(get("G"), get("G"))
+    assert hierarchy.conforms(get("I"), get("Object"))
+    assert not hierarchy.conforms(get("A"), get("G"))
+    assert not hierarchy.conforms(get("E"), get("D"))
+    assert not hierarchy.conforms(get("F"), get("B"))
+    assert get("G").conforms_to(get("B"))
+    assert not get("H").conforms_to(get("A"))
+
+
+@pytest.mark.semantic
+def test_distance(context):
+    hierarchy = context.hierarchy
+    get = context.get_type
+    assert hierarchy.distance(get("A"), get("G")) == 3
+    assert hierarchy.distance(get("Object"), get("G")) == 4
+    assert hierarchy.distance(get("E"), get("E")) == 0
+    assert hierarchy.distance(get("G"), get("A")) == -1
+    assert hierarchy.distance(get("C"), get("E")) == -1
+
+
+@pytest.mark.semantic
+def test_types_outside_hierarchy(context):
+    # SELF_TYPE y AUTO_TYPE no estan en la jerarquia
+    auto = context.create_type("AUTO_TYPE")
+    assert auto not in context.hierarchy
+    assert context.hierarchy.conforms(context.get_type("A"), auto) is None
+
+
+@pytest.mark.semantic
+@pytest.mark.parametrize("seed", range(5))
+def test_random_hierarchy(seed):
+    rng = random.Random(seed)
+    parents = {}
+    names = ["Object"]
+    for i in range(60):
+        # Padres al azar entre los tipos anteriores, con preferencia por los
+        # ultimos para que haya cadenas largas
+        parent = names[max(0, len(names) - 1 - int(rng.expovariate(0.3)))]
+        parents[f"T{i}"] = parent
+        names.append(f"T{i}")
+    context = build_context(parents)
+    hierarchy = context.hierarchy
+    types = [context.get_type(name) for name in names]
+    for t1 in types:
+        for t2 in types:
+            assert hierarchy.common_parent(t1, t2).name == naive_common_parent(t1, t2).name
+            assert hierarchy.conforms(t1, t2) == (naive_distance(t2, t1) >= 0)
+            assert hierarchy.distance(t1, t2) == naive_distance(t1, t2)
@@ -9,5 +9,6 @@ tests = [(file) for file in os.listdir(tests_dir) if file.endswith('.cl')]
 @pytest.mark.error
 @pytest.mark.run(order=1)
 @pytest.mark.parametrize("cool_file", tests)
-def test_lexer_errors(compiler_path, cool_file):
-    compare_errors(compiler_path, tests_dir + cool_file, tests_dir + cool_file[:-3] + '_error.txt')
\ No newline at end of file
+@pytest.mark.parametrize("flags", [[], ['--lexer', 'dfa']], ids=['re', 'dfa'])
+def test_lexer_errors(compiler_path, cool_file, flags):
+    compare_errors(compiler_path, tests_dir + cool_file, tests_dir + cool_file[:-3] + '_error.txt', args=flags)
\ No newline at end of file
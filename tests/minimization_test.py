@@ -0,0 +1,54 @@
+import re
+from itertools import product
+
+import pytest
+
+from automatons.minimization import hopcroft, minimize
+from lexer import regexgenerator
+from lexer.regexgenerator import Regex
+
+
+def words(alphabet, length):
+    for n in range(length + 1):
+        for word in product(alphabet, repeat=n):
+            yield "".join(word)
+
+
+# Expresion, alfabeto y estados del DFA minimo (sin el sumidero)
+REGEXES = [
+    ("a*", "ab", 1),
+    ("(a|b)*", "ab", 1),
+    ("a(b|c)*", "abc", 2),
+    ("aa*|a", "ab", 2),
+    ("(ab|ab)c", "abc", 4),
+    ("(a|b)*abb", "ab", 4),
+    ("(a|b)*a(a|b)", "ab", 4),
+    ("(a|b)(a|b)(a|b)|ab*", "ab", 7),
+]
+
+
+@pytest.mark.lexer
+@pytest.mark.parametrize("regex, alphabet, states", REGEXES)
+def test_minimize_regex(monkeypatch, regex, alphabet, states):
+    minimal = Regex(regex).automaton
+    # Sin minimizar queda el DFA de la construccion de subconjuntos
+    monkeypatch.setattr(regexgenerator, "minimize", lambda automaton: automaton)
+    subsets = Regex(regex).automaton
+
+    assert minimal.states == states
+    assert minimal.states <= subsets.states
+    assert minimize(subsets).states == states
+    # Ambos reconocen el lenguaje de la expresion
+    for word in words(alphabet, 7):
+        expected = re.fullmatch(regex, word) is not None
+        assert minimal.recognize(word) == subsets.recognize(word) == expected, word
+
+
+@pytest.mark.lexer
+def test_hopcroft_partition():
+    # 0 -a-> 1, 0 -b-> 2, 1 y 2 finales; 3 no alcanza ningun final
+    transitions = {(0, "a"): 1, (0, "b"): 2, (1, "a"): 3}
+    # Los finales de un mismo bloque se unen
+    assert hopcroft(4, "ab", transitions, [{1, 2}]) == [0, 1, 1, -1]
+    # Finales de reglas distintas (como los tokens del lexer) no se unen
+    assert hopcroft(4, "ab", transitions, [{1}, {2}]) == [0, 1, 2, -1]
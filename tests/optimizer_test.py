@@ -0,0 +1,238 @@
+import os
+
+import pytest
+
+from cil.nodes import (
+    AllocateBoolNode,
+    AllocateIntNode,
+    AllocateStringNode,
+    AssignNode,
+    BitwiseNotNode,
+    CharToCharStringCompare,
+    CompareStringLengthNode,
+    CompareSTRType,
+    CompareType,
+    DataNode,
+    DynamicCallNode,
+    EqualToCilNode,
+    FunctionNode,
+    GetAttributeNode,
+    GetValue,
+    IfZeroJump,
+    LabelNode,
+    LoadNode,
+    LocalNode,
+    LowerEqualCilNode,
+    LowerThanCilNode,
+    MinusNode,
+    MinusNodeComp,
+    NotNode,
+    NotZeroJump,
+    ParamNode,
+    PlusNode,
+    PrintIntNode,
+    ReferenceEqualNode,
+    ReturnNode,
+    SelfNode,
+    SetAttributeNode,
+    StarNode,
+    TypeName,
+    UnconditionalJump,
+)
+from cil.optimizer import (
+    INT_MAX,
+    PURE,
+    CompactLocals,
+    ConstantFolding,
+    CopyPropagation,
+    DeadCodeElimination,
+    JumpCleanup,
+    pass_manager,
+)
+from utils.compiler import build_cil
+
+codegen_dir = __file__.rpartition('/')[0] + '/codegen/'
+
+
+def function(instructions, *localvars, params=()):
+    return FunctionNode("f", list(params), list(localvars), list(instructions))
+
+
+def kinds(function):
+    return [type(instruction).__name__ for instruction in function.instructions]
+
+
+def test_fold_arithmetic():
+    a, b, c = LocalNode("a", True), LocalNode("b", True), LocalNode("c", True)
+    f = function([
+        AssignNode(a, 2),
+        AssignNode(b, 3),
+        PlusNode(c, a, b),
+        PrintIntNode(c),
+        ReturnNode(c),
+    ], a, b, c)
+    assert ConstantFolding().run(f)
+    folded = f.instructions[2]
+    assert isinstance(folded, AssignNode) and folded.dest is c and folded.source == 5
+
+
+def test_fold_keeps_overflow():
+    # En MIPS la suma daria overflow, asi que no se evalua
+    a, c = LocalNode("a", True), LocalNode("c", True)
+    f = function([AssignNode(a, INT_MAX), PlusNode(c, a, 1), ReturnNode(c)], a, c)
+    ConstantFolding().run(f)
+    assert isinstance(f.instructions[1], PlusNode)
+
+
+def test_fold_branches():
+    a, b = LocalNode("a", True), LocalNode("b", True)
+    f = function([
+        AssignNode(a, 1),
+        LowerThanCilNode(a, 2, b),
+        IfZeroJump(b, "else"),
+        PrintIntNode(a),
+        UnconditionalJump("end"),
+        LabelNode("else"),
+        PrintIntNode(b),
+        LabelNode("end"),
+        ReturnNode(0),
+    ], a, b)
+    assert ConstantFolding().run(f)
+    # 1 < 2: el salto no se toma y la rama else no se alcanza
+    assert kinds(f) == ["AssignNode", "AssignNode", "PrintIntNode", "UnconditionalJump",
+                        "LabelNode", "ReturnNode"]
+
+
+def test_copy_propagation():
+    p, a, b = ParamNode("p"), LocalNode("a"), LocalNode("b")
+    f = function([
+        AssignNode(a, p),
+        AssignNode(b, a),
+        PrintIntNode(b),
+        AssignNode(a, b),
+        ReturnNode(a),
+    ], a, b, params=[p])
+    assert CopyPropagation().run(f)
+    assert f.instructions[2].src is p
+    # a = b con b copia de p: a es copia de p
+    assert f.instructions[4].value is p
+
+
+def test_copy_propagation_stops_at_writes():
+    p, a, b = ParamNode("p"), LocalNode("a"), LocalNode("b")
+    f = function([
+        AssignNode(a, p),
+        DynamicCallNode(p, "m", a),
+        PrintIntNode(a),
+        ReturnNode(a),
+    ], a, b, params=[p])
+    assert not CopyPropagation().run(f)
+    assert f.instructions[2].src is a
+
+
+def test_dce_removes_pure_instructions():
+    p, a, s, r = ParamNode("self"), LocalNode("a"), LocalNode("s"), LocalNode("r")
+    f = function([
+        GetAttributeNode(None, "x", a),
+        AllocateStringNode(s, DataNode("s_0", '"x"'), 1),
+        AssignNode(r, r),
+        SetAttributeNode(None, "x", p),
+        DynamicCallNode(p, "m", r),
+        ReturnNode(p),
+    ], a, s, r, params=[p])
+    assert DeadCodeElimination().run(f)
+    # El resultado de la llamada no se usa pero la llamada tiene efectos
+    assert kinds(f) == ["SetAttributeNode", "DynamicCallNode", "ReturnNode"]
+
+
+# Una instruccion de cada tipo de PURE que escribe en `d` y lee `a`
+PURE_INSTRUCTIONS = {
+    AssignNode: lambda d, a: AssignNode(d, a),
+    AllocateIntNode: lambda d, a: AllocateIntNode(d, 1),
+    AllocateBoolNode: lambda d, a: AllocateBoolNode(d, 1),
+    AllocateStringNode: lambda d, a: AllocateStringNode(d, DataNode("s_0", '"x"'), 1),
+    PlusNode: lambda d, a: PlusNode(d, a, a),
+    MinusNode: lambda d, a: MinusNode(a, a, d),
+    StarNode: lambda d, a: StarNode(a, a, d),
+    GetValue: lambda d, a: GetValue(d, a),
+    GetAttributeNode: lambda d, a: GetAttributeNode(None, "x", d),
+    BitwiseNotNode: lambda d, a: BitwiseNotNode(a, d),
+    NotNode: lambda d, a: NotNode(d),
+    SelfNode: lambda d, a: SelfNode(d),
+    LoadNode: lambda d, a: LoadNode(d, DataNode("s_0", '"x"')),
+    TypeName: lambda d, a: TypeName(d),
+    EqualToCilNode: lambda d, a: EqualToCilNode(a, a, d),
+    LowerThanCilNode: lambda d, a: LowerThanCilNode(a, a, d),
+    LowerEqualCilNode: lambda d, a: LowerEqualCilNode(a, a, d),
+    MinusNodeComp: lambda d, a: MinusNodeComp(a, a, d),
+    ReferenceEqualNode: lambda d, a: ReferenceEqualNode(a, a, d),
+    CompareType: lambda d, a: CompareType(d, a, "Int"),
+    CompareSTRType: lambda d, a: CompareSTRType(d, a),
+    CompareStringLengthNode: lambda d, a: CompareStringLengthNode(d, a, a),
+    CharToCharStringCompare: lambda d, a: CharToCharStringCompare(d, a, a, "while", "end"),
+}
+
+
+def test_pure_instructions_covered():
+    assert set(PURE_INSTRUCTIONS) == set(PURE)
+
+
+@pytest.mark.parametrize("kind", PURE, ids=lambda kind: kind.__name__)
+def test_dce_pure_instruction(kind):
+    a, d = ParamNode("a"), LocalNode("d")
+    f = function([PURE_INSTRUCTIONS[kind](d, a), ReturnNode(a)], d, params=[a])
+    assert DeadCodeElimination().run(f)
+    assert kinds(f) == ["ReturnNode"]
+    # Si el resultado se usa la instruccion se queda
+    f = function([PURE_INSTRUCTIONS[kind](d, a), ReturnNode(d)], d, params=[a])
+    assert not DeadCodeElimination().run(f)
+    assert kinds(f) == [kind.__name__, "ReturnNode"]
+
+
+def test_dce_keeps_live_values():
+    a, b = LocalNode("a", True), LocalNode("b", True)
+    f = function([
+        LabelNode("loop"),
+        PlusNode(a, a, 1),
+        LowerThanCilNode(a, 10, b),
+        NotZeroJump(b, "loop"),
+        ReturnNode(a),
+    ], a, b)
+    assert not DeadCodeElimination().run(f)
+
+
+def test_jump_cleanup():
+    a = LocalNode("a", True)
+    f = function([
+        AssignNode(a, 1),
+        UnconditionalJump("next"),
+        PrintIntNode(a),
+        LabelNode("next"),
+        LabelNode("unused"),
+        ReturnNode(a),
+    ], a)
+    assert JumpCleanup().run(f)
+    # El PrintIntNode no se alcanza, el salto va a la instruccion siguiente y
+    # a ningun label se salta
+    assert kinds(f) == ["AssignNode", "ReturnNode"]
+
+
+def test_compact_locals():
+    a, b = LocalNode("a", True), LocalNode("b", True)
+    f = function([AssignNode(a, 1), ReturnNode(a)], a, b)
+    assert CompactLocals().run(f)
+    assert f.localvars == [a]
+
+
+@pytest.mark.parametrize("cool_file", sorted(f for f in os.listdir(codegen_dir) if f.endswith('.cl')))
+def test_optimize_programs(cool_file):
+    # Cada nivel deja el codigo con a lo sumo las instrucciones del anterior
+    with open(codegen_dir + cool_file) as f:
+        source = f.read()
+    sizes = []
+    for level in (0, 1, 2):
+        program, _ = build_cil(source)
+        pass_manager(level).run(program)
+        sizes.append(sum(len(f.instructions) for f in program.dotcode if isinstance(f, FunctionNode)))
+    assert sizes[0] >= sizes[1] >= sizes[2]
+    assert sizes[2] < sizes[0]
@@ -0,0 +1,18 @@
+--With --all-errors every independent error is reported, sorted by position. Errors in constants (a method body, a condition, an argument) are reported at the constant.
+
+class A {
+	f() : Int { true };
+	g(x : Int) : Int { x + "one" };
+};
+
+class B inherits A {
+	h : Bool <- 3;
+	k() : Int { if 1 then 2 else 3 fi };
+};
+
+class Main inherits IO {
+	main() : Object { {
+		out_string(new A.f());
+		undefined;
+	} };
+};
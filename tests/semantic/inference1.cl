@@ -0,0 +1,17 @@
+--The return type of m1 is only known after m1 is checked a second time: the recursive call refines p1 to Int and then p0.
+
+class A {
+    m1(p0 : AUTO_TYPE, p1 : AUTO_TYPE, p2 : Int) : AUTO_TYPE {
+        {
+            m1(p1, 2, p0);
+            p2 + 1;
+            p0;
+        }
+    };
+};
+
+class Main inherits IO {
+    main() : Object {
+        let s : String <- (new A).m1(1, 2, 3) in out_string(s)
+    };
+};
@@ -0,0 +1,14 @@
+--The type of p0 is only known after m is checked a second time: the recursive call refines p1 to Int and then p0.
+
+class A {
+    m(p0 : AUTO_TYPE, p1 : AUTO_TYPE) : Object {
+        {
+            m(p1, 2);
+            let x : String <- p0 in x;
+        }
+    };
+};
+
+class Main inherits IO {
+    main() : Object { out_int(1) };
+};
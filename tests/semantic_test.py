@@ -1,6 +1,6 @@
 import pytest
 import os
-from utils import compare_errors, first_error_only_line
+from utils import compare_errors, first_error_only_line, all_errors
 
 tests_dir = __file__.rpartition('/')[0] + '/semantic/'
 tests = [(file) for file in os.listdir(tests_dir) if file.endswith('.cl')]
@@ -11,4 +11,11 @@ tests = [(file) for file in os.listdir(tests_dir) if file.endswith('.cl')]
 @pytest.mark.parametrize("cool_file", tests)
 def test_semantic_errors(compiler_path, cool_file):
     compare_errors(compiler_path, tests_dir + cool_file, tests_dir + cool_file[:-3] + '_error.txt', \
-        cmp=first_error_only_line)
\ No newline at end of file
+        cmp=first_error_only_line)
+
+@pytest.mark.semantic
+@pytest.mark.error
+@pytest.mark.parametrize("cool_file", [file for file in tests if file.startswith('allerrors')])
+def test_all_errors(compiler_path, cool_file):
+    compare_errors(compiler_path, tests_dir + cool_file, tests_dir + cool_file[:-3] + '_error.txt', \
+        cmp=all_errors, args=['--all-errors'])
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Acceso a las fases del compilador para los tests de unidad.
+"""
+from comments import find_comments
+from tablecache import load_lexer, load_parser
+from travels.ctcill import CoolToCILVisitor
+
+
+def check_program(program: str):
+    """
+    Analiza y chequea un programa, devuelve su AST, su contexto y su scope.
+    """
+    program = find_comments(program).replace('\t', ' ' * 4)
+    ast = load_parser()(load_lexer("re").stream(program), evaluate=True)
+    errors, context, scope = ast.check_semantics()
+    assert not errors, errors
+    return ast, context, scope
+
+
+def build_cil(program: str, cache=None):
+    """
+    Devuelve el programa CIL de un programa Cool sin errores y el visitor
+    que lo genero.
+    """
+    ast, context, scope = check_program(program)
+    visitor = CoolToCILVisitor(context, cache)
+    return visitor.visit(ast, scope), visitor
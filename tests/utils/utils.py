@@ -9,6 +9,7 @@ TEST_MUST_COMPILE = 'El test %s debe compilar'
 BAD_ERROR_FORMAT = '''El error no esta en formato: (<línea>,<columna>) - <tipo_de_error>: <texto_del_error>
                         o no se encuentra en la 3ra linea\n\n%s'''
 UNEXPECTED_ERROR = 'Se esperaba un %s en (%d, %d). Su error fue un %s en (%d, %d)'
+UNEXPECTED_ERRORS = 'Se esperaban %d errores. Su compilador reporto %d'
 UNEXPECTED_OUTPUT = 'La salida de %s no es la esperada:\n%s\nEsperada:\n%s'
 
 ERROR_FORMAT = r'^\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)\s*-\s*(\w+)\s*:(.*)$'
@@ -36,6 +37,14 @@ def first_error_only_line(compiler_output: list, errors: list):
     assert line == oline and error_type == oerror_type,\
         UNEXPECTED_ERROR % (error_type, line, column, oerror_type, oline, ocolumn)
 
+def all_errors(compiler_output: list, errors: list):
+    compiler_output = [error for error in compiler_output if error]
+    assert len(compiler_output) == len(errors),\
+        UNEXPECTED_ERRORS % (len(errors), len(compiler_output))
+
+    for oerror, error in zip(compiler_output, errors):
+        first_error([oerror], [error])
+
 
 def get_file_name(path: str):
     try:
@@ -43,9 +52,9 @@ def get_file_name(path: str):
     except ValueError:
         return path
 
-def compare_errors(compiler_path: str, cool_file_path: str, error_file_path: str, cmp=first_error, timeout=100):
+def compare_errors(compiler_path: str, cool_file_path: str, error_file_path: str, cmp=first_error, timeout=100, args=()):
     try:
-        sp = subprocess.run(['bash', compiler_path, cool_file_path], capture_output=True, timeout=timeout)
+        sp = subprocess.run(['bash', compiler_path, cool_file_path, *args], capture_output=True, timeout=timeout)
         return_code, output = sp.returncode, sp.stdout.decode()
     except subprocess.TimeoutExpired:
         assert False, COMPILER_TIMEOUT
@@ -65,9 +74,9 @@ Copyright .+\, James R\. Larus\.
 All Rights Reserved\.
 See the file README for a full copyright notice\.
 (?:Loaded: .+\n)*'''
-def compare_outputs(compiler_path: str, cool_file_path: str, input_file_path: str, output_file_path: str, timeout=100):
+def compare_outputs(compiler_path: str, cool_file_path: str, input_file_path: str, output_file_path: str, timeout=100, args=()):
     try:
-        sp = subprocess.run(['bash', compiler_path, cool_file_path], capture_output=True, timeout=timeout)
+        sp = subprocess.run(['bash', compiler_path, cool_file_path, *args], capture_output=True, timeout=timeout)
         assert sp.returncode == 0, TEST_MUST_COMPILE % get_file_name(cool_file_path)
     except subprocess.TimeoutExpired:
         assert False, COMPILER_TIMEOUT
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from cil.vtables import PADDING, color_selectors, layout_vtables, method_slots, saved_bytes
+from utils.compiler import build_cil
+
+codegen_dir = __file__.rpartition('/')[0] + '/codegen/'
+
+# Tipo: (padre, metodos propios). Un metodo propio que el padre ya tiene es
+# una redefinicion. `print` se define en dos clases no relacionadas.
+CLASSES = {
+    "Object": (None, ["abort", "type_name", "copy"]),
+    "IO": ("Object", ["out_string", "out_int", "in_string", "in_int"]),
+    "Shape": ("Object", ["area", "size"]),
+    "Square": ("Shape", ["area", "side"]),
+    "Cube": ("Square", ["volume", "size"]),
+    "Printer": ("IO", ["print"]),
+    "List": ("Object", ["head", "tail", "print"]),
+}
+
+
+def prefix_tables(classes):
+    # Tablas como las arma CoolToCILVisitor.define_type_node: las heredadas
+    # en el orden del padre y luego las nuevas
+    tables = {}
+    for name, (parent, methods) in classes.items():
+        table = list(tables[parent]) if parent else []
+        for method in methods:
+            entry = (method, f"function_{method}_at_{name}")
+            names = [m for m, _ in table]
+            if method in names:
+                table[names.index(method)] = entry
+            else:
+                table.append(entry)
+        tables[name] = table
+    return tables
+
+
+def check_layout(names, parents, tables, laid_out):
+    slots = color_selectors(tables)
+    for name, table, new_table in zip(names, tables, laid_out):
+        # Dos metodos de una misma tabla nunca comparten indice
+        used = [slots[m] for m, _ in table]
+        assert len(set(used)) == len(used)
+        # Cada metodo en su indice y los huecos solo tienen PADDING
+        entries = [entry for entry in new_table if entry != PADDING]
+        assert sorted(entries) == sorted(table)
+        for i, entry in enumerate(new_table):
+            if i in used:
+                assert slots[entry[0]] == i
+            else:
+                assert entry == PADDING
+        # La tabla termina en su mayor indice ocupado
+        assert not new_table or new_table[-1] != PADDING
+        # Los metodos heredados conservan el indice del padre
+        parent = parents.get(name)
+        if parent is not None:
+            parent_table = laid_out[names.index(parent)]
+            for i, entry in enumerate(parent_table):
+                if entry != PADDING:
+                    assert new_table[i][0] == entry[0]
+
+
+def test_layout_synthetic():
+    by_name = prefix_tables(CLASSES)
+    names = list(CLASSES)
+    tables = [by_name[name] for name in names]
+    laid_out = layout_vtables(tables)
+    check_layout(names, {n: p for n, (p, _) in CLASSES.items()}, tables, laid_out)
+
+    slots = method_slots(laid_out)
+    assert slots == color_selectors(tables)
+    # Una cadena de herencia simple queda sin huecos
+    assert [m for m, _ in laid_out[names.index("Cube")]] == [
+        "abort", "type_name", "copy", "area", "size", "side", "volume"
+    ]
+    # `print` esta en dos clases no relacionadas y toma un indice libre en
+    # ambas, lo que deja huecos en List
+    assert slots["print"] == 7
+    assert [m for m, _ in laid_out[names.index("List")]] == [
+        "abort", "type_name", "copy", "head", "tail", PADDING[0], PADDING[0], "print"
+    ]
+
+    selectors = len({m for table in tables for m, _ in table})
+    total = sum(len(table) for table in laid_out)
+    assert saved_bytes(laid_out) == 4 * (len(tables) * selectors - total)
+    assert saved_bytes(laid_out) > 0
+
+
+@pytest.mark.parametrize("cool_file", sorted(f for f in os.listdir(codegen_dir) if f.endswith('.cl')))
+def test_layout_programs(cool_file):
+    with open(codegen_dir + cool_file) as f:
+        program, visitor = build_cil(f.read())
+    names = [t.name for t in program.dottypes]
+    parents = {
+        name: visitor.context.get_type(name).parent.name
+        for name in names
+        if visitor.context.get_type(name).parent is not None
+    }
+    tables = [[entry for entry in t.methods if entry != PADDING] for t in program.dottypes]
+    check_layout(names, parents, tables, [t.methods for t in program.dottypes])
+    assert visitor.vtable_saved == saved_bytes([t.methods for t in program.dottypes])